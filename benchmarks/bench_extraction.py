@@ -0,0 +1,27 @@
+import numpy as np
+
+from benchmarks.conftest import FETCHED_FORM
+from benchmarks.synthetic import write_form
+from pages.modules.constraint_parser import parse_numeric_constraint
+from pages.modules.variable_extractor import extract_variables_from_excel
+
+
+def bench_extract_variables_fetched_form(measure):
+    measure(extract_variables_from_excel, FETCHED_FORM, rounds=5)
+
+
+def bench_extract_variables_synthetic(measure, n_questions, tmp_path):
+    path = write_form(tmp_path / "form.xlsx", n_questions, n_multiple=n_questions // 10)
+
+    measure(extract_variables_from_excel, path, rounds=3)
+
+
+def bench_parse_numeric_constraint(measure):
+    rng = np.random.default_rng(0)
+    templates = [".>={} and .<={}", ".>{}", ".<={}", ".={}", ". >= {} and . < {}", "regex(., '^[0-9]{{{}}}$')"]
+    constraints = [templates[i % len(templates)].format(*rng.integers(0, 200, 2)) for i in range(10_000)]
+
+    def parse_all():
+        return [parse_numeric_constraint(c) for c in constraints]
+
+    measure(parse_all)
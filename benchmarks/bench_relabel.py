@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.conftest import FETCHED_FORM
+from benchmarks.synthetic import LABEL, make_export, make_form, make_form_frames
+from src.utils import (VERSION_COLUMN, label2name_sheet, name2label_choices_multiple, name2label_choices_one,
+                       name2label_questions, relabel_languages, relabel_sheet, relabel_sheets, sheet_scopes)
+from src.xlsform import XLSForm
+
+# Largest rows x select_multiple groups case we build (dummy cells)
+MAX_DUMMY_CELLS = 50_000_000
+
+
+def bench_name2label_questions(measure, n_questions):
+    form = make_form(n_questions, n_multiple=n_questions // 10)
+    columns = list(make_export(form, 1).columns)
+
+    def rename():
+        return [name2label_questions(form, col, LABEL, "/") for col in columns]
+
+    measure(rename)
+
+
+def bench_name2label_choices_one(measure, n_rows):
+    form = make_form(100)
+    data = make_export(form, n_rows)
+    questions = [q.name for q in form.questions_of_type("select_one")]
+
+    def relabel():
+        return [name2label_choices_one(form, LABEL, data, col) for col in questions]
+
+    measure(relabel, rounds=3)
+
+
+def bench_name2label_choices_multiple(measure, n_rows, n_multiple):
+    if n_rows * n_multiple * 8 > MAX_DUMMY_CELLS:
+        pytest.skip("dataset too large for this machine")
+    form = make_form(max(n_multiple, 10), n_multiple=n_multiple)
+    data = make_export(form, n_rows)
+    questions = [q.name for q in form.questions_of_type("select_multiple")]
+
+    def relabel():
+        return [name2label_choices_multiple(form, data, col, LABEL, "/") for col in questions]
+
+    measure(relabel, rounds=3)
+
+
+def bench_relabel_fetched_form(measure, n_rows):
+    # End-to-end switch of one sheet against the bundled real-world form
+    form = XLSForm.from_excel(FETCHED_FORM)
+    data = make_export(form, n_rows)
+    scope = sheet_scopes(form, ["main"], [data])[0]
+
+    measure(relabel_sheet, scope, data, LABEL, "/", rounds=3)
+
+
+def bench_xlsform_from_frames(measure, n_questions):
+    survey, choices = make_form_frames(n_questions, n_multiple=n_questions // 10)
+
+    measure(XLSForm.from_frames, survey, choices)
+
+
+def bench_relabel_by_version(measure, n_rows):
+    # Three versions, the oldest with one choice list relabeled since
+    survey, choices = make_form_frames(100, n_multiple=10)
+    form = XLSForm.from_frames(survey, choices)
+    renamed = choices.copy()
+    renamed.loc[renamed["list_name"] == "list_0", LABEL] += " (old)"
+    version_forms = {"v1": XLSForm.from_frames(survey, renamed), "v2": form, "v3": form}
+    data = make_export(form, n_rows)
+    data[VERSION_COLUMN] = np.array(["v1", "v2", "v3"])[np.arange(n_rows) % 3]
+
+    measure(relabel_sheets, form, ["main"], [data], LABEL, "/", version_forms, rounds=3)
+
+
+def bench_label2name_sheet(measure, n_rows, n_multiple):
+    # Reverse switch of a sheet the forward switch labeled
+    if n_rows * n_multiple * 8 > MAX_DUMMY_CELLS:
+        pytest.skip("dataset too large for this machine")
+    form = make_form(100, n_multiple=n_multiple)
+    scope = sheet_scopes(form, ["main"], [make_export(form, 1)])[0]
+    labeled = relabel_sheet(scope, make_export(form, n_rows), LABEL, "/")
+
+    measure(label2name_sheet, scope, labeled, LABEL, "/", rounds=3)
+
+
+def bench_relabel_languages(measure, n_rows):
+    # Every label language of the bundled form in one pass (compare with
+    # bench_relabel_fetched_form, which switches to one of them)
+    form = XLSForm.from_excel(FETCHED_FORM)
+    data = make_export(form, n_rows)
+
+    measure(relabel_languages, form, ["main"], [data], list(form.label_columns), "/", rounds=3)
@@ -0,0 +1,61 @@
+"""
+Startup cost of every page, measured with ``python -X importtime``.
+
+Each page's module-level imports are replayed in a fresh interpreter; the
+cumulative import time lands in extra_info["import_ms"]. A page fails if it
+pulls in one of the heavy dependencies before first use, or if its imports
+exceed ``--import-budget-ms``.
+"""
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.conftest import ROOT
+
+PAGES = ["Home.py"] + sorted(os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, "pages", "*.py")))
+# Loaded on first use only; none of them may be imported just by opening a page
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "openpyxl", "requests"]
+
+
+def page_imports(page: str) -> str:
+    """
+    Return the module-level import statements of a page as one script.
+    """
+    with open(os.path.join(ROOT, page), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def import_time(script: str):
+    """
+    Run ``script`` under ``-X importtime``.
+
+    Returns:
+        tuple: (cumulative import time in ms, heavy modules that were loaded)
+    """
+    probe = f"{script}\nimport sys\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"; top-level packages are not indented
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith("  "):
+            total_us += int(parts[1])
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total_us / 1000, loaded
+
+
+@pytest.mark.parametrize("page", PAGES)
+def bench_page_imports(benchmark, page, request):
+    script = page_imports(page)
+    import_ms, loaded = benchmark.pedantic(import_time, args=(script,), rounds=3, iterations=1)
+    benchmark.extra_info["import_ms"] = round(import_ms, 1)
+
+    assert not loaded, f"{page} imports {', '.join(loaded)} at startup"
+    budget = request.config.getoption("--import-budget-ms")
+    assert import_ms <= budget, f"{page} imports take {import_ms:.0f} ms (budget {budget} ms)"
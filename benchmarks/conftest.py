@@ -0,0 +1,66 @@
+"""
+Offline benchmarks for the relabeling and extraction hot paths and page startup.
+
+    pip install -r benchmarks/requirements.txt
+    pytest benchmarks                      # quick sizes
+    pytest benchmarks --full               # up to 5,000 questions / 1M rows
+    pytest benchmarks --benchmark-json=out.json   # peak_mb / import_ms land in extra_info
+    pytest benchmarks/bench_startup.py --import-budget-ms 800
+    pytest benchmarks -k test_            # only the correctness tests (test_*.py)
+
+Compare two runs with ``pytest-benchmark compare``.
+"""
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Real-world fixture shipped with the app
+FETCHED_FORM = os.path.join(ROOT, "data", "fetched_form.xlsx")
+
+
+def pytest_addoption(parser):
+    parser.addoption("--full", action="store_true", default=False,
+                     help="Run the production-sized cases (up to 5,000 questions / 1M rows).")
+    parser.addoption("--import-budget-ms", type=float, default=1000,
+                     help="Fail a page whose module-level imports take longer than this.")
+
+
+def pytest_generate_tests(metafunc):
+    # Size axes: the quick set runs in seconds, --full adds the large cases
+    full = metafunc.config.getoption("--full")
+    axes = {
+        "n_questions": [100, 1000] + ([5000] if full else []),
+        "n_rows": [1_000, 100_000] + ([1_000_000] if full else []),
+        "n_multiple": [0, 20] + ([200] if full else []),
+    }
+    for name, values in axes.items():
+        if name in metafunc.fixturenames:
+            metafunc.parametrize(name, values)
+
+
+@pytest.fixture
+def measure(benchmark):
+    """
+    Time ``func(*args)`` with pytest-benchmark, then run it once more under
+    tracemalloc and record the peak allocation in the benchmark's extra_info.
+    """
+    def run(func, *args, rounds=None):
+        if rounds:
+            result = benchmark.pedantic(func, args=args, rounds=rounds, iterations=1)
+        else:
+            result = benchmark(func, *args)
+        tracemalloc.start()
+        try:
+            func(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_mb"] = round(peak / 1024 / 1024, 2)
+        return result
+    return run
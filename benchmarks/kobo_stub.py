@@ -0,0 +1,362 @@
+"""
+Local stand-in for the parts of the Kobo API the app talks to.
+
+    python -m benchmarks.kobo_stub --assets 1000 --latency 0.05 --error-rate 0.01 --rps 50
+
+Any token is accepted and resolves to the username of the same name, so
+``Token sender`` owns every generated asset and ``Token receiver`` can accept
+transfers. State lives in memory and is lost when the server stops.
+"""
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API = "/api/v2"
+# Served as every asset's XLSForm download
+XLSFORM_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fetched_form.xlsx")
+
+
+@functools.lru_cache(maxsize=1)
+def form_content() -> dict:
+    """
+    XLSFORM_PATH as the JSON ``content`` Kobo serves for an asset version:
+    translated cells become lists aligned with ``translations``.
+    """
+    import pandas as pd
+
+    xls = pd.ExcelFile(XLSFORM_PATH)
+    survey, choices = xls.parse("survey"), xls.parse("choices")
+    labels = [c for c in survey.columns if c.startswith("label")]
+    translations = [None if c == "label" else c.split("::", 1)[1] for c in labels]
+
+    def items(frame, columns):
+        rows = []
+        for record in frame.to_dict("records"):
+            item = {k: record[k] for k in columns if k in record and pd.notna(record[k])}
+            if isinstance(item.get("name"), float):
+                item["name"] = f"{item['name']:g}"
+            kind = str(item.get("type", "")).split()
+            if kind[:1] in (["select_one"], ["select_multiple"]) and len(kind) > 1:
+                item["type"], item["select_from_list_name"] = kind[:2]
+            label = [None if pd.isna(record.get(c)) else str(record[c]) for c in labels]
+            if any(label):
+                item["label"] = label
+            rows.append(item)
+        return rows
+
+    return {"survey": items(survey, ["type", "name", "constraint"]),
+            "choices": items(choices, ["list_name", "name"]),
+            "translations": translations}
+
+
+class StubState:
+    """
+    In-memory assets, invites and the knobs that shape every response.
+
+    Args:
+        n_assets (int): Assets generated for ``owner``.
+        owner (str): Username owning the generated assets.
+        latency (float): Seconds added to every response.
+        jitter (float): Extra random latency, uniform in ``[0, jitter]``.
+        error_rate (float): Share of requests answered with a 500.
+        rps (float): Requests per second before answering 429 (0 disables throttling).
+        n_submissions (int): Submissions returned by ``/assets/{uid}/data/``.
+        honor_fields (bool): Trim listed assets to the ``fields`` query parameter,
+            or ignore it and return whole records.
+    """
+    def __init__(self, n_assets=100, owner="sender", latency=0.0, jitter=0.0,
+                 error_rate=0.0, rps=0.0, n_submissions=20, honor_fields=True, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rps = rps
+        self.n_submissions = n_submissions
+        self.honor_fields = honor_fields
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.invites = {}
+        # Form content per version uid, for versions that differ from XLSFORM_PATH
+        self.version_content = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._window = (0, 0)  # (second, count) for throttling
+        self.assets = {}
+        for i in range(n_assets):
+            uid = f"a{i:07d}"
+            self.assets[uid] = {
+                "uid": uid,
+                "name": f"Project {i}",
+                "owner__username": owner,
+                "deployment_status": ["deployed", "draft", "archived"][i % 3],
+                "date_created": "2025-01-01T00:00:00Z",
+                "date_deployed": "2025-01-01T00:00:00Z",
+                "date_modified": f"2025-01-{1 + i % 28:02d}T00:00:00Z",
+                "deployment__submission_count": n_submissions,
+                "deployment__last_submission_time": "2025-02-01T00:00:00Z",
+                "deployed_versions": {"count": 1, "results": [
+                    {"uid": f"v{i:07d}", "date_deployed": "2025-01-01T00:00:00Z",
+                     "date_modified": "2025-01-01T00:00:00Z"}]},
+                "permissions": [],
+                "settings": {"sector": {"label": None, "value": None},
+                             "collects_pii": None,
+                             "operational_purpose": None},
+            }
+
+    def admit(self):
+        """
+        Return the status to fail this request with (429/500), or None to serve it.
+        """
+        with self.lock:
+            self.requests += 1
+            if self.rps:
+                second = int(time.monotonic())
+                window, count = self._window
+                count = count + 1 if window == second else 1
+                self._window = (second, count)
+                if count > self.rps:
+                    return 429
+            if self.error_rate and self.random.random() < self.error_rate:
+                return 500
+        return None
+
+    @staticmethod
+    def now() -> str:
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + f".{time.time_ns() % 10**9 // 1000:06d}Z"
+
+    def delay(self):
+        wait = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if wait:
+            time.sleep(wait)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "KoboStub/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # response on a keep-alive connection stalls on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def _send(self, status, body=None, headers=None, content_type="application/json"):
+        if isinstance(body, bytes):
+            payload = body
+        else:
+            payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        headers = dict(headers or {})
+        if self.command == "GET" and status == 200:
+            # Strong validator over the body, honoured on the next If-None-Match
+            etag = '"' + hashlib.sha1(payload).hexdigest()[:20] + '"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                with self.state.lock:
+                    self.state.not_modified += 1
+                status, payload = 304, b""
+        accepted = self.headers.get("Accept-Encoding", "")
+        if len(payload) > 1024 and "gzip" in accepted:
+            payload = gzip.compress(payload, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        with self.state.lock:
+            self.state.bytes_sent += len(payload)
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _username(self):
+        auth = self.headers.get("Authorization", "")
+        return auth[len("Token "):] if auth.startswith("Token ") and len(auth) > 6 else None
+
+    def _handle(self, method):
+        self.state.delay()
+        failure = self.state.admit()
+        body = self._body() if method in ("POST", "PATCH") else None
+        if failure == 429:
+            return self._send(429, {"detail": "Request was throttled."}, {"Retry-After": "1"})
+        if failure:
+            return self._send(failure, {"detail": "Server error."})
+
+        user = self._username()
+        if user is None:
+            return self._send(401, {"detail": "Invalid token."})
+
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = url.path.rstrip("/") + "/"
+        if path.endswith(".json/"):
+            path = path[:-len(".json/")] + "/"
+
+        for pattern, handler_method, handler in ROUTES:
+            match = re.fullmatch(API + pattern, path)
+            if match and handler_method == method:
+                return handler(self, user, query, body, *match.groups())
+        return self._send(404, {"detail": "Not found."})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    # ----- Endpoints -----
+    def access_logs(self, user, query, body):
+        self._send(200, {"count": 1, "results": [{"username": user}]})
+
+    def list_assets(self, user, query, body):
+        assets = list(self.state.assets.values())
+        # Only the filter the app sends: q=date_modified__gt:<iso date>
+        since = query.get("q", "").partition("date_modified__gt:")[2]
+        if since:
+            assets = [a for a in assets if a["date_modified"] > since]
+        limit = int(query.get("limit", 100))
+        offset = int(query.get("offset", 0))
+        results = assets[offset:offset + limit]
+        if query.get("fields") and self.state.honor_fields:
+            fields = query["fields"].split(",")
+            results = [{k: a[k] for k in fields if k in a} for a in results]
+        self._send(200, {"count": len(assets), "results": results})
+
+    def asset_detail(self, user, query, body, uid):
+        asset = self.state.assets.get(uid)
+        if asset is None:
+            return self._send(404, {"detail": "Not found."})
+        if query.get("format") == "xls":
+            with open(XLSFORM_PATH, "rb") as f:
+                return self._send(200, f.read(), content_type="application/vnd.ms-excel")
+        base = f"http://{self.headers.get('Host')}{API}/assets/{uid}"
+        self._send(200, {
+            **asset,
+            "downloads": [{"format": "xls", "url": f"{base}/?format=xls"}],
+            "deployment__data_download_links": {"xls": f"{base}/export.xlsx", "csv": f"{base}/export.csv"},
+            "deployment__links": {"iframe_url": f"{base}/form/"},
+        })
+
+    def patch_asset(self, user, query, body, uid):
+        asset = self.state.assets.get(uid)
+        if asset is None:
+            return self._send(404, {"detail": "Not found."})
+        with self.state.lock:
+            asset["settings"].update(body.get("settings", {}))
+            asset["date_modified"] = self.state.now()
+        self._send(200, asset)
+
+    def asset_version(self, user, query, body, uid, version_uid):
+        asset = self.state.assets.get(uid)
+        versions = asset["deployed_versions"]["results"] if asset else []
+        version = next((v for v in versions if v["uid"] == version_uid), None)
+        if version is None:
+            return self._send(404, {"detail": "Not found."})
+        content = self.state.version_content.get(version_uid) or form_content()
+        self._send(200, {**version, "content": content})
+
+    def asset_data(self, user, query, body, uid):
+        if uid not in self.state.assets:
+            return self._send(404, {"detail": "Not found."})
+        results = [{"_id": i, "_uuid": f"{uid}-{i}"} for i in range(self.state.n_submissions)]
+        self._send(200, {"count": len(results), "results": results})
+
+    def patch_deployment(self, user, query, body, uid):
+        asset = self.state.assets.get(uid)
+        if asset is None:
+            return self._send(404, {"detail": "Not found."})
+        active = str(body.get("active", "true")).lower() == "true"
+        with self.state.lock:
+            asset["deployment_status"] = "deployed" if active else "archived"
+            asset["date_modified"] = self.state.now()
+        self._send(200, {"active": active})
+
+    def create_invite(self, user, query, body):
+        with self.state.lock:
+            invite_uid = f"poi{len(self.state.invites):07d}"
+            recipient = body.get("recipient", "").rstrip("/").rsplit("/", 1)[-1]
+            self.state.invites[invite_uid] = {"recipient": recipient, "assets": body.get("assets", [])}
+        host = self.headers.get("Host")
+        self._send(201, {"url": f"http://{host}{API}/project-ownership/invites/{invite_uid}/",
+                         "status": "pending"})
+
+    def accept_invite(self, user, query, body, invite_uid):
+        invite = self.state.invites.get(invite_uid)
+        if invite is None or invite["recipient"] != user:
+            return self._send(404, {"detail": "Not found."})
+        with self.state.lock:
+            for uid in invite["assets"]:
+                if uid in self.state.assets:
+                    self.state.assets[uid]["owner__username"] = user
+                    self.state.assets[uid]["date_modified"] = self.state.now()
+        self._send(200, {"status": body.get("status", "accepted")})
+
+
+ROUTES = [
+    (r"/access-logs/me/", "GET", StubHandler.access_logs),
+    (r"/assets/", "GET", StubHandler.list_assets),
+    (r"/assets/([^/]+)/", "GET", StubHandler.asset_detail),
+    (r"/assets/([^/]+)/", "PATCH", StubHandler.patch_asset),
+    (r"/assets/([^/]+)/versions/([^/]+)/", "GET", StubHandler.asset_version),
+    (r"/assets/([^/]+)/data/", "GET", StubHandler.asset_data),
+    (r"/assets/([^/]+)/deployment/", "PATCH", StubHandler.patch_deployment),
+    (r"/project-ownership/invites/", "POST", StubHandler.create_invite),
+    (r"/project-ownership/invites/([^/]+)/", "PATCH", StubHandler.accept_invite),
+]
+
+
+def start_server(port: int = 0, **state_kwargs):
+    """
+    Start the stub on a background thread.
+
+    Returns:
+        tuple: (server, base_url); call ``server.shutdown()`` when done.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**state_kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--assets", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rps", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, n_assets=args.assets, latency=args.latency, jitter=args.jitter,
+                                    error_rate=args.error_rate, rps=args.rps)
+    print(f"Kobo stub serving {args.assets} assets on {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
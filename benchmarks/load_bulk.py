@@ -0,0 +1,100 @@
+"""
+Drive the bulk flows (list, archive, set-metadata, transfer) against the local
+Kobo stub and report throughput.
+
+    python -m benchmarks.load_bulk --sizes 10 1000 10000 --latency 0.02 --error-rate 0.01
+
+The ``--delay`` between write requests defaults to 0 here; the pages keep their
+own pause to stay under the production rate limit.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.kobo_stub import start_server  # noqa: E402
+from src import kobo_api  # noqa: E402
+
+SENDER = "sender"
+RECEIVER = "receiver"
+
+
+def run_flows(root: str, state, delay: float) -> list:
+    """
+    Run every bulk flow once and return one result row per flow.
+    """
+    sender = kobo_api.auth_headers(SENDER)
+    receiver = kobo_api.auth_headers(RECEIVER)
+    rows = []
+
+    def timed(flow, n_assets, func):
+        before = state.requests
+        start = time.perf_counter()
+        try:
+            failures = func()
+            error = ""
+        except kobo_api.KoboAPIError as e:
+            failures, error = {}, str(e)
+        seconds = time.perf_counter() - start
+        n_requests = state.requests - before
+        rows.append({
+            "flow": flow,
+            "assets": n_assets,
+            "requests": n_requests,
+            "seconds": seconds,
+            "req/s": n_requests / seconds if seconds else 0.0,
+            "assets/s": n_assets / seconds if seconds else 0.0,
+            "failed": len(failures or {}),
+            "error": error,
+        })
+
+    records = []
+    timed("list", len(state.assets),
+          lambda: records.extend(kobo_api.fetch_asset_records(root, sender)))
+    uids = [a["uid"] for a in records] or list(state.assets)
+    deployed = [a["uid"] for a in records if a.get("deployment_status") == "deployed"]
+
+    timed("archive", len(deployed),
+          lambda: kobo_api.archive_assets(root, sender, deployed, delay=delay))
+    updates = [(uid, {"sector": {"label": "MEAL", "value": "MEAL"}}) for uid in uids]
+    timed("set-metadata", len(updates),
+          lambda: kobo_api.update_asset_settings(root, sender, updates, delay=delay))
+    timed("transfer", len(uids),
+          lambda: kobo_api.transfer_assets(root, sender, receiver, RECEIVER, uids))
+    return rows
+
+
+def print_table(rows: list) -> None:
+    header = f"{'flow':<14}{'assets':>8}{'requests':>10}{'seconds':>10}{'req/s':>10}{'assets/s':>10}{'failed':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['flow']:<14}{r['assets']:>8}{r['requests']:>10}{r['seconds']:>10.2f}"
+              f"{r['req/s']:>10.1f}{r['assets/s']:>10.1f}{r['failed']:>8}  {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rps", type=float, default=0.0)
+    parser.add_argument("--delay", type=float, default=0.0, help="Pause between write requests.")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        server, base_url = start_server(n_assets=size, owner=SENDER, latency=args.latency, jitter=args.jitter,
+                                        error_rate=args.error_rate, rps=args.rps)
+        try:
+            print(f"\n== {size} assets ==")
+            print_table(run_flows(kobo_api.api_root(base_url), server.state, args.delay))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
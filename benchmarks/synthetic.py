@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from src.xlsform import XLSForm
+
+CHOICES_PER_LIST = 8
+LABEL = "label::English"
+
+
+def make_form_frames(n_questions: int, n_multiple: int = 0, seed: int = 0) -> tuple:
+    """
+    Build survey and choices sheets for a synthetic XLSForm.
+
+    Roughly half the questions are select_one, ``n_multiple`` are select_multiple
+    and the rest are text/integer questions with numeric constraints. Questions
+    are spread over groups of 25, and the last group is a repeat.
+
+    Returns:
+        tuple: (survey, choices) DataFrames.
+    """
+    rng = np.random.default_rng(seed)
+    n_lists = max(n_questions // 10, 1)
+    rows = []
+    for i in range(n_questions):
+        if i % 25 == 0:
+            if i:
+                rows.append({"type": "end_group"})
+            kind = "begin_repeat" if i + 25 >= n_questions and i else "begin_group"
+            rows.append({"type": kind, "name": f"group_{i // 25}", LABEL: f"Group {i // 25}"})
+
+        if i < n_multiple:
+            q_type = f"select_multiple list_{i % n_lists}"
+        elif i % 2 == 0:
+            q_type = f"select_one list_{i % n_lists}"
+        elif i % 3 == 0:
+            q_type = "integer"
+        else:
+            q_type = "text"
+
+        constraint = f".>={rng.integers(0, 18)} and .<={rng.integers(60, 120)}" if q_type == "integer" else None
+        rows.append({"type": q_type, "name": f"q_{i}", LABEL: f"Question number {i}?",
+                     "label::French (fr)": f"Question numéro {i} ?", "constraint": constraint})
+    rows.append({"type": "end_repeat" if n_questions > 25 else "end_group"})
+
+    choices = pd.DataFrame([
+        {"list_name": f"list_{l}", "name": f"opt_{c}", LABEL: f"Option {c} of list {l}",
+         "label::French (fr)": f"Option {c} de la liste {l}"}
+        for l in range(n_lists) for c in range(CHOICES_PER_LIST)
+    ])
+    return pd.DataFrame(rows), choices
+
+
+def make_form(n_questions: int, n_multiple: int = 0, seed: int = 0) -> XLSForm:
+    return XLSForm.from_frames(*make_form_frames(n_questions, n_multiple, seed))
+
+
+def write_form(path, n_questions: int, n_multiple: int = 0, seed: int = 0) -> str:
+    """
+    Write a synthetic XLSForm workbook to ``path`` and return the path.
+    """
+    survey, choices = make_form_frames(n_questions, n_multiple, seed)
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        survey.to_excel(writer, sheet_name="survey", index=False)
+        choices.to_excel(writer, sheet_name="choices", index=False)
+    return str(path)
+
+
+def make_export(form: XLSForm, n_rows: int, sep: str = "/", seed: int = 0) -> pd.DataFrame:
+    """
+    Build a Kobo-style export of ``form`` with XML names: one column per
+    question, plus a 0/1 dummy column per select_multiple option (stored as int8
+    so the million-row cases fit in memory).
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for question in form.questions:
+        if question.q_type == "select_one":
+            names = np.array([c.name for c in form.choices(question.list_name)], dtype=object)
+            columns[question.name] = names[rng.integers(0, len(names), n_rows)]
+        elif question.q_type == "select_multiple":
+            picks = [c.name for c in form.choices(question.list_name)]
+            columns[question.name] = np.full(n_rows, " ".join(picks[:2]), dtype=object)
+            for name in picks:
+                columns[f"{question.name}{sep}{name}"] = rng.integers(0, 2, n_rows, dtype=np.int8)
+        elif question.q_type == "integer":
+            columns[question.name] = rng.integers(0, 100, n_rows)
+        elif question.q_type == "text":
+            columns[question.name] = np.full(n_rows, "free text", dtype=object)
+    columns["_index"] = np.arange(1, n_rows + 1)
+    return pd.DataFrame(columns)
@@ -0,0 +1,55 @@
+import pytest
+
+from benchmarks.kobo_stub import start_server
+from src import http_cache, kobo_api
+from src.asset_index import AssetIndex
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    # Like a server that ignores `fields=` and always returns whole records
+    monkeypatch.setattr(http_cache, "_path", lambda: str(tmp_path / "http.sqlite"))
+    server, base = start_server(n_assets=5, owner="sender", honor_fields=False)
+    index = AssetIndex(str(tmp_path / "assets.sqlite"))
+    root, headers = kobo_api.api_root(base), kobo_api.auth_headers("sender")
+    index.sync(root, headers)
+    yield server.state, index, root, headers
+    server.shutdown()
+
+
+def _count(index, uid):
+    return index.frame(name="").set_index("uid").loc[uid, "submission_count"]
+
+
+def test_delta_sync_does_not_list_every_asset(stub):
+    state, index, root, headers = stub
+    state.assets["a0000001"]["deployment__submission_count"] = 99
+    before = state.requests
+
+    with http_cache.revalidate():
+        assert index.sync(root, headers) == 0
+
+    # Only the modified-since count and the asset count were asked for
+    assert state.requests - before == 2
+    assert _count(index, "a0000001") == 20
+
+
+def test_counts_are_refreshed_on_request(stub):
+    state, index, root, headers = stub
+    state.assets["a0000001"]["deployment__submission_count"] = 99
+
+    with http_cache.revalidate():
+        index.sync(root, headers, counts=True)
+
+    assert _count(index, "a0000001") == 99
+    assert len(index) == 5
+
+
+def test_deleted_assets_trigger_a_full_listing(stub):
+    state, index, root, headers = stub
+    del state.assets["a0000003"]
+
+    with http_cache.revalidate():
+        index.sync(root, headers)
+
+    assert len(index) == 4
@@ -0,0 +1,58 @@
+import dataclasses
+
+import pytest
+
+from benchmarks.kobo_stub import start_server
+from src import engine, http_cache, kobo_api
+from src.config import get_config
+
+
+@pytest.fixture
+def throttled(tmp_path, monkeypatch):
+    # The stub answers 429 with "Retry-After: 1" beyond `rps` requests per second
+    monkeypatch.setattr(http_cache, "_path", lambda: str(tmp_path / "http.sqlite"))
+
+    def start(rps, max_retries=3):
+        settings = get_config()
+        performance = dataclasses.replace(settings.performance, max_retries=max_retries)
+        monkeypatch.setattr(engine, "get_config", lambda: dataclasses.replace(settings, performance=performance))
+        server, base = start_server(n_assets=6, owner="sender", rps=rps)
+        servers.append(server)
+        return server.state, kobo_api.api_root(base), kobo_api.auth_headers("sender")
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _patches(root, n):
+    payload = {"json": {"settings": {"sector": {"label": "MEAL", "value": "MEAL"}}}}
+    return [("PATCH", f"{root}/assets/a{i:07d}/", payload) for i in range(n)]
+
+
+def test_throttled_requests_are_retried(throttled):
+    state, root, headers = throttled(rps=3)
+
+    results = engine.gather(_patches(root, 6), headers=headers, max_concurrency=6, delay=0)
+
+    assert [engine.status_of(r) for r in results] == [200] * 6
+    # The throttled ones were sent again after the Retry-After
+    assert state.requests > 6
+
+
+def test_retries_are_bounded(throttled):
+    # Throttles every request
+    state, root, headers = throttled(rps=0.5, max_retries=1)
+
+    result, = engine.gather(_patches(root, 1), headers=headers, delay=0)
+
+    assert engine.status_of(result) == 429
+    assert state.requests == 2
+
+
+def test_retry_after_is_capped():
+    response = engine.httpx.Response(429, headers={"Retry-After": "3600"})
+    assert engine._retry_delay(response, 0, max_wait=30) == 30
+    # Without Retry-After: exponential backoff
+    assert engine._retry_delay(engine.httpx.Response(503), 2, max_wait=30) == 2
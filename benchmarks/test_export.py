@@ -0,0 +1,50 @@
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from src import export
+
+
+def _read_member(artifact, reader):
+    with zipfile.ZipFile(artifact) as zipf:
+        name, = zipf.namelist()
+        return reader(io.BytesIO(zipf.read(name))).to_pandas()
+
+
+@pytest.mark.parametrize("writer, reader", [(export.write_feather_zip, feather.read_table),
+                                            (export.write_parquet_zip, pq.read_table)])
+def test_dictionary_columns_change_across_batches(writer, reader):
+    # Repeated text whose values differ from one CHUNK_ROWS batch to the next
+    n = export.CHUNK_ROWS * 2 + 5_000
+    first = export.CHUNK_ROWS + 5_000
+    df = pd.DataFrame({"_submitted_by": ["alice"] * first + ["bob"] * (n - first), "n": range(n)})
+
+    out = _read_member(writer([df], ["main"]), reader)
+
+    assert out["_submitted_by"].astype(str).tolist() == df["_submitted_by"].tolist()
+    assert out["n"].tolist() == df["n"].tolist()
+
+
+def test_spooled_outputs_go_with_their_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "SPOOL_ROOT", str(tmp_path))
+    monkeypatch.setattr(export, "SPOOL_THRESHOLD", 0)
+    monkeypatch.setattr(export, "_swept", False)
+    stale = tmp_path / "session_old"
+    stale.mkdir()
+    os.utime(stale, (0, 0))
+
+    spool = export.SpoolDir()
+    artifact = export.write_csv_zip([pd.DataFrame({"a": [1]})], ["main"], spool_dir=spool.path)
+    assert os.path.dirname(artifact.name) == spool.path
+    artifact.close()
+
+    path = spool.path
+    del spool
+    assert not os.path.exists(path)
+    # Directories left by a killed server are swept by age
+    assert not stale.exists()
@@ -0,0 +1,69 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from benchmarks.kobo_stub import start_server
+from src import http_cache, kobo_api
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "_path", lambda: str(tmp_path / "http.sqlite"))
+    server, base = start_server(n_assets=3, owner="sender")
+    yield server.state, kobo_api.api_root(base), kobo_api.auth_headers("sender")
+    server.shutdown()
+
+
+def test_fresh_responses_are_served_then_revalidated(stub):
+    state, root, headers = stub
+    url = f"{root}/assets/a0000000/"
+
+    first = kobo_api.request("GET", url, headers=headers)
+    assert state.requests == 1
+    # Fresh: answered from disk without contacting the server
+    assert kobo_api.request("GET", url, headers=headers).json() == first.json()
+    assert state.requests == 1
+
+    # Forced revalidation: the server answers 304 and the cached body is returned
+    with http_cache.revalidate():
+        again = kobo_api.request("GET", url, headers=headers)
+    assert (state.requests, state.not_modified) == (2, 1)
+    assert again.status_code == 200 and again.json() == first.json()
+
+
+def test_writes_invalidate_the_asset_and_the_lists(stub):
+    state, root, headers = stub
+    listing = {"format": "json", "limit": 100}
+    for uid in ("a0000000", "a0000001"):
+        kobo_api.request("GET", f"{root}/assets/{uid}/", headers=headers)
+    kobo_api.request("GET", f"{root}/assets/", params=listing, headers=headers)
+
+    kobo_api.request("PATCH", f"{root}/assets/a0000000/", headers=headers,
+                     json={"settings": {"sector": {"label": "MEAL", "value": "MEAL"}}})
+
+    assert http_cache.lookup(f"{root}/assets/a0000000/", None, headers) is None
+    assert http_cache.lookup(f"{root}/assets/", listing, headers) is None
+    assert http_cache.lookup(f"{root}/assets/a0000001/", None, headers) is not None
+    # The next read sees the write
+    detail = kobo_api.request("GET", f"{root}/assets/a0000000/", headers=headers).json()
+    assert detail["settings"]["sector"]["value"] == "MEAL"
+
+
+def test_submission_data_never_reaches_the_disk(stub, tmp_path):
+    state, root, headers = stub
+    # A response stored by an older version, before data left the cacheable endpoints
+    with closing(sqlite3.connect(tmp_path / "http.sqlite")) as conn, conn:
+        conn.executescript(http_cache.SCHEMA)
+        conn.execute("INSERT INTO responses VALUES (?, '', NULL, NULL, '{}', x'00', 1, 0, 0)",
+                     (f"{root}/assets/a0000000/data/?format=json",))
+
+    url = f"{root}/assets/a0000000/data/?format=json"
+    for _ in range(2):
+        assert kobo_api.request("GET", url, headers=headers).status_code == 200
+    assert state.requests == 2
+    # The first use of the cache purged the old response
+    kobo_api.request("GET", f"{root}/assets/a0000001/", headers=headers)
+
+    with closing(sqlite3.connect(tmp_path / "http.sqlite")) as conn:
+        assert conn.execute("SELECT url FROM responses").fetchall() == [(f"{root}/assets/a0000001/",)]
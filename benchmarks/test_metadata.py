@@ -0,0 +1,40 @@
+import pandas as pd
+
+from src import metadata
+
+
+def test_diff_matches_rows_by_uid():
+    original = pd.DataFrame({"UID": ["a", "b", "c"], "PII": ["Yes", None, "No"],
+                             "Function": ["MEAL", "IT", None], "Legal Entity": [None, None, None]})
+    # Edited tabs hold some of the columns, in another row order, and one unknown UID
+    edited = [pd.DataFrame({"UID": ["c", "a", "zzz"], "PII": ["Yes", "Yes", "No"]}),
+              pd.DataFrame({"UID": ["b"], "Function": ["IT"], "Legal Entity": [None]})]
+
+    changes = metadata.diff(original, edited)
+
+    assert changes.to_dict("records") == [{"UID": "c", "field": "PII", "old": "No", "new": "Yes"}]
+    assert metadata.settings_updates(changes) == [("c", {"collects_pii": {"label": "Yes", "value": "Yes"}})]
+
+
+def test_diff_reports_cleared_and_set_cells():
+    original = pd.DataFrame({"UID": ["a", "b"], "PII": ["Yes", None]})
+    edited = pd.DataFrame({"UID": ["a", "b"], "PII": [None, "No"]})
+
+    changes = metadata.diff(original, edited, columns=["PII"])
+
+    assert changes[["UID", "old", "new"]].to_dict("records") == [
+        {"UID": "a", "old": "Yes", "new": None}, {"UID": "b", "old": None, "new": "No"}]
+
+
+def test_import_skips_unnamed_and_unknown_assets():
+    records = [{"uid": uid, "name": name, "owner__username": "me", "deployment_status": "deployed",
+                "settings": {}} for uid, name in [("a", "Survey"), ("b", ""), ("c", None)]]
+    current = metadata.metadata_frame(records)
+    imported = pd.DataFrame({"UID": ["a", "b", "c", "zzz"], "PII": ["Yes"] * 4})
+
+    valid, problems = metadata.validate_import(imported, current)
+
+    # Unnamed assets are hidden from the switcher grids, and an import can't reach them either
+    assert valid["UID"].tolist() == ["a"]
+    assert problems["UID"].tolist() == ["b", "c", "zzz"]
+    assert set(problems["problem"]) == {"not a named asset of this account"}
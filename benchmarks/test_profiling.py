@@ -0,0 +1,50 @@
+import os
+import threading
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from src import profiling
+
+
+@pytest.fixture(autouse=True)
+def run_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_run_dir", lambda page: str(tmp_path))
+    monkeypatch.setenv(profiling.PROFILE_ENV, "1")
+    return tmp_path
+
+
+def test_run_is_saved_on_its_own_thread():
+    run = profiling.start("page")
+    sum(range(1000))
+
+    path = profiling.stop(run)
+    assert path is not None and os.path.exists(path)
+
+
+def test_run_from_another_thread_is_dropped():
+    # A Streamlit rerun is a new thread: a profiler left over by the previous
+    # run must not crash it
+    runs = []
+    thread = threading.Thread(target=lambda: runs.append(profiling.start("page")))
+    thread.start()
+    thread.join()
+
+    assert profiling.stop(runs[0]) is None
+    # ...and profiling the new run still works
+    assert profiling.stop(profiling.start("page")) is not None
+
+
+def test_page_run_saves_a_stopped_run():
+    def page():
+        import streamlit as st
+
+        from src import ui
+
+        with ui.page_run():
+            st.write("body")
+            st.stop()
+
+    at = AppTest.from_function(page).run()
+    assert not at.exception
+    assert os.path.exists(at.session_state["profile_last"]["path"])
@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from src import versions
+from src.utils import VERSION_COLUMN, label2name_sheet, relabel_sheet, relabel_sheets
+from src.xlsform import XLSForm
+
+LABEL = "label::English"
+
+
+def _form(color_labels, label=LABEL, extra=True):
+    # select_one `color`, select_multiple `fruit`, a text question and, optionally, select_one `size`
+    survey = pd.DataFrame({
+        "type": ["select_one colors", "select_multiple fruits", "text"] + (["select_one sizes"] if extra else []),
+        "name": ["color", "fruit", "comment"] + (["size"] if extra else []),
+        label: ["Colour", "Fruit", "Comment"] + (["Size"] if extra else []),
+    })
+    choices = pd.DataFrame({
+        "list_name": ["colors", "colors", "fruits", "fruits", "sizes"],
+        "name": ["r", "b", "a", "p", "s"],
+        label: [*color_labels, "Apple", "Pear", "Small"],
+    })
+    return XLSForm.from_frames(survey, choices)
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({
+        "color": ["r", "b", None],
+        "fruit": ["a p", "p", "a"],
+        "fruit/a": [1, 0, 1],
+        "fruit/p": [1, 1, 0],
+        "comment": ["x", "y", "z"],
+        "size": ["s", "s", "s"],
+    })
+
+
+def test_label_to_xml_round_trip(data):
+    form = _form(["Red", "Blue"])
+
+    labeled = relabel_sheet(form, data, LABEL, "/")
+    assert list(labeled.columns) == ["Colour", "Fruit", "Fruit/Apple", "Fruit/Pear", "Comment", "Size"]
+    assert labeled["Fruit"].tolist() == ["Apple;Pear", "Pear", "Apple"]
+
+    back = label2name_sheet(form, labeled, LABEL, "/")
+    pd.testing.assert_frame_equal(back.astype(object), data.astype(object), check_dtype=False)
+
+
+
+def test_choice_columns_are_ordered_by_declaration(data):
+    labeled = relabel_sheet(_form(["Red", "Blue"]), data, LABEL, "/")
+
+    colour = labeled["Colour"]
+    assert colour.cat.ordered
+    assert colour.cat.categories.tolist() == ["Red", "Blue"]
+    # Sorting follows the choice list, not the alphabet
+    assert colour.sort_values().tolist()[:2] == ["Red", "Blue"]
+    assert labeled["Fruit"].cat.ordered
+    assert labeled["Fruit"].cat.categories.tolist() == ["Apple", "Apple;Pear", "Pear"]
+
+def test_rows_use_their_own_version(data):
+    form = _form(["Red", "Blue"])
+    # v1 called "r" something else and had no `size` question yet
+    version_forms = {"v1": _form(["Old red", "Blue"], extra=False), "v2": form}
+    data[VERSION_COLUMN] = ["v1", "v2", "unknown"]
+    data.loc[2, "color"] = "r"
+
+    out, = relabel_sheets(form, ["main"], [data], LABEL, "/", version_forms=version_forms)
+
+    assert out["Colour"].tolist() == ["Old red", "Blue", "Red"]
+    # Questions a version lacks, and unknown versions, fall back to the uploaded form
+    assert out["Size"].tolist() == ["Small"] * 3
+    assert out["Fruit"].tolist() == ["Apple;Pear", "Pear", "Apple"]
+
+
+def test_versions_without_the_label_fall_back(data):
+    form = _form(["Red", "Blue"])
+    version_forms = {"v1": _form(["Old red", "Blue"], label="label::English (en)")}
+    data[VERSION_COLUMN] = "v1"
+    data.loc[2, "color"] = "r"
+
+    assert versions.missing_label(version_forms, LABEL) == ["v1"]
+    out, = relabel_sheets(form, ["main"], [data], LABEL, "/", version_forms=version_forms)
+    assert out["Colour"].tolist() == ["Red", "Blue", "Red"]
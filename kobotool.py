@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+"""
+Command-line entry point: ``python kobotool.py --help``.
+"""
+import sys
+
+from src.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
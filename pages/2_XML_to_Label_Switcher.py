@@ -1,221 +1,306 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import zipfile
-import io
-from src.utils import *
+from src.utils import label2name_sheets, make_unique_columns, relabel_languages, relabel_sheets
+from src.xlsform import XLSForm
+from src import export, identity, kobo_api, ui, versions
+from src.config import get_config
+from src.lazy import lazy_import
 
+pd = lazy_import("pandas")
 
 
-st.set_page_config(page_title="XML to Label Switcher", layout="wide")
 
-st.title("🔁 Switch from XML to Label")
+st.set_page_config(page_title="XML to Label Switcher", layout="wide")
+with ui.page_run():
 
-st.markdown("""
-            This tool lets you switch your dataset from **XML (variable names)** to **Label format** (human-readable).  
-            You need to upload both the **modified data** and the **original Kobo XLSForm**.
-            """)
+    st.title("🔁 Switch from XML to Label")
 
-with st.expander("ℹ️ How it works"):
     st.markdown("""
-                1. Upload the **modified dataset** and the **original Kobo XLSForm**.
-                2. Select the **label language** you want to switch to.
-                3. Click **Run Switch** to update both column headers and values.
-                4. Preview or download the converted dataset.
+                This tool lets you switch your dataset from **XML (variable names)** to **Label format** (human-readable),
+                or back from labels to XML names.  
+                You need to upload both the **modified data** and the **original Kobo XLSForm**.
                 """)
-    
-# -------- Session state init --------
-for key in ["data_excel", "form_excel", "tool_survey", "tool_choices", 
-            "data_list", "label", "sep", "switch_triggered",
-              "switch_complete","files_accepted", "preview_df"]:
-    if key not in st.session_state:
-        st.session_state[key] = None
-# st.session_state.switch_triggered = False
-# st.session_state.files_accepted = False
-
-# ----- FORM UPLOAD ------
-if ("data_excel" not in st.session_state or st.session_state.data_excel is None) and ("form_excel" not in st.session_state or st.session_state.form_excel is None):
-    auth_box = st.empty()  # placeholder so we can clear the form immediately
-    with auth_box.form(key="upload_form", clear_on_submit=True):
-        st.subheader("📁 Upload Data and Form")
-
-        col1, col2 = st.columns(2)
-        with col1:
-            data = st.file_uploader("Upload Modified Data File", type="xlsx")
-        with col2:
-            tool = st.file_uploader("Upload Kobo XLSForm", type="xlsx")
-            sep = st.selectbox("Select seperator used in select_multiple column names", 
-                              options=["/",".","__"])
-            st.session_state.sep = sep
-
-        submit = st.form_submit_button("Upload")
-
-
-    if submit and data and tool:
-        try:
-            st.session_state.data_excel = pd.ExcelFile(data)
-            st.session_state.form_excel = pd.ExcelFile(tool)
-            st.session_state.switch_complete = False  # Reset after upload
-            # Validate Receiver
-            if "survey" in st.session_state.form_excel.sheet_names and "choices" in st.session_state.form_excel.sheet_names:
-                auth_box.empty()
-                st.session_state.files_accepted = True
-                st.rerun()
-            else:
-                st.error("❌ Kobo form must include 'survey' and 'choices' sheets.")
-        except Exception as e:
-            st.error(f"❌ Failed to read Excel files: {e}")
-
-if st.session_state.files_accepted:
-    with st.container(border=True):
-        st.markdown("**✅ Files loaded**")
-        st.write(f"- Data sheets: {', '.join(st.session_state.data_excel.sheet_names)}")
-        st.write(f"- Form sheets: {', '.join(st.session_state.form_excel.sheet_names)}")
-        st.write(f"- Separator: `{st.session_state.sep}`")
-
-# st.session_state.switch_complete = False
-# st.session_state.files_accepted = True
-# ----- FIXING FORM ------
-if st.session_state.form_excel and st.session_state.files_accepted:
-    # Add new list_name and q_type columns to tool_survey
-    tool_survey = st.session_state.form_excel.parse('survey')
-    tool_survey = tool_survey[tool_survey['name'].notna()].copy()
-    tool_survey["q_type"] = tool_survey['type'].apply(q_type)
-    tool_survey['list_name'] = tool_survey['type'].apply(list_name)
-    st.session_state.tool_survey = tool_survey
-
-    # Filter all na from list_name in tool_choice
-    tool_choices = st.session_state.form_excel.parse('choices')
-    tool_choices = tool_choices[tool_choices['list_name'].notna()].copy()
-    st.session_state.tool_choices = tool_choices
-
-# ----- CHOOSE LABEL ------
-if st.session_state.tool_survey is not None:
-    label_colname = [col for col in st.session_state.tool_survey.columns if 'label' in col]
-
-    if len(label_colname) > 1:
-        label = st.selectbox(
-            "🌍 Select label language",
-            options= label_colname,
-        )
-        if label:
-            st.session_state.label = label
-            st.success(f"Label column selected: `{label}`")
-    elif len(label_colname) == 1:
-        label = label_colname[0]
-        st.session_state.label = label
-        st.info(f"Only one label found. Using: `{label}`")
-    else:
-        st.error("❌ No label columns found in survey sheet.")
-        
-
-# ----- FIXING DATA ------
-if st.session_state.data_excel and st.session_state.files_accepted:
-    # Read all the data inside a data_list
-    data_list = [st.session_state.data_excel.parse(sheet) for sheet in st.session_state.data_excel.sheet_names]
-    st.session_state.data_list = data_list
-
-# ----- Button to Run Switch -----
-if st.session_state.label and st.session_state.data_list and st.session_state.tool_survey is not None:
-    if st.button("🔁 Run Switch"):
-        st.session_state.switch_triggered = True
-        st.session_state.switch_complete = False
-        st.session_state.preview_df = None
-        st.rerun()
-
-# ----- Apply Switch -----
-if st.session_state.switch_triggered and not st.session_state.switch_complete:
-    with st.spinner("Switching column headers and choice values..."):
-        data_list = st.session_state.data_list
-        tool_survey = st.session_state.tool_survey
-        tool_choices = st.session_state.tool_choices
-        label = st.session_state.label
-        sep = st.session_state.sep
-
-        tool_s_one = tool_survey[tool_survey['q_type'] == "select_one"]
-        tool_s_multi = tool_survey[tool_survey['q_type'] == "select_multiple"]
-
-        progress = st.progress(0)
-        total_steps = len(data_list) * 3
-        step = 0
-
-        for i in range(len(data_list)):
-            data = data_list[i]
-            data_columns = data.columns
-
-            # Remove NA columns first
-            data = data.loc[:, ~data.columns.isna()]
-
-            # Select One
-            for col in tool_s_one['name']:
-                if col in data.columns:
-                    data[col] = name2label_choices_one(tool_survey, tool_choices, label, data, col)
-            step += 1
-            progress.progress(step / total_steps)
-
-            # Select Multiple
-            for col in tool_s_multi['name']:
-                if col in data.columns:
-                    data[col] = name2label_choices_multiple(tool_survey, tool_choices, data, col, label, sep)
-            step += 1
-            progress.progress(step / total_steps)
-
-            # Rename Headers
-            new_col_names = [name2label_questions(tool_survey, tool_choices, col, label, sep) for col in data.columns]
-            data.columns = new_col_names
-            data_list[i] = data
-
-            step += 1
-            progress.progress(step / total_steps)
 
+    with st.expander("ℹ️ How it works"):
+        st.markdown("""
+                    1. Upload the **modified dataset** and the **original Kobo XLSForm**.
+                    2. Choose the **direction** and the **label language** to switch to (or from),
+                       or switch to every label language at once.
+                    3. If the data mixes several form versions, optionally fetch them from Kobo
+                       so each submission is labeled with its own version.
+                    4. Click **Run Switch** to update both column headers and values.
+                    5. Preview or download the converted dataset.
+                    """)
+
+    # -------- Session state init --------
+    for key in ["data_excel", "form_excel", "form",
+                "data_list", "switched_list", "label", "sep", "switch_triggered",
+                  "switch_complete","files_accepted", "preview_df", "exports", "version_forms",
+                  "switched_languages", "data_versions"]:
+        if key not in st.session_state:
+            st.session_state[key] = None
+
+
+    def reset_switch():
+        # Drop the switched data and the downloads of the previous switch (and their temp files)
+        for artifact in (st.session_state.exports or {}).values():
+            export.discard(artifact)
+        st.session_state.exports = None
+        st.session_state.switched_list = None
+        st.session_state.switched_languages = None
+        st.session_state.preview_df = None
+        st.session_state.switch_complete = False
+    # st.session_state.switch_triggered = False
+    # st.session_state.files_accepted = False
+
+    # ----- FORM UPLOAD ------
+    if ("data_excel" not in st.session_state or st.session_state.data_excel is None) and ("form_excel" not in st.session_state or st.session_state.form_excel is None):
+        auth_box = st.empty()  # placeholder so we can clear the form immediately
+        with auth_box.form(key="upload_form", clear_on_submit=True):
+            st.subheader("📁 Upload Data and Form")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                data = st.file_uploader("Upload Modified Data File", type="xlsx")
+            with col2:
+                tool = st.file_uploader("Upload Kobo XLSForm", type="xlsx")
+                sep = st.selectbox("Select seperator used in select_multiple column names", 
+                                  options=["/",".","__"])
+                st.session_state.sep = sep
+
+            submit = st.form_submit_button("Upload")
+
+
+        if submit and data and tool:
+            try:
+                st.session_state.data_excel = pd.ExcelFile(data)
+                st.session_state.form_excel = pd.ExcelFile(tool)
+                st.session_state.form = None
+                st.session_state.data_list = None
+                st.session_state.data_versions = None
+                st.session_state.version_forms = None
+                reset_switch()
+                # Validate Receiver
+                if "survey" in st.session_state.form_excel.sheet_names and "choices" in st.session_state.form_excel.sheet_names:
+                    auth_box.empty()
+                    st.session_state.files_accepted = True
+                    st.rerun()
+                else:
+                    st.error("❌ Kobo form must include 'survey' and 'choices' sheets.")
+            except Exception as e:
+                st.error(f"❌ Failed to read Excel files: {e}")
+
+    if st.session_state.files_accepted:
+        with st.container(border=True):
+            st.markdown("**✅ Files loaded**")
+            st.write(f"- Data sheets: {', '.join(st.session_state.data_excel.sheet_names)}")
+            st.write(f"- Form sheets: {', '.join(st.session_state.form_excel.sheet_names)}")
+            st.write(f"- Separator: `{st.session_state.sep}`")
+
+    # st.session_state.switch_complete = False
+    # st.session_state.files_accepted = True
+    # ----- FIXING FORM ------
+    if st.session_state.form_excel and st.session_state.files_accepted and st.session_state.form is None:
+        # Parse the form once; every later step reads from this model
+        st.session_state.form = XLSForm.from_excel(st.session_state.form_excel)
+
+    # ----- CHOOSE DIRECTION AND LABEL ------
+    XML_TO_LABEL, LABEL_TO_XML = "XML → Label", "Label → XML"
+    if st.session_state.form is not None:
+        st.radio("Direction", options=[XML_TO_LABEL, LABEL_TO_XML], horizontal=True, key="direction",
+                 help="Label → XML turns a labeled dataset back into XML names, e.g. for re-import, "
+                      "and explodes ';'-joined select_multiple answers into their choice columns.")
+        label_colname = list(st.session_state.form.label_columns)
+
+        if len(label_colname) > 1:
+            label = st.selectbox(
+                "🌍 Select label language",
+                options= label_colname,
+            )
+            if label:
+                st.session_state.label = label
+                st.success(f"Label column selected: `{label}`")
+        elif len(label_colname) == 1:
+            label = label_colname[0]
+            st.session_state.label = label
+            st.info(f"Only one label found. Using: `{label}`")
+        else:
+            st.error("❌ No label columns found in survey sheet.")
+
+        if len(label_colname) > 1 and st.session_state.get("direction") != LABEL_TO_XML:
+            st.checkbox("🌐 Switch to every label language in one pass", key="all_languages",
+                        help="The data is read once and each language reuses the matching done for the "
+                             "others; download one file per language or one file with every language.")
+
+
+    # ----- FIXING DATA ------
+    # The sheets are read until a switch completes, then dropped (the switched
+    # sheets replace them) and read again if another switch is run
+    if (st.session_state.data_excel and st.session_state.files_accepted and st.session_state.data_list is None
+            and not st.session_state.switch_complete):
+        data_list = [st.session_state.data_excel.parse(sheet) for sheet in st.session_state.data_excel.sheet_names]
         st.session_state.data_list = data_list
-        prewiew = data_list[0].head().copy()
-        prewiew.columns = make_unique_columns(prewiew.columns)
-        st.session_state.preview_df = prewiew
-        st.session_state.switch_complete = True
-        st.session_state.switch_triggered = False
-        
-    st.success("✅ Switch complete!")
-
-if st.session_state.preview_df is not None:
-    st.subheader("👀 Preview (first sheet, first 5 rows)")
-    st.dataframe(st.session_state.preview_df, use_container_width=True)
-
-if st.session_state.switch_complete and st.session_state.data_list:
-    st.subheader("📥 Download your switched dataset")
-
-    # Download Excel
-    excel_buffer = io.BytesIO()
-    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-        original_sheet_names = st.session_state.data_excel.sheet_names
-        # then inside the writer:
-        for idx, df in enumerate(st.session_state.data_list):
-            sheet_name = original_sheet_names[idx]
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-    excel_bytes = excel_buffer.getvalue()
-
-    st.download_button(
-        label="📄 Download as Excel (.xlsx)",
-        data=excel_bytes,
-        file_name="relabeled_data.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-    # Download CSV ZIP
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for idx, df in enumerate(st.session_state.data_list):
-            csv_bytes = df.to_csv(index=False).encode('utf-8')
-            zipf.writestr(f"Sheet{idx + 1}.csv", csv_bytes)
-    zip_bytes = zip_buffer.getvalue()
-
-    st.download_button(
-        label="🗂️ Download as CSV (.zip)",
-        data=zip_bytes,
-        file_name="relabeled_data.zip",
-        mime="application/zip"
-    )
+        st.session_state.data_versions = versions.versions_in(data_list)
+
+    # ----- FORM VERSIONS ------
+    if st.session_state.data_versions is not None and st.session_state.form is not None:
+        data_versions = st.session_state.data_versions
+        if len(data_versions) > 1 and st.session_state.get("direction") != LABEL_TO_XML:
+            with st.container(border=True):
+                st.markdown(f"**🕘 The data mixes {len(data_versions)} form versions**")
+                if st.session_state.version_forms is not None:
+                    found = len(st.session_state.version_forms)
+                    st.success(f"{found} of {len(data_versions)} versions fetched: their submissions will be "
+                               "labeled with their own version, any other with the uploaded form.")
+                    labels = list(st.session_state.form.label_columns) if st.session_state.get("all_languages") \
+                        else [st.session_state.label]
+                    for lang in labels:
+                        missing = versions.missing_label(st.session_state.version_forms, lang)
+                        if missing:
+                            st.warning(f"⚠️ {len(missing)} fetched version(s) have no `{lang}` column: their "
+                                       "submissions will be labeled with the uploaded form in that language.")
+                else:
+                    st.caption("Choices renamed or removed since a submission was made only keep their "
+                               "label with that submission's version. Fetch the versions from Kobo, or "
+                               "switch everything with the uploaded form.")
+                    root = kobo_api.api_root(st.session_state.get("kobo_url") or get_config().kobo.server)
+                    owner = ui.use_identity("owner", root)
+                    with st.form(key="versions_form"):
+                        asset_uid = st.text_input("Asset UID", placeholder="e.g. aBcD1234efGH")
+                        token = None
+                        if owner is None:
+                            token = st.text_input("API Token", placeholder="Paste your API token", type="password")
+                        fetch = st.form_submit_button("Fetch versions")
+                    if fetch and asset_uid:
+                        user = owner or identity.resolve(root, token)
+                        if user is None:
+                            st.error("❌ Invalid token. Please try again.")
+                        else:
+                            ui.remember_identity("owner", user)
+                            try:
+                                with st.spinner("Fetching form versions..."):
+                                    forms = versions.fetch_forms(root, user.headers, asset_uid.strip(), data_versions)
+                            except kobo_api.KoboAPIError as e:
+                                st.error(f"❌ {e}")
+                            else:
+                                st.session_state.version_forms = forms
+                                st.rerun()
+
+    # ----- Button to Run Switch -----
+    if st.session_state.label and st.session_state.data_versions is not None and st.session_state.form is not None:
+        if st.button("🔁 Run Switch"):
+            reset_switch()
+            st.session_state.switch_triggered = True
+            st.rerun()
+
+    # ----- Apply Switch -----
+    if st.session_state.switch_triggered and not st.session_state.switch_complete:
+        with st.spinner("Switching column headers and choice values..."):
+            data_list = list(st.session_state.data_list)
+            form = st.session_state.form
+            label = st.session_state.label
+            sep = st.session_state.sep
+
+            all_languages = st.session_state.get("all_languages") and st.session_state.get("direction") != LABEL_TO_XML
+            labels = list(form.label_columns) if all_languages else [label]
+
+            progress = st.progress(0)
+            total_steps = len(data_list) * 3 * (len(labels) if st.session_state.version_forms else 1)
+            step = 0
+
+            def advance(stage):
+                global step
+                step += 1
+                progress.progress(step / total_steps)
+
+            # Relabel each sheet against the repeat group it was exported from,
+            # and each row against its form version when those were fetched
+            sheet_names = st.session_state.data_excel.sheet_names
+            st.session_state.switched_languages = None
+            if st.session_state.get("direction") == LABEL_TO_XML:
+                data_list = label2name_sheets(form, sheet_names, data_list, label, sep, on_stage=advance)
+            elif all_languages:
+                # Every language at once; the preview shows the first one
+                switched = relabel_languages(form, sheet_names, data_list, labels, sep,
+                                             version_forms=st.session_state.version_forms, on_stage=advance)
+                st.session_state.switched_languages = switched
+                data_list = switched[labels[0]]
+            else:
+                data_list = relabel_sheets(form, sheet_names, data_list, label, sep,
+                                           version_forms=st.session_state.version_forms, on_stage=advance)
+
+            st.session_state.switched_list = data_list
+            st.session_state.data_list = None
+            prewiew = data_list[0].head().copy()
+            prewiew.columns = make_unique_columns(prewiew.columns)
+            st.session_state.preview_df = prewiew
+            st.session_state.switch_complete = True
+            st.session_state.switch_triggered = False
+
+        st.success("✅ Switch complete!")
+
+    if st.session_state.preview_df is not None:
+        st.subheader("👀 Preview (first sheet, first 5 rows)")
+        st.dataframe(st.session_state.preview_df, use_container_width=True)
+
+    if st.session_state.switch_complete and st.session_state.switched_list:
+        st.subheader("📥 Download your switched dataset")
+
+        # file name, mime type and writer for each download format
+        stem = "xml_data" if st.session_state.get("direction") == LABEL_TO_XML else "relabeled_data"
+        export_formats = {
+            "Excel (.xlsx)": (f"{stem}.xlsx",
+                              "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                              export.write_excel),
+            "CSV (.zip)": (f"{stem}.zip", "application/zip", export.write_csv_zip),
+            "Parquet (.zip)": (f"{stem}_parquet.zip", "application/zip", export.write_parquet_zip),
+            "Feather (.zip)": (f"{stem}_feather.zip", "application/zip", export.write_feather_zip),
+        }
+        export_format = st.radio("Format", options=list(export_formats), horizontal=True)
+        file_name, mime, writer = export_formats[export_format]
+
+        # One artifact per language, or a single one holding every language
+        sheet_names = st.session_state.data_excel.sheet_names
+        languages = st.session_state.switched_languages
+        downloads = [None]
+        if languages:
+            layout = st.radio("Layout", options=["One file per language", "One file with every language"],
+                              horizontal=True)
+            downloads = list(languages) if layout == "One file per language" else ["all"]
+
+        def sheets_of(language):
+            if language is None:
+                return st.session_state.switched_list, sheet_names
+            if language == "all":
+                return export.combine_languages(languages, sheet_names)
+            return languages[language], sheet_names
+
+        # Build each artifact once per completed switch, not on every rerun
+        if st.session_state.exports is None:
+            st.session_state.exports = {}
+        for language in downloads:
+            key = (export_format, language)
+            if key not in st.session_state.exports:
+                frames, names = sheets_of(language)
+                with st.spinner(f"Preparing {export_format}..."):
+                    st.session_state.exports[key] = writer(frames, names, size_hint=export.estimate_size(frames),
+                                                           spool_dir=ui.spool_dir())
+
+            language_file = file_name
+            if language == "all":
+                language_file = file_name.replace(stem, f"{stem}_all_languages", 1)
+            elif language is not None:
+                language_file = file_name.replace(stem, f"{stem}_{export.language_slug(language)}", 1)
+            st.download_button(
+                label=f"📄 Download as {export_format}" + (f" ({export.language_name(language)})"
+                                                           if language not in (None, "all") else ""),
+                data=st.session_state.exports[key],
+                file_name=language_file,
+                mime=mime,
+                key=f"download_{language}",
+            )
+
+ui.timings_panel()
+ui.profile_panel()
 
     # Footer
 st.markdown(
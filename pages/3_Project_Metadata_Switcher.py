@@ -1,403 +1,204 @@
 
 import streamlit as st
-import pandas as pd
-import requests
-import time
+from src import identity, jobs, kobo_api, metadata, planner, ui
+from src.config import get_config
 
 
 st.set_page_config(page_title="Metadata Switchers", layout="wide")
+with ui.page_run():
 
-st.title("🔁 Project Metadata Switchers")
-
-st.markdown("""
-Manage **bulk metadata updates** for your Kobo projects.  
-Use the tabs below to switch between **PII**, **Function** and **Legal Entity** switchers.
-""")
-if "kobo_url" not in st.session_state:
-    st.session_state.kobo_url = None
-
-kobo_url = st.sidebar.text_input("Please enter the kobo url", value = "https://kobo.drc.ngo")
-st.session_state.kobo_url = kobo_url
-
-CONFIG = {
-    "API_ROOT": f"{st.session_state.kobo_url}/api/v2"
-}
-
-
-# --- SESSION STATE INITIALIZATION ---
-for key in ["owner_token", "owner_username", "df_assets_original_pii",
-            "df_assets_edited_pii", "changes_pii", "assets_changes_pii",
-            "df_assets_original_func", "df_assets_edited_func", "changes_func",
-            "df_assets_original_legalentity", "df_assets_edited_legalentity", 
-            "changes_legalentity", "assets_changes_legalentity", "confirm_apply_legalentity",
-            "assets_changes_func", "header_owner", "confirm_apply_pii", "confirm_apply_func"]:
-    if key not in st.session_state:
-        st.session_state[key] = None
-
-# --- AUTH FORM ---
-if "owner_username" not in st.session_state or st.session_state.owner_username is None:
-    auth_box = st.empty()  # placeholder so we can clear the form immediately
-    with auth_box.form(key="token_form", clear_on_submit=True):
-        st.subheader("🔐 API Token")
-        owner_token = st.text_input("Owner User Token", placeholder="Paste your API token", type="password")
-        submit_tokens = st.form_submit_button("Authenticate")
-
-        if submit_tokens:
-            headers_owner = {"Authorization": f"Token {owner_token}"}
-            resp = requests.get(f"{CONFIG['API_ROOT']}/access-logs/me/?format=json&limit=1", headers=headers_owner)
-
-            if resp.status_code == 200:
-                st.session_state.owner_token = owner_token
-                st.session_state.owner_username = resp.json()['results'][0]['username']
-                st.session_state.header_owner = headers_owner  # keep this exact key name consistent everywhere
-                # instantly remove the form and rerun so the tabs show up right away
-                auth_box.empty()
-                st.rerun()
-            else:
-                st.error("❌ Invalid token. Please try again.")
-
-# --- MAIN TABS ---
-if st.session_state.owner_username:
-    st.subheader("✅ Authenticated Users")
-    st.markdown("**👤 Owner Username**")
-    st.info(st.session_state.owner_username)
-
-    tabs = st.tabs(["🔒 PII Switcher", "🏷️ Function Switcher", "🌍 Legal Entity Switcher"])
-
-    # ----------- PII TAB -----------
-    with tabs[0]:
-        st.subheader("PII Switcher")
-        # Fetch assets
-        asset_resp = requests.get(f"{CONFIG['API_ROOT']}/assets/?format=json&limit=100000", headers=st.session_state.header_owner)
-        if asset_resp.status_code == 200:
-            assets_data = asset_resp.json()['results']
-            df_assets = pd.DataFrame([
-                {
-                    "UID": a["uid"],
-                    "Name": a["name"],
-                    "owner_username": a["owner__username"],
-                    "PII": (
-                        a.get("settings", {}).get("collects_pii", {}).get("value")
-                        if a.get("settings", {}).get("collects_pii") is not None
-                        else a.get("settings", {}).get("collect_pii")
-                    )
-                }
-                for a in assets_data
-            ])
-            df_assets = df_assets[(df_assets["Name"] != "") & (df_assets["owner_username"] == st.session_state.owner_username)]
-            st.session_state.df_assets_original_pii = df_assets[["UID", "Name", "PII"]].copy()
-
-        column_config = {
-            "PII": st.column_config.SelectboxColumn(
-                "PII",
-                help="Does this asset collect PII?",
-                options=["Yes", "No"],
-                required=True
-            )
-        }
-
-        edited_df = st.data_editor(
-            st.session_state.df_assets_original_pii,
-            column_config=column_config,
-            disabled=["UID", "Name"],
-            use_container_width=True,
-            num_rows="fixed",
-            hide_index=True
-        )
-        st.session_state.df_assets_edited_pii = edited_df
-
-        # Detect changes
-        changes = edited_df[edited_df["PII"] != st.session_state.df_assets_original_pii["PII"]]
-        st.session_state.changes_pii = changes
-        st.session_state.assets_changes_pii = not changes.empty
+    st.title("🔁 Project Metadata Switchers")
 
-        st.subheader("🔍 Review Changes")
-        if changes.empty:
-            st.success("✅ No changes detected.")
-        else:
-            st.dataframe(changes)
-            if not st.session_state.get("confirm_apply_pii"):
-                if st.button("✅ Confirm and Apply Changes", key="pii_confirm"):
-                    st.session_state.confirm_apply_pii = True
-
-        # Apply changes
-        if st.session_state.assets_changes_pii and st.session_state.confirm_apply_pii:
-            total = len(changes)
-            success_count = 0
-            progress_bar = st.progress(0, text="Initializing update...")
-
-            for i, (_, row) in enumerate(changes.iterrows()):
-                payload = {
-                    "settings": {
-                        "collects_pii": {
-                            "label": row["PII"],
-                            "value": row["PII"]
-                        }
-                    }
-                }
-                r = requests.patch(
-                    f"{CONFIG['API_ROOT']}/assets/{row['UID']}/?format=json",
-                    json=payload,
-                    headers=st.session_state.header_owner
-                )
-                if r.status_code == 200:
-                    success_count += 1
-                else:
-                    st.error(f"❌ Failed UID {row['UID']}: {r.status_code}")
-
-                progress_bar.progress((i+1)/total, text=f"{success_count}/{total} updated...")
-                time.sleep(0.05)
-
-            st.success(f"🎉 Finished! {success_count} out of {total} assets updated.")
-            st.session_state.confirm_apply_pii = False
-
-    # ----------- FUNCTION TAB -----------
-    with tabs[1]:
-        st.subheader("Function Switcher")
-
-        sector_options = [
-            "Programme - Protection",
-            "Programme - CCCM",
-            "Programme - Economic Recovery",
-            "Programme - HDP",
-            "Programme - Shelter & Settlement",
-            "Programme - WASH",
-            "MEAL",
-            "Information Management",
-            "Safety",
-            "Grants Management",
-            "HR",
-            "Supply Chain",
-            "IT",
-            "Finance",
-            "Risk and Compliance",
-            "Advocacy and Communication",
-            "Safeguarding and CoC",
-            "Programme Development and Quality",
-            "Other"
-        ]
-
-        # Fetch assets
-        asset_resp = requests.get(f"{CONFIG['API_ROOT']}/assets/?format=json&limit=100000", headers=st.session_state.header_owner)
-        if asset_resp.status_code == 200:
-            assets_data = asset_resp.json()['results']
-            df_assets = pd.DataFrame([
-                {
-                    "UID": a["uid"],
-                    "Name": a["name"],
-                    "owner_username": a["owner__username"],
-                    "Function": (
-                        a.get("settings", {}).get("sector", {}).get("value", None)
-                        if a.get("settings", {}).get("sector")
-                        else None
-                        )
-                }
-                for a in assets_data
-            ])
-            df_assets = df_assets[(df_assets["Name"] != "") & (df_assets["owner_username"] == st.session_state.owner_username)]
-            st.session_state.df_assets_original_func = df_assets[["UID", "Name", "Function"]].copy()
-
-        column_config = {
-            "Function": st.column_config.SelectboxColumn(
-                "Function",
-                help="Select the function/sector for this asset",
-                options=sector_options,
-                required=True
-            )
-        }
-
-        edited_df = st.data_editor(
-            st.session_state.df_assets_original_func,
-            column_config=column_config,
-            disabled=["UID", "Name"],
-            use_container_width=True,
-            num_rows="fixed",
-            hide_index=True
-        )
-        st.session_state.df_assets_edited_func = edited_df
-
-        # Detect changes
-        changes = edited_df[edited_df["Function"] != st.session_state.df_assets_original_func["Function"]]
-        st.session_state.changes_func = changes
-        st.session_state.assets_changes_func = not changes.empty
+    st.markdown("""
+    Manage **bulk metadata updates** for your Kobo projects.  
+    Use the tabs below to switch between **PII**, **Function** and **Legal Entity** switchers.
+    """)
+    if "kobo_url" not in st.session_state:
+        st.session_state.kobo_url = None
 
-        st.subheader("🔍 Review Changes")
-        if changes.empty:
-            st.success("✅ No changes detected.")
-        else:
-            st.dataframe(changes)
-            if not st.session_state.get("confirm_apply_func"):
-                if st.button("✅ Confirm and Apply Changes", key="func_confirm"):
-                    st.session_state.confirm_apply_func = True
-
-        # Apply changes
-        if st.session_state.assets_changes_func and st.session_state.confirm_apply_func:
-            total = len(changes)
-            success_count = 0
-            progress_bar = st.progress(0, text="Initializing update...")
-
-            for i, (_, row) in enumerate(changes.iterrows()):
-                payload = {
-                    "settings": {
-                        "sector": {
-                            "label": row["Function"],
-                            "value": row["Function"]
-                        }
-                    }
-                }
-                r = requests.patch(
-                    f"{CONFIG['API_ROOT']}/assets/{row['UID']}/?format=json",
-                    json=payload,
-                    headers=st.session_state.header_owner
-                )
-                if r.status_code == 200:
-                    success_count += 1
+    kobo_url = st.sidebar.text_input("Please enter the kobo url", value=st.session_state.kobo_url or get_config().kobo.server)
+    st.session_state.kobo_url = kobo_url
+
+    CONFIG = {
+        "API_ROOT": kobo_api.api_root(st.session_state.kobo_url)
+    }
+
+
+    # --- SESSION STATE INITIALIZATION ---
+    for key in ["confirm_apply_metadata", "job_metadata"]:
+        if key not in st.session_state:
+            st.session_state[key] = None
+    if "import_gen" not in st.session_state:
+        st.session_state.import_gen = 0
+
+    ui.use_identity("owner", CONFIG['API_ROOT'])
+
+    # --- AUTH FORM ---
+    if "owner_username" not in st.session_state or st.session_state.owner_username is None:
+        auth_box = st.empty()  # placeholder so we can clear the form immediately
+        with auth_box.form(key="token_form", clear_on_submit=True):
+            st.subheader("🔐 API Token")
+            owner_token = st.text_input("Owner User Token", placeholder="Paste your API token", type="password")
+            submit_tokens = st.form_submit_button("Authenticate")
+
+            if submit_tokens:
+                owner = identity.resolve(CONFIG['API_ROOT'], owner_token)
+
+                if owner:
+                    ui.remember_identity("owner", owner)
+                    # instantly remove the form and rerun so the tabs show up right away
+                    auth_box.empty()
+                    st.rerun()
                 else:
-                    st.error(f"❌ Failed UID {row['UID']}: {r.status_code}")
-
-                progress_bar.progress((i+1)/total, text=f"{success_count}/{total} updated...")
-                time.sleep(0.05)
-
-            st.success(f"🎉 Finished! {success_count} out of {total} assets updated.")
-            st.session_state.confirm_apply_func = False
-     # ----------- LEGAL ENTITY TAB -----------
-    with tabs[2]:
-        st.subheader("Legal Entity Switcher - Specific for kobo.drc.ngo")
-
-        legalentity_options = [
-            "DKHQ - DKHQ",
-            "INET Implementing Network - INET",
-            "Myanmar - MMR",
-            "Serbia - SRB",
-            "Bosnia and Herzegovina - BIH",
-            "Ukraine - UKR",
-            "Poland - POL",
-            "Kosovo - XKX",
-            "Bangladesh - BGD",
-            "Afghanistan - AFG",
-            "Georgia - GEO",
-            "Italy - ITA",
-            "Greece - GRC",
-            "Mali - MLI",
-            "Niger - NER",
-            "Nigeria - NGA",
-            "Venezuela - VEN",
-            "Mexico - MEX",
-            "Cameroon - CMR",
-            "Chad - TCD",
-            "Burkina Faso - BFA",
-            "Central African Republic - CAF",
-            "Colombia - COL",
-            "Syria - SYR",
-            "Tunisia - TUN",
-            "Yemen - YEM",
-            "Algeria - DZA",
-            "Iraq - IRQ",
-            "Jordan - JOR",
-            "Lebanon - LBN",
-            "Libya - LBY",
-            "Somalia - SOM",
-            "South Sudan - SSD",
-            "Sudan - SDN",
-            "Tanzania - TZA",
-            "Uganda - UGA",
-            "Burundi - BDI",
-            "Djibouti - DJI",
-            "Ethiopia - ETH",
-            "Kenya - KEN",
-            "East Africa & Great Lakes - RO01",
-            "Middle East & North Africa - RO02",
-            "West Africa & Americas - RO03",
-            "Asia & Europe - RO05",
-            "Türkiye - TUR",
-            "Occupied Palestine Territory - OPT",
-            "Democratic Republic of the Congo - COD"
-        ]
-
-        # Fetch assets
-        asset_resp = requests.get(f"{CONFIG['API_ROOT']}/assets/?format=json&limit=100000", headers=st.session_state.header_owner)
-        if asset_resp.status_code == 200:
-            assets_data = asset_resp.json()['results']
-            df_assets = pd.DataFrame([
-                {
-                    "UID": a["uid"],
-                    "Name": a["name"],
-                    "owner_username": a["owner__username"],
-                    "deployment_status": a["deployment_status"],
-                    "Legal Entity": (
-                            a.get("settings", {}).get("operational_purpose", {}).get("value")
-                            if a.get("settings", {}).get("operational_purpose") 
-                            else None
-                            )
-                }
-                for a in assets_data
-            ])
-            df_assets = df_assets[(df_assets["Name"] != "") & (df_assets["owner_username"] == st.session_state.owner_username) & (df_assets["deployment_status"].isin(["deployed","archived"]))]
-            st.session_state.df_assets_original_legalentity = df_assets[["UID", "Name", "Legal Entity"]].copy()
-
-        column_config = {
-            "Legal Entity": st.column_config.SelectboxColumn(
-                "Legal Entity",
-                help="Select the legal entity for this asset",
-                options=legalentity_options,
-                required=True
+                    st.error("❌ Invalid token. Please try again.")
+
+    # --- MAIN TABS ---
+    if st.session_state.owner_username:
+        st.subheader("✅ Authenticated Users")
+        st.markdown("**👤 Owner Username**")
+        st.info(st.session_state.owner_username)
+
+        owner = st.session_state.owner_identity
+        index = ui.asset_index(owner, refresh=st.button("🔄 Refresh assets list"))
+
+        def update_and_index(index, root, headers, updates, on_progress=None):
+            try:
+                return kobo_api.update_asset_settings(root, headers, updates, on_progress=on_progress)
+            finally:
+                # Re-read the changed settings on the next page run
+                index.mark_stale()
+
+        def show_update_result(job):
+            failures, total = job.result, job.total or 0
+            for uid, status_code in failures.items():
+                st.error(f"❌ Failed UID {uid}: {status_code}")
+            st.success(f"🎉 Finished! {total - len(failures)} out of {total} assets updated.")
+
+        # Assets from the local index, one column per switcher
+        df_meta = metadata.metadata_frame(index.records(owner=st.session_state.owner_username))
+        edited_frames = []
+
+        tabs = st.tabs(["🔒 PII Switcher", "🏷️ Function Switcher", "🌍 Legal Entity Switcher", "📤 Import from File"])
+
+        # ----------- PII TAB -----------
+        with tabs[0]:
+            st.subheader("PII Switcher")
+
+            column_config = {
+                "PII": st.column_config.SelectboxColumn(
+                    "PII",
+                    help="Does this asset collect PII?",
+                    options=metadata.OPTIONS["PII"],
+                    required=True
+                )
+            }
+
+            # Paged: only one page of assets is sent to the browser, edits are kept by UID
+            edited_frames.append(ui.paged_editor(
+                df_meta[["UID", "Name", "PII"]],
+                "editor_pii",
+                column_config=column_config,
+                disabled=["UID", "Name"]
+            ))
+
+        # ----------- FUNCTION TAB -----------
+        with tabs[1]:
+            st.subheader("Function Switcher")
+
+            column_config = {
+                "Function": st.column_config.SelectboxColumn(
+                    "Function",
+                    help="Select the function/sector for this asset",
+                    options=metadata.SECTOR_OPTIONS,
+                    required=True
+                )
+            }
+
+            edited_frames.append(ui.paged_editor(
+                df_meta[["UID", "Name", "Function"]],
+                "editor_func",
+                column_config=column_config,
+                disabled=["UID", "Name"]
+            ))
+
+         # ----------- LEGAL ENTITY TAB -----------
+        with tabs[2]:
+            st.subheader("Legal Entity Switcher - Specific for kobo.drc.ngo")
+
+            column_config = {
+                "Legal Entity": st.column_config.SelectboxColumn(
+                    "Legal Entity",
+                    help="Select the legal entity for this asset",
+                    options=metadata.LEGAL_ENTITY_OPTIONS,
+                    required=True
+                )
+            }
+
+            edited_frames.append(ui.paged_editor(
+                df_meta.loc[df_meta["deployment_status"].isin(metadata.LEGAL_ENTITY_STATUSES), ["UID", "Name", "Legal Entity"]],
+                "editor_legalentity",
+                column_config=column_config,
+                disabled=["UID", "Name"]
+            ))
+
+        # ----------- IMPORT TAB -----------
+        with tabs[3]:
+            st.subheader("Import from File")
+            st.markdown("Upload a CSV or Excel file with a **UID** column and any of **PII**, **Function** "
+                        "and **Legal Entity**. Blank cells keep the current value.")
+            st.download_button(
+                "⬇️ Download current metadata",
+                df_meta[["UID", "Name", *metadata.SETTINGS]].to_csv(index=False).encode("utf-8"),
+                file_name=f"{st.session_state.owner_username}_metadata.csv",
+                mime="text/csv"
             )
-        }
-
-        edited_df = st.data_editor(
-            st.session_state.df_assets_original_legalentity,
-            column_config=column_config,
-            disabled=["UID", "Name"],
-            use_container_width=True,
-            num_rows="fixed",
-            hide_index=True
-        )
-        st.session_state.df_assets_edited_legalentity = edited_df
-
-        # Detect changes
-        changes = edited_df[edited_df["Legal Entity"] != st.session_state.df_assets_original_legalentity["Legal Entity"]]
-        st.session_state.changes_legalentity = changes
-        st.session_state.assets_changes_legalentity = not changes.empty
+            upload = st.file_uploader("Metadata file", type=["csv", "xlsx"],
+                                      key=f"metadata_upload_{st.session_state.import_gen}")
+            if upload is not None:
+                try:
+                    valid, problems = metadata.validate_import(metadata.read_import(upload, upload.name), df_meta)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.info(f"{len(valid)} assets read from {upload.name}.")
+                    if not problems.empty:
+                        st.warning(f"⚠️ {len(problems)} cells were rejected and will not be applied.")
+                        st.dataframe(problems, hide_index=True)
+                    # Applied after the tabs' edits, so the file wins on the same cell
+                    edited_frames.append(valid)
+
+        # ----------- REVIEW & APPLY (all switchers) -----------
+        # Changed cells of the three tabs in one pass, keyed on UID
+        changes = metadata.diff(df_meta, edited_frames)
 
         st.subheader("🔍 Review Changes")
         if changes.empty:
             st.success("✅ No changes detected.")
+            st.session_state.confirm_apply_metadata = False
         else:
-            st.dataframe(changes)
-            if not st.session_state.get("confirm_apply_legalentity"):
-                if st.button("✅ Confirm and Apply Changes", key="legalentity_confirm"):
-                    st.session_state.confirm_apply_legalentity = True
-
-        # Apply changes
-        if st.session_state.assets_changes_legalentity and st.session_state.confirm_apply_legalentity:
-            total = len(changes)
-            success_count = 0
-            progress_bar = st.progress(0, text="Initializing update...")
-
-            for i, (_, row) in enumerate(changes.iterrows()):
-                payload = {
-                    "settings": {
-                        "operational_purpose": {
-                            "label": row["Legal Entity"],
-                            "value": row["Legal Entity"]
-                        }
-                    }
-                }
-                r = requests.patch(
-                    f"{CONFIG['API_ROOT']}/assets/{row['UID']}/?format=json",
-                    json=payload,
-                    headers=st.session_state.header_owner
-                )
-                if r.status_code == 200:
-                    success_count += 1
-                else:
-                    st.error(f"❌ Failed UID {row['UID']}: {r.status_code}")
-
-                progress_bar.progress((i+1)/total, text=f"{success_count}/{total} updated...")
-                time.sleep(0.05)
-
-            st.success(f"🎉 Finished! {success_count} out of {total} assets updated.")
-            st.session_state.confirm_apply_legalentity = False
+            names = df_meta.set_index("UID")["Name"]
+            st.dataframe(changes.assign(Name=changes["UID"].map(names))[["UID", "Name", "field", "old", "new"]],
+                         hide_index=True)
+            updates = metadata.settings_updates(changes)
+            ui.dry_run(planner.plan_metadata(updates))
+            if st.button("✅ Confirm and Apply Changes", key="metadata_confirm"):
+                st.session_state.confirm_apply_metadata = True
+
+        # Apply changes in the background, one PATCH per asset whatever the number of fields changed
+        if not changes.empty and st.session_state.confirm_apply_metadata:
+            job = jobs.submit("set-metadata", update_and_index, index, CONFIG['API_ROOT'],
+                              st.session_state.header_owner, updates,
+                              label=f"Updating {len(changes)} fields of {len(updates)} assets")
+            st.session_state.job_metadata = job.id
+            for key in ["editor_pii", "editor_func", "editor_legalentity"]:
+                ui.discard_edits(key)
+            st.session_state.import_gen += 1
+            st.session_state.confirm_apply_metadata = False
+
+        ui.job_panel(st.session_state.job_metadata, show_update_result)
+
+ui.timings_panel()
+ui.profile_panel()
 
 # Footer
 st.markdown(
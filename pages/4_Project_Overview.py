@@ -1,69 +1,64 @@
 import streamlit as st
-import requests
-import pandas as pd
-import json
 import re
-from pandas import json_normalize
+from src import identity, kobo_api, ui
+from src.config import get_config
+from src.lazy import lazy_import
+
+pd = lazy_import("pandas")
 
 
 
 st.set_page_config(page_title="Project Overview Dashboard",
                    layout = "wide")
+with ui.page_run():
+
+    st.title("📊 Project Overview Dashboard")
+
+    st.markdown("""
+    This dashboard provides an overview of all projects owned by a Kobo user.
+    Enter your **Kobo API Token** to get started.
+    """)
+
+    if "kobo_url" not in st.session_state:
+        st.session_state.kobo_url = None
+
+    kobo_url = st.sidebar.text_input("Please enter the kobo url", value=st.session_state.kobo_url or get_config().kobo.server)
+    st.session_state.kobo_url = kobo_url
+
+    CONFIG = {
+        "API_ROOT": kobo_api.api_root(st.session_state.kobo_url)
+    }
+
+    ui.use_identity("owner", CONFIG['API_ROOT'])
+
+
+    # --- AUTH FORM ---
+    if "owner_username" not in st.session_state or st.session_state.owner_username is None:
+        auth_box = st.empty()  # placeholder so we can clear the form immediately
+        with auth_box.form(key="token_form", clear_on_submit=True):
+            st.subheader("🔐 API Token")
+            owner_token = st.text_input("Owner User Token", placeholder="Paste your API token", type="password")
+            submit_tokens = st.form_submit_button("Authenticate")
 
-st.title("📊 Project Overview Dashboard")
-
-st.markdown("""
-This dashboard provides an overview of all projects owned by a Kobo user.
-Enter your **Kobo API Token** to get started.
-""")
-
-if "kobo_url" not in st.session_state:
-    st.session_state.kobo_url = None
-
-kobo_url = st.sidebar.text_input("Please enter the kobo url", value = "https://kobo.drc.ngo")
-st.session_state.kobo_url = kobo_url
-
-CONFIG = {
-    "API_ROOT": f"{st.session_state.kobo_url}/api/v2"
-}
-
-for key in ["owner_token", "owner_username","headers_owner"]:
-    if key not in st.session_state:
-        st.session_state[key] = None
-
-
-# --- AUTH FORM ---
-if "owner_username" not in st.session_state or st.session_state.owner_username is None:
-    auth_box = st.empty()  # placeholder so we can clear the form immediately
-    with auth_box.form(key="token_form", clear_on_submit=True):
-        st.subheader("🔐 API Token")
-        owner_token = st.text_input("Owner User Token", placeholder="Paste your API token", type="password")
-        submit_tokens = st.form_submit_button("Authenticate")
-
-        if submit_tokens:
-            headers_owner = {"Authorization": f"Token {owner_token}"}
-            resp = requests.get(f"{CONFIG['API_ROOT']}/access-logs/me/?format=json&limit=1", headers=headers_owner)
-
-            if resp.status_code == 200:
-                st.session_state.owner_token = owner_token
-                st.session_state.owner_username = resp.json()['results'][0]['username']
-                st.session_state.header_owner = headers_owner  # keep this exact key name consistent everywhere
-                # instantly remove the form and rerun so the tabs show up right away
-                auth_box.empty()
-                st.rerun()
-            else:
-                st.error("❌ Invalid token. Please try again.")
-
-# --- MAIN TABS ---
-if st.session_state.owner_username:
-    st.subheader("✅ Authenticated Users")
-    st.markdown("**👤 Owner Username**")
-    st.info(st.session_state.owner_username)
-
-    assets_resp = requests.get(f"{CONFIG['API_ROOT']}/assets/?format=json", headers=st.session_state.header_owner)
-    if assets_resp.status_code == 200:
-        assets = assets_resp.json()['results']
-        owned_assets = [a for a in assets if (a["owner__username"] == st.session_state.owner_username) & (a['name'] != "") & (a['deployment_status'] == "deployed")]
+            if submit_tokens:
+                owner = identity.resolve(CONFIG['API_ROOT'], owner_token)
+
+                if owner:
+                    ui.remember_identity("owner", owner)
+                    # instantly remove the form and rerun so the tabs show up right away
+                    auth_box.empty()
+                    st.rerun()
+                else:
+                    st.error("❌ Invalid token. Please try again.")
+
+    # --- MAIN TABS ---
+    if st.session_state.owner_username:
+        st.subheader("✅ Authenticated Users")
+        st.markdown("**👤 Owner Username**")
+        st.info(st.session_state.owner_username)
+
+        index = ui.asset_index(st.session_state.owner_identity)
+        owned_assets = index.records(owner=st.session_state.owner_username, status="deployed")
 
         if not owned_assets:
             st.warning("No owned assets found.")
@@ -74,12 +69,12 @@ if st.session_state.owner_username:
 
             selected_asset_display = st.selectbox("Select a project to inspect",
                                                   options = assets_names)
-            
+
             selected_asset = assets_lookup[selected_asset_display]
 
             asset_uid = selected_asset['uid']
 
-            asset_resp = requests.get(f"{CONFIG['API_ROOT']}/assets/{asset_uid}/?format=json", headers=st.session_state.header_owner)
+            asset_resp = kobo_api.request("GET", f"{CONFIG['API_ROOT']}/assets/{asset_uid}/?format=json", headers=st.session_state.header_owner)
             if asset_resp.status_code == 200:
                 asset = asset_resp.json()
                 if asset["settings"]["sector"]["label"] == None:
@@ -105,7 +100,7 @@ if st.session_state.owner_username:
                     ])
                 else:
                     df_country = "The Country Metadata is missing. Please fill it."
-                
+
                 # ---- INFOGRTAPHIC CUBES
                 col1, col2, col3 = st.columns(3)
                 col4, col5, col6 = st.columns(3)
@@ -126,7 +121,7 @@ if st.session_state.owner_username:
                         st.metric(" Country Name", "; ".join(df_country['Country Label']))
                     else:
                         st.metric(" Country Name", df_country)
-                
+
                 versions = asset.get("deployed_versions", None).get("results", [])
 
                 if versions:
@@ -155,7 +150,7 @@ if st.session_state.owner_username:
 
                 submission_count = asset["deployment__submission_count"]
                 date_last_submission = asset["deployment__last_submission_time"][:10]
-                
+
                 if (submission_count):
                     with st.expander("⬆️ Submissions"):
                         st.metric("Number of Submissions", submission_count)
@@ -173,15 +168,18 @@ if st.session_state.owner_username:
                     ])
                     with st.expander("🔑 Permissions"):
                         st.dataframe(df_permissions[df_permissions["Username"] != "AnonymousUser"])
-                
-                data_resp = requests.get(f"{CONFIG['API_ROOT']}/assets/{asset_uid}/data/?format=json", headers=st.session_state.header_owner)
+
+                data_resp = kobo_api.request("GET", f"{CONFIG['API_ROOT']}/assets/{asset_uid}/data/?format=json", headers=st.session_state.header_owner)
                 if data_resp.status_code == 200:
                     data = data_resp.json()["results"]
-                    data_df = json_normalize(data)
+                    data_df = pd.json_normalize(data)
 
                     with st.expander("📊 Data"):
                         st.dataframe(data_df)
 
+ui.timings_panel()
+ui.profile_panel()
+
 # Footer
 st.markdown(
     """
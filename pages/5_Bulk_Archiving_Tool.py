@@ -1,176 +1,119 @@
 import streamlit as st
-import requests
-import time
-import pandas as pd
+from src import identity, jobs, kobo_api, planner, ui
+from src.config import get_config
 
 
 
 st.set_page_config(page_title="Bulk Asset Transfer", layout="wide")
+with ui.page_run():
 
-st.title("🔁 Archive Assets in Bulk")
+    st.title("🔁 Archive Assets in Bulk")
 
-st.markdown("""
-            This tool allows you to **archive kobo projects in bulk**.
-            You will need to enter the **API tokens** for the owner of the assets. 
-            """)
+    st.markdown("""
+                This tool allows you to **archive kobo projects in bulk**.
+                You will need to enter the **API tokens** for the owner of the assets. 
+                """)
 
-if "kobo_url" not in st.session_state:
-    st.session_state.kobo_url = None
+    if "kobo_url" not in st.session_state:
+        st.session_state.kobo_url = None
 
-kobo_url = st.sidebar.text_input("Please enter the kobo url", value = "https://kobo.drc.ngo")
-st.session_state.kobo_url = kobo_url
+    kobo_url = st.sidebar.text_input("Please enter the kobo url", value=st.session_state.kobo_url or get_config().kobo.server)
+    st.session_state.kobo_url = kobo_url
 
-CONFIG = {
-    "API_ROOT": f"{st.session_state.kobo_url}/api/v2"
-}
-with st.expander("ℹ️ How it works"):
-    st.markdown("""
-                1. Enter the API Token of the **owner** user.
-                2. Authenticate to fetch the username and validate token.
-                3. Select the assets owned by the owner that you want to archive.
-                4. Submit the archiving request.
-                """)
+    CONFIG = {
+        "API_ROOT": kobo_api.api_root(st.session_state.kobo_url)
+    }
+    with st.expander("ℹ️ How it works"):
+        st.markdown("""
+                    1. Enter the API Token of the **owner** user.
+                    2. Authenticate to fetch the username and validate token.
+                    3. Select the assets owned by the owner that you want to archive.
+                    4. Submit the archiving request.
+                    """)
+
+    # -------- Session state init --------
+    ui.use_identity("owner", CONFIG['API_ROOT'])
+    if "owner_assets" not in st.session_state:
+        st.session_state.owner_assets = None
+    if "archive_job" not in st.session_state:
+        st.session_state.archive_job = None
+
+    # --- AUTH FORM ---
+    if ("owner_username" not in st.session_state or st.session_state.owner_username is None):
+        auth_box = st.empty()  # placeholder so we can clear the form immediately
+        with auth_box.form(key="token_form", clear_on_submit=True):
+            st.subheader("🔐 API Token")
+            owner_token = st.text_input("Owner User Token", placeholder="Enter owner's API token", type="password")
+            submit_tokens = st.form_submit_button("Authenticate")
+
+            if submit_tokens:
+                # Validate owner
+                owner = identity.resolve(CONFIG['API_ROOT'], owner_token)
+
+                if owner:
+                    ui.remember_identity("owner", owner)
+                    auth_box.empty()
+                    st.rerun()
+                else:
+                    st.error("❌ Invalid token. Please try again.")
+
+    # ------ MAIN INTERFACE -------
+
+    def archive_and_index(index, root, headers, uids, on_progress=None):
+        try:
+            failures = kobo_api.archive_assets(root, headers, uids, on_progress=on_progress)
+        finally:
+            # Cancelled halfway or not, the next page run picks up what changed
+            index.mark_stale()
+        index.update([uid for uid in uids if uid not in failures], deployment_status="archived")
+        return failures
+
+
+    if st.session_state.owner_username:
+        st.subheader("✅ Authenticated User")
+        st.markdown("**👤 owner Username**")
+        st.info(st.session_state.owner_username)
+
+        # ------ OWNER'S ASSETS (local index, synced incrementally) ------
+        owner = st.session_state.owner_identity
+        headers_owner = owner.headers
+
+        # Button to explicitly refresh data if needed
+        refresh = st.button("🔄 Refresh assets list")
+        index = ui.asset_index(owner, refresh=refresh)
+        deployed = index.count(owner=owner.username, status="deployed")
+
+        if deployed:
+            st.markdown("📦 Select assets to archive:")
+            selected_uids = ui.asset_picker(index, "archive_assets", owner=owner.username, status="deployed")
+
+            if selected_uids:
+                ui.dry_run(planner.plan_archive(selected_uids))
+                if st.button("🚀 Archive Selected Assets"):
+                    # Runs in the background: it survives reruns and leaving the page
+                    job = jobs.submit("archive", archive_and_index, index, CONFIG['API_ROOT'], headers_owner,
+                                      selected_uids, label=f"Archiving {len(selected_uids)} assets")
+                    st.session_state.archive_job = job.id
 
-# -------- Session state init --------
-if "owner_token" not in st.session_state:
-    st.session_state.owner_token = None
-if "owner_username" not in st.session_state:
-    st.session_state.owner_username = None
-if "owner_assets" not in st.session_state:
-    st.session_state.owner_assets = None
-
-# --- AUTH FORM ---
-if ("owner_username" not in st.session_state or st.session_state.owner_username is None):
-    auth_box = st.empty()  # placeholder so we can clear the form immediately
-    with auth_box.form(key="token_form", clear_on_submit=True):
-        st.subheader("🔐 API Token")
-        owner_token = st.text_input("Owner User Token", placeholder="Enter owner's API token", type="password")
-        submit_tokens = st.form_submit_button("Authenticate")
-
-        if submit_tokens:
-            # Validate owner
-            headers_owner = {"Authorization": f"Token {owner_token}"}
-            owner_resp = requests.get(f"{CONFIG['API_ROOT']}/access-logs/me/?format=json&limit=1", headers=headers_owner)
-
-
-            if owner_resp.status_code == 200:
-                st.session_state.owner_token = owner_token
-                st.session_state.owner_username = owner_resp.json()['results'][0]['username']
-                auth_box.empty()
-                st.rerun()
             else:
-                st.error("❌ Invalid token. Please try again.")
-
-# ------ MAIN INTERFACE -------
-
-if st.session_state.owner_username:
-    st.subheader("✅ Authenticated User")
-    st.markdown("**👤 owner Username**")
-    st.info(st.session_state.owner_username)
-    
-        # ------ FETCH owner'S ASSETS (once, with progress) ------
-    headers_owner = {"Authorization": f"Token {st.session_state.owner_token}"}
-
-    # Button to explicitly refresh data if needed
-    refresh = st.button("🔄 Refresh assets list")
-
-    if "df_assets" not in st.session_state or refresh:
-        # First, get count cheaply (limit=1 keeps payload tiny)
-        count_resp = requests.get(f"{CONFIG['API_ROOT']}/assets/?format=json&limit=1", headers=headers_owner)
-        if count_resp.status_code != 200:
-            st.error("❌ Failed to fetch owner's assets count.")
-            st.stop()
-
-        assets_count = count_resp.json().get("count", 0)
-        if assets_count == 0:
-            st.session_state.df_assets = pd.DataFrame(
-                columns=["uid", "name", "owner_username", "deployment_status"]
-            )
+                st.warning("⚠️ Please select at least one asset to transfer.")
         else:
-            PAGE_SIZE = 100
-            frames = []
-
-            prog = st.progress(0, text=f"Fetching assets 0/{assets_count}…")
-            fetched = 0
-
-            for offset in range(0, assets_count, PAGE_SIZE):
-                asset_resp = requests.get(
-                    f"{CONFIG['API_ROOT']}/assets/?format=json&limit={PAGE_SIZE}&offset={offset}",
-                    headers=headers_owner
-                )
-                if asset_resp.status_code != 200:
-                    prog.empty()
-                    st.error(f"❌ Failed at offset {offset}: {asset_resp.status_code} - {asset_resp.reason}")
-                    st.stop()
-
-                assets_page = asset_resp.json().get("results", [])
-                df_page = pd.DataFrame([
-                    {
-                        "uid": a.get("uid"),
-                        "name": a.get("name"),
-                        "owner_username": a.get("owner__username"),
-                        "deployment_status": a.get("deployment_status"),
-                    }
-                    for a in assets_page
-                ])
-                frames.append(df_page)
-
-                # update progress by items fetched (safer than inferring from offsets)
-                fetched += len(assets_page)
-                prog.progress(min(fetched / max(assets_count, 1), 1.0),
-                              text=f"Fetching assets {min(fetched, assets_count)}/{assets_count}…")
-
-            prog.empty()
-            st.session_state.df_assets = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
-                columns=["uid", "name", "owner_username", "deployment_status"]
-            )
-
-    # From here on, just reuse the cached DataFrame — no re-fetch on widget changes
-    df_assets = st.session_state.df_assets
-
-    owner_assets = df_assets[
-        (df_assets["name"] != "") &
-        (df_assets["owner_username"] == st.session_state.owner_username) &
-        (df_assets["deployment_status"] == "deployed")
-    ]
-
-    if not owner_assets.empty:
-        selected_names = st.multiselect(
-            "📦 Select assets to transfer:",
-            options=owner_assets["name"].tolist()
-        )
-
-        selected_uids = owner_assets[owner_assets["name"].isin(selected_names)]["uid"].tolist()
-
-        if selected_uids:
-            if st.button("🚀 Archive Selected Assets"):
-                total = len(selected_uids)
-                success_count = 0
-                progress_bar = st.progress(0, text="Initializing archiving...")
-
-                for uid in selected_uids:
-                    url = f"{CONFIG['API_ROOT']}/assets/{uid}/deployment/?format=json"
-                    payload = {"active": "false"}
-                    archiving_request = requests.patch(
-                        url,
-                        headers=headers_owner,
-                        json=payload
-                    )
-                    if archiving_request.status_code == 200:
-                        success_count += 1
-                    else:
-                        st.error(f"❌ Failed UID {uid}: {archiving_request.status_code}")
-
-                    progress_bar.progress(success_count/total, text=f"{success_count}/{total} archived...")
-                    time.sleep(0.05)
+            st.warning("⚠️ No deployed assets found for this user.")
 
+        def show_archive_result(job):
+            failures, total = job.result, job.total or 0
+            for uid, status_code in failures.items():
+                st.error(f"❌ Failed UID {uid}: {status_code}")
+
+            if not failures:
                 st.success("🎉 All selected assets where successfully archived!")
+            else:
+                st.warning(f"⚠️ {total - len(failures)} out of {total} assets archived.")
 
-            
-        else:
-            st.warning("⚠️ Please select at least one asset to transfer.")
-    else:
-        st.warning("⚠️ No deployed assets found for this user.")
+        ui.job_panel(st.session_state.archive_job, show_archive_result)
+
+ui.timings_panel()
+ui.profile_panel()
 
 # Footer
 st.markdown(
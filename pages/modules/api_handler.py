@@ -1,7 +1,6 @@
 import json
-import requests
-
-
+from src import kobo_api
+from src.config import get_config
 
 
 def fetch_kobo_form(kobo_id: str, api_token_file, output_path: str) -> None:
@@ -25,28 +24,7 @@ def fetch_kobo_form(kobo_id: str, api_token_file, output_path: str) -> None:
         except json.JSONDecodeError:
             raise ValueError("Invalid JSON file. Please upload a properly formatted JSON file.")
 
-        headers = {"Authorization": f"Token {api_token['token']}"}
-        # Fetch the asset metadata to get the correct XLSForm download URL
-        asset_url = f"https://kobo.drc.ngo/api/v2/assets/{kobo_id}.json"
-        response = requests.get(asset_url, headers=headers)
-
-        if response.status_code != 200:
-            response.raise_for_status()
-
-        asset = response.json()
-        xlsform_url = next((d.get("url") for d in asset.get("downloads", []) if d.get("format") == "xls"), None)
-
-        if not xlsform_url:
-            raise ValueError("XLSForm download URL not found in asset metadata.")
-
-        # Download the XLSForm
-        response = requests.get(xlsform_url, headers=headers, stream=True)
-
-        if response.status_code == 200:
-            with open(output_path, "wb") as excel_file:
-                for chunk in response.iter_content(chunk_size=1024):
-                    excel_file.write(chunk)
-        else:
-            response.raise_for_status()
+        headers = kobo_api.auth_headers(api_token['token'])
+        kobo_api.download_xlsform(kobo_api.api_root(get_config().kobo.server), headers, kobo_id, output_path)
     except Exception as e:
         raise ValueError(f"Failed to fetch Kobo form: {e}")
@@ -1,6 +1,12 @@
-import pandas as pd
+from __future__ import annotations
+
+from src.instrumentation import span
+from src.lazy import lazy_import
+from src.xlsform import XLSForm
 from .constraint_parser import parse_constraint
 
+pd = lazy_import("pandas")
+
 def extract_variables_from_excel(file_path: str) -> pd.DataFrame:
     """
     Extract variables from a Kobo form Excel file, including multilingual labels and category values.
@@ -12,23 +18,14 @@ def extract_variables_from_excel(file_path: str) -> pd.DataFrame:
     Returns:
         pd.DataFrame: A DataFrame containing variable names, English labels, data types, and category values with multilingual labels.
     """
-    # Try to load both 'survey' and 'choices' sheets from the Excel file
+    # Parse the form once into the shared XLSForm model
     try:
-        xls = pd.ExcelFile(file_path)
-        if 'survey' not in xls.sheet_names:
-            return pd.DataFrame()  # No survey sheet, return empty
-        survey_df = pd.read_excel(xls, sheet_name="survey")
-        if 'choices' in xls.sheet_names:
-            choices_df = pd.read_excel(xls, sheet_name="choices")
-        else:
-            choices_df = None
+        form = XLSForm.from_excel(file_path)
     except Exception:
-        return pd.DataFrame()  # If file is not a valid Excel, return empty
-
-    variables = []
+        return pd.DataFrame()  # No survey sheet or not a valid Excel, return empty
 
     # Determine the primary label column
-    available_languages = [col for col in survey_df.columns if col.startswith("label")]
+    available_languages = list(form.label_columns)
     primary_label_column = None
 
     if len(available_languages) == 1:
@@ -41,33 +38,50 @@ def extract_variables_from_excel(file_path: str) -> pd.DataFrame:
         # Fallback to the first available language
         primary_label_column = available_languages[0] if available_languages else None
 
-    for _, row in survey_df.iterrows():
-        label = row.get(primary_label_column, None) if primary_label_column else None
-        category_values = None
-        allowed_values = None
-
-        # Extract allowed values from constraints if present
-        if "constraint" in row and pd.notna(row["constraint"]):
-            allowed_values = parse_constraint(row["constraint"], row["type"])
-
-        if (choices_df is not None and (row["type"].startswith("select_one") or row["type"].startswith("select_multiple"))):
-            list_name = row["type"].split(" ")[1] if " " in row["type"] else None
-            if list_name:
-                category_values = choices_df[choices_df["list_name"] == list_name]["name"].tolist()
-                if category_values:
-                    allowed_values = ", ".join(category_values)
-
-        variables.append({
-            "name": row["name"],
-            primary_label_column: label,  # Use the determined primary label column
-            "type": map_data_type(row["type"]),
-            "categories": category_values,
-            "allowed_values": allowed_values
-        })
+    has_choices = bool(form.list_names)
+
+    # Rows without a name (end_group...) are listed where they stand in the survey sheet
+    unnamed = {}
+    for position, row_type in form.unnamed_rows:
+        unnamed.setdefault(position, []).append(row_type)
+
+    variables = []
+    with span("extract_variables", questions=len(form.questions)):
+        for position, question in enumerate(form.questions):
+            for row_type in unnamed.get(position, ()):
+                variables.append(_unnamed_row(row_type, primary_label_column))
+            data_type = question.type or ""
+            label = question.label(primary_label_column) if primary_label_column else None
+            category_values = None
+            allowed_values = None
+
+            # Extract allowed values from constraints if present
+            if question.constraint:
+                allowed_values = parse_constraint(question.constraint, data_type)
+
+            if has_choices and (data_type.startswith("select_one") or data_type.startswith("select_multiple")):
+                if question.list_name:
+                    category_values = [c.name for c in form.choices(question.list_name)]
+                    if category_values:
+                        allowed_values = ", ".join(category_values)
+
+            variables.append({
+                "name": question.name,
+                primary_label_column: label,  # Use the determined primary label column
+                "type": map_data_type(data_type),
+                "categories": category_values,
+                "allowed_values": allowed_values
+            })
+        for row_type in unnamed.get(len(form.questions), ()):
+            variables.append(_unnamed_row(row_type, primary_label_column))
 
     variables_df = pd.DataFrame(variables)
     return variables_df
 
+def _unnamed_row(row_type: str, primary_label_column: str) -> dict:
+    return {"name": None, primary_label_column: None, "type": map_data_type(row_type),
+            "categories": None, "allowed_values": None}
+
 def map_data_type(data_type: str) -> str:
     """
     Map Kobo data types to human-readable categories.
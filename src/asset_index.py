@@ -0,0 +1,267 @@
+"""
+Persistent local index of the assets a user can see on a Kobo server.
+
+One SQLite file per (server, user) keeps the asset list between sessions. A
+sync asks the server only for assets modified since the last one, and falls
+back to a full listing when the server's asset count no longer matches the
+local one (assets deleted or shared away). New submissions do not change an
+asset's ``date_modified``, so submission counts are refreshed separately, on
+request or once ``performance.submission_count_ttl`` has passed. Pages then
+filter and select locally.
+
+    index = AssetIndex.open(root, username)
+    index.sync(root, headers)
+    index.frame(owner=username, status="deployed")
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from src import kobo_api
+from src.config import get_config
+from src.instrumentation import span
+from src.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    uid TEXT PRIMARY KEY,
+    name TEXT,
+    owner_username TEXT,
+    deployment_status TEXT,
+    date_modified TEXT,
+    submission_count INTEGER,
+    settings TEXT,
+    record TEXT
+);
+CREATE INDEX IF NOT EXISTS assets_owner_status ON assets (owner_username, deployment_status);
+CREATE INDEX IF NOT EXISTS assets_name ON assets (name);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _row(record: dict) -> tuple:
+    return (
+        record.get("uid"),
+        record.get("name"),
+        record.get("owner__username"),
+        record.get("deployment_status"),
+        record.get("date_modified"),
+        record.get("deployment__submission_count"),
+        json.dumps(record.get("settings") or {}),
+        json.dumps(record),
+    )
+
+
+class AssetIndex:
+    """
+    SQLite-backed asset list of one user on one server.
+
+    Every method opens its own short-lived connection, so an index can be
+    shared between Streamlit script runs and background jobs.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def open(cls, root: str, username: str) -> "AssetIndex":
+        """
+        Open (or create) the index of ``username`` on the server at ``root``.
+        """
+        server = hashlib.sha1(root.encode("utf-8")).hexdigest()[:12]
+        return cls(get_config().storage.path("assets", f"{server}_{username}.sqlite"))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ----- Sync -----
+    @property
+    def last_sync(self):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'last_modified'").fetchone()
+        return row["value"] if row else None
+
+    @property
+    def stale(self) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'stale'").fetchone()
+        return bool(row and row["value"] == "1")
+
+    def mark_stale(self) -> None:
+        """
+        Flag the index for a delta sync on the next page run, e.g. after a bulk job.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('stale', '1')")
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+
+    def sync(self, root: str, headers: dict, full: bool = False, counts: bool = False,
+             on_progress=None) -> int:
+        """
+        Bring the index up to date with the server.
+
+        Only assets modified since the last sync are requested, unless ``full``
+        is set or the index is empty; a full listing replaces the index when the
+        server's asset count differs from the local one.
+
+        Submission counts are refreshed on ``counts`` or when they are older
+        than ``performance.submission_count_ttl``, from a listing of every
+        asset's ``uid`` and ``deployment__submission_count`` (the whole records
+        if the server ignores ``fields``). Its UIDs also replace the count check.
+
+        Args:
+            root (str): The API root.
+            headers (dict): Authorization headers of the index's user.
+            full (bool): Re-list every asset.
+            counts (bool): Refresh the submission counts even if they are recent.
+            on_progress: Optional callable ``(fetched, total)``, see ``fetch_asset_records``.
+
+        Returns:
+            int: Number of assets fetched from the server.
+
+        Raises:
+            KoboAPIError: If a listing request fails.
+        """
+        since = None if full else self.last_sync
+        with span("asset_index.sync", delta=since is not None) as record:
+            query = f"date_modified__gt:{since}" if since else None
+            records = kobo_api.fetch_asset_records(root, headers, on_progress=on_progress, query=query)
+            self._store(records, replace=since is None)
+            if since is not None:
+                if counts or self._counts_expired():
+                    listing = kobo_api.fetch_asset_records(root, headers,
+                                                           fields=["uid", "deployment__submission_count"])
+                    complete = self._store_counts(listing)
+                else:
+                    complete = len(self) == kobo_api.count_assets(root, headers)
+                if not complete:
+                    records = kobo_api.fetch_asset_records(root, headers, on_progress=on_progress)
+                    self._store(records, replace=True)
+            record["fetched"] = len(records)
+        return len(records)
+
+    def _store(self, records: list, replace: bool) -> None:
+        with closing(self._connect()) as conn, conn:
+            if replace:
+                conn.execute("DELETE FROM assets")
+            conn.executemany("INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             [_row(r) for r in records])
+            newest = conn.execute("SELECT MAX(date_modified) FROM assets").fetchone()[0]
+            if newest:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('last_modified', ?)", (newest,))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)", (str(time.time()),))
+            if replace:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('counts_at', ?)", (str(time.time()),))
+            conn.execute("DELETE FROM meta WHERE key = 'stale'")
+
+    def _counts_expired(self) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'counts_at'").fetchone()
+        return row is None or time.time() - float(row["value"]) > get_config().performance.submission_count_ttl
+
+    def _store_counts(self, counts: list) -> bool:
+        # Refresh submission counts; False if the server's UIDs differ from the local ones
+        with closing(self._connect()) as conn, conn:
+            local = {r[0] for r in conn.execute("SELECT uid FROM assets")}
+            if local != {c.get("uid") for c in counts}:
+                return False
+            conn.executemany("UPDATE assets SET submission_count = ?1, "
+                             "record = json_set(record, '$.deployment__submission_count', ?1) WHERE uid = ?2",
+                             [(c.get("deployment__submission_count"), c["uid"]) for c in counts])
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('counts_at', ?)", (str(time.time()),))
+        return True
+
+    def update(self, uids: list, **fields) -> None:
+        """
+        Apply a change we just made on the server (e.g. ``deployment_status="archived"``)
+        without waiting for the next sync, and mark the index stale.
+        """
+        if not uids or not fields:
+            return
+        unknown = set(fields) - {"name", "owner_username", "deployment_status", "submission_count"}
+        if unknown:
+            raise ValueError(f"Cannot update asset column(s): {', '.join(sorted(unknown))}")
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(f"UPDATE assets SET {columns} WHERE uid = ?",
+                             [(*fields.values(), uid) for uid in uids])
+        self.mark_stale()
+
+    # ----- Queries -----
+    def _where(self, owner: str = None, status: str = None, name: str = None, named: bool = True):
+        clauses, params = [], []
+        if owner is not None:
+            clauses.append("owner_username = ?")
+            params.append(owner)
+        if status is not None:
+            clauses.append("deployment_status = ?")
+            params.append(status)
+        if name:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append("%" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if named:
+            clauses.append("name <> ''")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def frame(self, owner: str = None, status: str = None, name: str = None, named: bool = True,
+              limit: int = None, offset: int = 0):
+        """
+        The matching assets as a DataFrame with ``kobo_api.ASSET_COLUMNS`` plus
+        ``date_modified`` and ``submission_count``, ordered by name.
+
+        ``limit`` and ``offset`` select one window of that order, e.g. a grid page.
+        """
+        where, params = self._where(owner, status, name, named)
+        columns = kobo_api.ASSET_COLUMNS + ["date_modified", "submission_count"]
+        window = ""
+        if limit is not None:
+            window = " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM assets{where} ORDER BY name, uid{window}",
+                                params).fetchall()
+        return pd.DataFrame([tuple(r) for r in rows], columns=columns)
+
+    def count(self, owner: str = None, status: str = None, name: str = None, named: bool = True) -> int:
+        where, params = self._where(owner, status, name, named)
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM assets{where}", params).fetchone()[0]
+
+    def uids(self, owner: str = None, status: str = None, name: str = None, named: bool = True) -> list:
+        """
+        UIDs of the matching assets, without loading anything else.
+        """
+        where, params = self._where(owner, status, name, named)
+        with closing(self._connect()) as conn:
+            return [r[0] for r in conn.execute(f"SELECT uid FROM assets{where} ORDER BY name, uid", params)]
+
+    def records(self, owner: str = None, status: str = None, name: str = None, named: bool = True) -> list:
+        """
+        The matching assets as the raw records returned by the API, ordered by name.
+        """
+        where, params = self._where(owner, status, name, named)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT record FROM assets{where} ORDER BY name, uid", params).fetchall()
+        return [json.loads(r["record"]) for r in rows]
+
+    def statuses(self, owner: str = None) -> list:
+        """
+        Distinct deployment statuses among the user's named assets.
+        """
+        where, params = self._where(owner)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT DISTINCT deployment_status FROM assets{where} "
+                                "AND deployment_status IS NOT NULL ORDER BY 1", params).fetchall()
+        return [r[0] for r in rows]
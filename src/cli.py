@@ -0,0 +1,365 @@
+"""
+Headless entry point for the relabeling, codebook and bulk asset tools.
+
+    python kobotool.py relabel --form form.xlsx --data exports/ --label "label::English" --out labeled/
+    python kobotool.py relabel --form form.xlsx --data exports/ --asset a1b2c3 --token $KOBO_TOKEN
+    python kobotool.py relabel --form form.xlsx --data labeled/ --reverse --out xml/
+    python kobotool.py relabel --form form.xlsx --data exports/ --all-labels --layout combined
+    python kobotool.py codebook forms/ --out codebooks/
+    python kobotool.py archive --token $KOBO_TOKEN a1b2c3 d4e5f6
+    python kobotool.py transfer --token $SENDER --receiver-token $RECEIVER a1b2c3
+    python kobotool.py set-metadata --token $KOBO_TOKEN --field sector --value "Programme - Protection" a1b2c3
+
+Directories of files are processed in parallel, one worker process per file.
+Bulk asset commands accept --dry-run to print the requests they would send.
+Nothing here imports streamlit.
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src import export, kobo_api, metadata, planner, versions
+from src.asset_index import AssetIndex
+from src.config import get_config
+from src.utils import label2name_sheets, relabel_languages, relabel_sheets
+from src.xlsform import XLSForm
+
+# file extension and writer for each relabel output format
+OUTPUT_FORMATS = {
+    "xlsx": (".xlsx", export.write_excel),
+    "csv": (".zip", export.write_csv_zip),
+    "parquet": ("_parquet.zip", export.write_parquet_zip),
+    "feather": ("_feather.zip", export.write_feather_zip),
+}
+
+
+def _excel_files(paths: list) -> list:
+    # Expand directories to the .xlsx files they contain
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.xlsx"))))
+        else:
+            files.append(path)
+    return [f for f in files if not os.path.basename(f).startswith("~$")]
+
+
+def _output_path(out_dir: str, source: str, suffix: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    return os.path.join(out_dir, os.path.splitext(os.path.basename(source))[0] + suffix)
+
+
+def _save(artifact, path: str) -> None:
+    try:
+        with open(path, "wb") as f:
+            shutil.copyfileobj(artifact, f)
+    finally:
+        export.discard(artifact)
+
+
+def _run_parallel(func, jobs: list, workers: int) -> int:
+    # Run func(*job) for every job, printing one line per finished file; returns the failure count
+    def report(job, output, error):
+        if error:
+            print(f"FAILED {job[0]}: {error}", file=sys.stderr)
+        else:
+            print(f"{job[0]} -> {output}")
+        return bool(error)
+
+    if workers == 1 or len(jobs) == 1:
+        return sum(report(job, *_call(func, job)) for job in jobs)
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = {pool.submit(_call, func, job): job for job in jobs}
+        return sum(report(futures[f], *f.result()) for f in as_completed(futures))
+
+
+def _call(func, job):
+    try:
+        return func(*job), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+# ----- relabel -----
+def relabel_file(data_path: str, form_path: str, label: str, sep: str, fmt: str, out_dir: str,
+                 root: str = None, token: str = None, asset: str = None, reverse: bool = False,
+                 all_labels: bool = False, layout: str = "per-language") -> str:
+    """
+    Relabel every sheet of one exported dataset and write it to ``out_dir``.
+
+    With ``asset`` (and the ``root`` and ``token`` to reach it), each row is
+    relabeled with the deployed version of the form it was submitted with.
+    With ``reverse``, a labeled dataset is switched back to XML names instead.
+    With ``all_labels``, it is switched to every label language of the form in
+    one pass, written as ``<name>_<language>`` files (``layout="per-language"``)
+    or as one file holding each sheet once per language (``layout="combined"``).
+
+    Returns:
+        str: Path of the written file (comma-separated if several).
+    """
+    form = XLSForm.from_excel(form_path)
+    label = label or next(iter(form.label_columns), None)
+    if not all_labels and label not in form.label_columns:
+        raise ValueError(f"label column {label!r} not in form (has {', '.join(form.label_columns)})")
+
+    data_excel = pd.ExcelFile(data_path)
+    sheet_names = data_excel.sheet_names
+    data_list = [data_excel.parse(sheet) for sheet in sheet_names]
+    if reverse:
+        switched = label2name_sheets(form, sheet_names, data_list, label, sep)
+    else:
+        version_forms = None
+        if asset:
+            version_forms = versions.fetch_forms(root, kobo_api.auth_headers(token), asset,
+                                                 versions.versions_in(data_list))
+            for lang in (form.label_columns if all_labels else [label]):
+                missing = versions.missing_label(version_forms, lang)
+                if missing:
+                    print(f"WARNING {data_path}: version(s) {', '.join(missing)} have no {lang!r} column; "
+                          "their rows are labeled with the uploaded form", file=sys.stderr)
+        if all_labels:
+            languages = relabel_languages(form, sheet_names, data_list, list(form.label_columns), sep,
+                                          version_forms=version_forms)
+        else:
+            switched = relabel_sheets(form, sheet_names, data_list, label, sep, version_forms=version_forms)
+
+    suffix, writer = OUTPUT_FORMATS[fmt]
+    if all_labels and not reverse:
+        if layout == "combined":
+            frames, names = export.combine_languages(languages, sheet_names)
+            path = _output_path(out_dir, data_path, "_all_languages" + suffix)
+            _save(writer(frames, names), path)
+            return path
+        paths = []
+        for language, frames in languages.items():
+            paths.append(_output_path(out_dir, data_path, f"_{export.language_slug(language)}{suffix}"))
+            _save(writer(frames, sheet_names), paths[-1])
+        return ", ".join(paths)
+    path = _output_path(out_dir, data_path, suffix)
+    _save(writer(switched, sheet_names), path)
+    return path
+
+
+def cmd_relabel(args) -> int:
+    if args.reverse and args.asset:
+        raise SystemExit("--asset only applies when switching names to labels.")
+    if args.reverse and args.all_labels:
+        raise SystemExit("--all-labels only applies when switching names to labels.")
+    root = None
+    if args.asset:
+        root = kobo_api.api_root(args.server)
+        headers, _ = _authenticate(root, args.token)
+        # Fail before starting the workers if the asset is out of reach
+        try:
+            versions.deployed_versions(root, headers, args.asset)
+        except kobo_api.KoboAPIError as e:
+            print(f"FAILED: {e}", file=sys.stderr)
+            return 1
+    jobs = [(path, args.form, args.label, args.sep, args.format, args.out, root, args.token, args.asset,
+             args.reverse, args.all_labels, args.layout) for path in _excel_files(args.data)]
+    if not jobs:
+        print("No .xlsx datasets found.", file=sys.stderr)
+        return 1
+    return 1 if _run_parallel(relabel_file, jobs, args.workers) else 0
+
+
+# ----- codebook -----
+def codebook_file(form_path: str, out_dir: str) -> str:
+    """
+    Extract the variables of one XLSForm to ``<form>_variables.csv`` in ``out_dir``.
+
+    Returns:
+        str: Path of the written CSV.
+    """
+    from pages.modules.variable_extractor import extract_variables_from_excel
+
+    variables_df = extract_variables_from_excel(form_path)
+    if variables_df.empty:
+        raise ValueError("no survey sheet found")
+    path = _output_path(out_dir, form_path, "_variables.csv")
+    variables_df.to_csv(path, index=False)
+    return path
+
+
+def cmd_codebook(args) -> int:
+    jobs = [(path, args.out) for path in _excel_files(args.forms)]
+    if not jobs:
+        print("No .xlsx forms found.", file=sys.stderr)
+        return 1
+    return 1 if _run_parallel(codebook_file, jobs, args.workers) else 0
+
+
+# ----- bulk asset commands -----
+def _uids(args) -> list:
+    uids = list(args.uids)
+    if args.uids_file:
+        with open(args.uids_file, encoding="utf-8") as f:
+            uids.extend(line.strip() for line in f if line.strip())
+    if not uids:
+        raise SystemExit("No asset UIDs given.")
+    return uids
+
+
+def _authenticate(root: str, token: str, role: str = "token"):
+    if not token:
+        raise SystemExit(f"Missing {role}; pass it as an option or set KOBO_TOKEN.")
+    username = kobo_api.validate_token(root, token)
+    if not username:
+        raise SystemExit(f"Invalid {role}.")
+    return kobo_api.auth_headers(token), username
+
+
+def _report(failures: dict, total: int) -> int:
+    for uid, status_code in failures.items():
+        print(f"FAILED {uid}: {status_code}", file=sys.stderr)
+    print(f"{total - len(failures)} out of {total} assets updated.")
+    return 1 if failures else 0
+
+
+def _progress(done, total):
+    print(f"\r{done}/{total} processed...", end="\n" if done == total else "", file=sys.stderr)
+
+
+def _dry_run(plan) -> int:
+    # Print the requests an operation would send instead of sending them
+    if plan.steps:
+        print(plan.frame().to_string(index=False))
+    print(plan.summary())
+    return 0
+
+
+def cmd_archive(args) -> int:
+    uids = _uids(args)
+    if args.dry_run:
+        return _dry_run(planner.plan_archive(uids))
+    root = kobo_api.api_root(args.server)
+    headers, _ = _authenticate(root, args.token)
+    failures = kobo_api.archive_assets(root, headers, uids, on_progress=_progress, delay=args.delay)
+    return _report(failures, len(uids))
+
+
+def cmd_transfer(args) -> int:
+    uids = _uids(args)
+    if args.dry_run:
+        return _dry_run(planner.plan_transfer(uids))
+    root = kobo_api.api_root(args.server)
+    sender_headers, _ = _authenticate(root, args.token)
+    receiver_headers, receiver_username = _authenticate(root, args.receiver_token, "receiver token")
+    try:
+        kobo_api.transfer_assets(root, sender_headers, receiver_headers, receiver_username, uids)
+    except kobo_api.KoboAPIError as e:
+        print(f"FAILED: {e}", file=sys.stderr)
+        return 1
+    print(f"{len(uids)} assets transferred to {receiver_username}.")
+    return 0
+
+
+def _metadata_field(name: str) -> str:
+    column = metadata.settings_column(name)
+    if column is None:
+        fields = ", ".join(c.lower().replace(" ", "-") for c in metadata.SETTINGS)
+        raise argparse.ArgumentTypeError(f"unknown field {name!r} (choose from {fields})")
+    return column
+
+
+def cmd_set_metadata(args) -> int:
+    column, uids = args.field, _uids(args)
+    if args.value not in metadata.OPTIONS[column]:
+        raise SystemExit(f"{args.value!r} is not an allowed {column} value; choose from: "
+                         f"{', '.join(metadata.OPTIONS[column])}")
+    imported = pd.DataFrame({"UID": uids, column: args.value})
+    if args.dry_run:
+        changes = pd.DataFrame({"UID": uids, "field": column, "new": args.value})
+        return _dry_run(planner.plan_metadata(metadata.settings_updates(changes)))
+    root = kobo_api.api_root(args.server)
+    headers, username = _authenticate(root, args.token)
+
+    # Same checks as an import in the Metadata Switcher: the account's own
+    # assets only, legal entities on deployed or archived ones, no-op edits skipped
+    index = AssetIndex.open(root, username)
+    index.sync(root, headers)
+    current = metadata.metadata_frame(index.records(owner=username))
+    valid, problems = metadata.validate_import(imported, current)
+    for row in problems.itertuples(index=False):
+        print(f"SKIPPED {row.UID}: {row.problem}", file=sys.stderr)
+    updates = metadata.settings_updates(metadata.diff(current, valid, [column]))
+    failures = kobo_api.update_asset_settings(root, headers, updates, on_progress=_progress, delay=args.delay)
+    if updates:
+        index.mark_stale()
+    if len(valid) > len(updates):
+        print(f"{len(valid) - len(updates)} assets already had this value.")
+    return max(_report(failures, len(updates)), int(not problems.empty))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kobotool", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    relabel = commands.add_parser("relabel", help="switch datasets from XML names to labels (or back)")
+    relabel.add_argument("--form", required=True, help="the Kobo XLSForm the data was exported from")
+    relabel.add_argument("--data", required=True, nargs="+", help="dataset .xlsx files or directories of them")
+    relabel.add_argument("--label", help="label column to switch to, or from with --reverse "
+                                         "(default: the form's first)")
+    relabel.add_argument("--sep", default="/", choices=["/", ".", "__"],
+                         help="separator used in select_multiple column names")
+    relabel.add_argument("--format", default="xlsx", choices=list(OUTPUT_FORMATS))
+    relabel.add_argument("--out", default="relabeled", help="output directory")
+    relabel.add_argument("--reverse", action="store_true",
+                         help="switch labeled datasets back to XML names, exploding select_multiple columns")
+    relabel.add_argument("--all-labels", action="store_true",
+                         help="switch to every label language of the form in one pass (ignores --label)")
+    relabel.add_argument("--layout", default="per-language", choices=["per-language", "combined"],
+                         help="with --all-labels, one file per language or one file with every language")
+    relabel.add_argument("--asset", help="UID of the Kobo asset the data was exported from; relabels each "
+                                         "submission with its own deployed form version")
+    relabel.set_defaults(func=cmd_relabel)
+
+    codebook = commands.add_parser("codebook", help="extract the variables of XLSForms to CSV")
+    codebook.add_argument("forms", nargs="+", help="XLSForm .xlsx files or directories of them")
+    codebook.add_argument("--out", default="codebooks", help="output directory")
+    codebook.set_defaults(func=cmd_codebook)
+
+    for sub in (relabel, codebook):
+        sub.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                         help="files processed in parallel")
+
+    server = get_config().kobo.server
+    relabel.add_argument("--server", default=server, help=f"Kobo server URL, with --asset (default: {server})")
+    relabel.add_argument("--token", default=os.environ.get("KOBO_TOKEN"),
+                         help="API token, with --asset (default: $KOBO_TOKEN)")
+
+    bulk = argparse.ArgumentParser(add_help=False)
+    bulk.add_argument("uids", nargs="*", help="asset UIDs")
+    bulk.add_argument("--uids-file", help="file with one asset UID per line")
+    bulk.add_argument("--server", default=server, help=f"Kobo server URL (default: {server})")
+    bulk.add_argument("--token", default=os.environ.get("KOBO_TOKEN"),
+                      help="owner API token (default: $KOBO_TOKEN)")
+    bulk.add_argument("--delay", type=float,
+                      help="pause between requests, in seconds (default: from performance.rate_limit)")
+    bulk.add_argument("--dry-run", action="store_true",
+                      help="print the requests that would be sent and an estimated duration, then exit")
+
+    archive = commands.add_parser("archive", parents=[bulk], help="archive assets")
+    archive.set_defaults(func=cmd_archive)
+
+    transfer = commands.add_parser("transfer", parents=[bulk], help="transfer assets to another account")
+    transfer.add_argument("--receiver-token", required=True, help="API token of the receiving account")
+    transfer.set_defaults(func=cmd_transfer)
+
+    set_metadata = commands.add_parser("set-metadata", parents=[bulk], help="set a metadata field on assets")
+    set_metadata.add_argument("--field", required=True, type=_metadata_field,
+                              help="pii, function (or sector) or legal-entity")
+    set_metadata.add_argument("--value", required=True, help="one of the values the Metadata Switcher offers")
+    set_metadata.set_defaults(func=cmd_set_metadata)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
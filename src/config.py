@@ -0,0 +1,160 @@
+import dataclasses
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(ROOT, "config", "config.yaml")
+
+
+@dataclass(frozen=True)
+class KoboSettings:
+    server: str = "https://kobo.drc.ngo"
+    api_version: str = "v2"
+
+
+@dataclass(frozen=True)
+class PerformanceSettings:
+    """
+    Throughput knobs, tunable per deployment.
+
+    Attributes:
+        page_size (int): Assets requested per page when listing.
+        max_concurrency (int): Requests in flight at once for bulk operations.
+        rate_limit (float): Requests per second sent to the server (0 disables the limit).
+        connect_timeout (float): Seconds to wait for a connection.
+        read_timeout (float): Seconds to wait for a response.
+        max_retries (int): Times a throttled (429) or unavailable (503) request is retried.
+        retry_max_wait (float): Longest wait before a retry, whatever ``Retry-After`` says.
+        identity_cache_size (int): Tokens whose username is remembered.
+        identity_ttl (int): Seconds a token's username is trusted without re-checking.
+        http_cache_ttl (int): Seconds a cached GET response stays fresh.
+        http_cache_max_mb (int): Disk space the HTTP cache may use.
+        submission_count_ttl (int): Seconds before a delta sync also refreshes submission counts.
+        grid_page_size (int): Assets sent to the browser per page of an asset grid.
+    """
+    page_size: int = 100
+    max_concurrency: int = 4
+    rate_limit: float = 20.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 60.0
+    max_retries: int = 3
+    retry_max_wait: float = 30.0
+    identity_cache_size: int = 256
+    identity_ttl: int = 900
+    http_cache_ttl: int = 300
+    http_cache_max_mb: int = 256
+    submission_count_ttl: int = 3600
+    grid_page_size: int = 50
+
+    @property
+    def timeout(self) -> tuple:
+        return (self.connect_timeout, self.read_timeout)
+
+    @property
+    def request_delay(self) -> float:
+        return 1 / self.rate_limit if self.rate_limit else 0.0
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    level: str = "INFO"
+    # Relative to the repository root unless absolute; None logs to stderr
+    file: str = None
+    timings_panel: bool = False
+
+    @property
+    def path(self):
+        return os.path.join(ROOT, self.file) if self.file else None
+
+
+@dataclass(frozen=True)
+class ProfilingSettings:
+    enabled: bool = False
+    dir: str = "artifacts/profiles"
+
+
+@dataclass(frozen=True)
+class StorageSettings:
+    # Local caches (asset index, HTTP responses), relative to the repository root unless absolute
+    cache_dir: str = ".cache"
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(ROOT, self.cache_dir, *parts)
+
+
+@dataclass(frozen=True)
+class Settings:
+    kobo: KoboSettings = field(default_factory=KoboSettings)
+    performance: PerformanceSettings = field(default_factory=PerformanceSettings)
+    logging: LoggingSettings = field(default_factory=LoggingSettings)
+    profiling: ProfilingSettings = field(default_factory=ProfilingSettings)
+    storage: StorageSettings = field(default_factory=StorageSettings)
+
+
+@lru_cache(maxsize=1)
+def load_config(path: str = CONFIG_PATH) -> dict:
+    """
+    Read ``config/config.yaml`` once per process.
+
+    Returns:
+        dict: The parsed configuration, or an empty dict if the file is missing.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+# Spellings accepted for boolean settings (YAML booleans arrive as bool already)
+_TRUE = {"1", "true", "yes", "on"}
+_FALSE = {"0", "false", "no", "off", ""}
+
+
+def _bool(value):
+    if isinstance(value, (bool, int)) and value in (0, 1):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError
+
+
+def _section(cls, name: str, values: dict):
+    # Build one settings section, casting each value to its default's type
+    values = values or {}
+    fields = {f.name: f for f in dataclasses.fields(cls)}
+    unknown = set(values) - set(fields)
+    if unknown:
+        raise ValueError(f"Unknown setting(s) in '{name}': {', '.join(sorted(unknown))}")
+    kwargs = {}
+    for key, value in values.items():
+        default = fields[key].default
+        if value is not None and default is not None and not isinstance(value, type(default)):
+            try:
+                value = _bool(value) if isinstance(default, bool) else type(default)(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Setting '{name}.{key}' must be a {type(default).__name__}, got {value!r}")
+        kwargs[key] = value
+    return cls(**kwargs)
+
+
+@lru_cache(maxsize=1)
+def get_config(path: str = CONFIG_PATH) -> Settings:
+    """
+    Typed view of ``config/config.yaml``, parsed once per process.
+
+    Missing sections and keys fall back to the defaults above.
+
+    Raises:
+        ValueError: If the file has an unknown key or a value of the wrong type.
+    """
+    raw = load_config(path)
+    return Settings(**{
+        f.name: _section(f.default_factory, f.name, raw.get(f.name))
+        for f in dataclasses.fields(Settings)
+    })
@@ -0,0 +1,177 @@
+"""
+Asyncio engine for Kobo API fan-out (paginated listing, per-asset PATCHes...).
+
+One event loop drives every request of a batch over a shared HTTP/2 keep-alive
+connection pool, with a semaphore bounding the requests in flight and a minimum
+spacing between request starts to respect the server's rate limit. Callers stay
+synchronous:
+
+    responses = engine.gather([("PATCH", url, {"json": payload}) for url in urls], headers=headers)
+"""
+import asyncio
+import contextvars
+import importlib.util
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+from src import http_cache
+from src.config import get_config
+from src.instrumentation import endpoint_of, span
+from src.lazy import lazy_import
+
+httpx = lazy_import("httpx")
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Throttled or temporarily unavailable: retried after the server's Retry-After
+RETRY_STATUSES = (429, 503)
+
+
+class _Spacing:
+    # Hands out request start times at least `delay` seconds apart
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.delay:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def _send(client, semaphore, spacing, method: str, url: str, kwargs: dict):
+    entry = None
+    if method == "GET":
+        # Served from the response cache when fresh, revalidated otherwise (see src.http_cache);
+        # its SQLite reads and writes run on worker threads to keep the loop free
+        entry = await asyncio.to_thread(http_cache.lookup, url, kwargs.get("params"), client.headers)
+        if entry is not None and entry.fresh:
+            with span("http.cache", method=method, endpoint=endpoint_of(url)):
+                return _cached_response(method, url, kwargs, entry)
+        kwargs = {**kwargs, "headers": {**(kwargs.get("headers") or {}), **http_cache.request_headers(entry)}}
+    settings = get_config().performance
+    for attempt in range(settings.max_retries + 1):
+        async with semaphore:
+            await spacing.wait()
+            with span("http", method=method, endpoint=endpoint_of(url)) as record:
+                resp = await client.request(method, url, **kwargs)
+                record["status"] = resp.status_code
+                record["bytes"] = len(resp.content)
+        if resp.status_code not in RETRY_STATUSES or attempt == settings.max_retries:
+            break
+        # Back off outside the semaphore, so the wait doesn't hold a slot
+        await asyncio.sleep(_retry_delay(resp, attempt, settings.retry_max_wait))
+    if method == "GET":
+        if resp.status_code == 304 and entry is not None:
+            return _cached_response(method, url, kwargs, await asyncio.to_thread(http_cache.revalidated, entry))
+        await asyncio.to_thread(http_cache.store, url, kwargs.get("params"), client.headers,
+                                resp.status_code, resp.headers, resp.content)
+    return resp
+
+
+def _retry_delay(resp, attempt: int, max_wait: float) -> float:
+    # Retry-After is either seconds or an HTTP date; without one, back off exponentially
+    value = resp.headers.get("Retry-After")
+    wait = None
+    if value:
+        try:
+            wait = float(value)
+        except ValueError:
+            try:
+                wait = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+    if wait is None:
+        wait = 0.5 * 2 ** attempt
+    return min(max(wait, 0.0), max_wait)
+
+
+def _cached_response(method: str, url: str, kwargs: dict, entry):
+    request = httpx.Request(method, url, params=kwargs.get("params"))
+    return httpx.Response(200, headers=entry.headers, content=entry.body, request=request)
+
+
+async def _gather(calls: list, headers: dict, on_progress, max_concurrency: int, delay: float) -> list:
+    settings = get_config().performance
+    results = [None] * len(calls)
+    done = 0
+    semaphore = asyncio.Semaphore(max_concurrency)
+    spacing = _Spacing(delay)
+    timeout = httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+
+    async def run(i, method, url, kwargs):
+        nonlocal done
+        try:
+            results[i] = await _send(client, semaphore, spacing, method, url, kwargs)
+        except httpx.HTTPError as e:
+            results[i] = e
+        done += 1
+        if on_progress:
+            on_progress(done, len(calls))
+
+    async with httpx.AsyncClient(headers=headers, http2=HTTP2, timeout=timeout, limits=limits) as client:
+        try:
+            async with asyncio.TaskGroup() as group:
+                for i, (method, url, kwargs) in enumerate(calls):
+                    group.create_task(run(i, method, url, kwargs or {}))
+        except BaseExceptionGroup as eg:
+            # Only the progress callback can raise here (e.g. a cancelled job); surface it as is
+            raise eg.exceptions[0]
+    return results
+
+
+def gather(calls: list, headers: dict = None, on_progress=None,
+           max_concurrency: int = None, delay: float = None) -> list:
+    """
+    Send a batch of requests concurrently and wait for all of them.
+
+    Args:
+        calls (list): ``(method, url, kwargs)`` tuples; kwargs go to
+            ``httpx.AsyncClient.request`` (``json``, ``params``...).
+        headers (dict): Headers sent with every request (e.g. ``auth_headers``).
+        on_progress: Optional callable ``(done, total)`` called as requests complete.
+            An exception it raises cancels the requests still pending and is re-raised.
+        max_concurrency (int): Requests in flight at once (default: ``performance.max_concurrency``).
+        delay (float): Minimum seconds between request starts (default: from ``performance.rate_limit``).
+
+    Responses with a status in ``RETRY_STATUSES`` (429, 503) are retried up to
+    ``performance.max_retries`` times, after the server's ``Retry-After`` (at
+    most ``performance.retry_max_wait`` seconds); the last one is returned.
+
+    Returns:
+        list: For each call, in order, its ``httpx.Response`` or the ``httpx.HTTPError``
+        that prevented one.
+    """
+    if not calls:
+        return []
+    settings = get_config().performance
+    coro = _gather(list(calls), headers, on_progress,
+                   max_concurrency or settings.max_concurrency,
+                   settings.request_delay if delay is None else delay)
+    try:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        # Already inside an event loop: run the batch on a loop of its own, keeping the run's spans
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(contextvars.copy_context().run, asyncio.run, coro).result()
+    finally:
+        # Writes, even partial or cancelled, make cached reads of their assets stale
+        http_cache.invalidate([url for method, url, _ in calls if method != "GET"])
+
+
+def status_of(result) -> object:
+    """
+    HTTP status of a ``gather`` result, or the error's class name if no response came back.
+    """
+    return result.status_code if isinstance(result, httpx.Response) else type(result).__name__
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+import weakref
+import zipfile
+
+from src.instrumentation import span
+from src.lazy import lazy_import
+from src.utils import make_unique_columns
+
+openpyxl = lazy_import("openpyxl")
+pa = lazy_import("pyarrow")
+pd = lazy_import("pandas")
+pq = lazy_import("pyarrow.parquet")
+
+# Outputs estimated above this size are spooled to a temp file instead of RAM
+SPOOL_THRESHOLD = 32 * 1024 * 1024
+# Per-session spool directories live here; any older than SPOOL_MAX_AGE seconds is swept
+SPOOL_ROOT = os.path.join(tempfile.gettempdir(), "kobotool")
+SPOOL_MAX_AGE = 24 * 3600
+# Rows converted to Python objects at a time while writing
+CHUNK_ROWS = 10_000
+# Characters Excel does not allow in sheet names
+_SHEET_UNSAFE = re.compile(r"[][:*?/\\]")
+
+
+def estimate_size(frames: list) -> int:
+    """
+    Rough in-memory size of the frames, used to decide where to spool the output.
+    """
+    return int(sum(df.memory_usage(index=False, deep=True).sum() for df in frames))
+
+
+_swept = False
+
+
+def sweep_spool(max_age: float = SPOOL_MAX_AGE) -> None:
+    """
+    Delete the spool directories not modified for ``max_age`` seconds, e.g. left
+    by sessions of a server that was killed before they ended.
+    """
+    if not os.path.isdir(SPOOL_ROOT):
+        return
+    cutoff = time.time() - max_age
+    for entry in os.scandir(SPOOL_ROOT):
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class SpoolDir:
+    """
+    A temp directory for one session's spooled outputs, deleted with the object
+    (keep it in ``st.session_state`` so it goes when the session ends).
+
+    The first one created in a process sweeps the stale directories first.
+    """
+    def __init__(self):
+        global _swept
+        if not _swept:
+            sweep_spool()
+            _swept = True
+        os.makedirs(SPOOL_ROOT, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix="session_", dir=SPOOL_ROOT)
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.path, True)
+
+    def cleanup(self) -> None:
+        self._cleanup()
+
+
+def _open_buffer(size_hint: int, suffix: str, spool_dir: str = None):
+    if size_hint < SPOOL_THRESHOLD:
+        return io.BytesIO()
+    return tempfile.NamedTemporaryFile(prefix="kobotool_", suffix=suffix, dir=spool_dir, delete=False)
+
+
+def _finish_buffer(buffer):
+    # Hand back something st.download_button accepts: the BytesIO itself, or the
+    # temp file re-opened read-only so the bytes stay on disk until downloaded
+    if isinstance(buffer, io.BytesIO):
+        buffer.seek(0)
+        return buffer
+    buffer.close()
+    return open(buffer.name, "rb")
+
+
+def discard(artifact) -> None:
+    """
+    Release an artifact returned by one of the writers, deleting its temp file if any.
+    """
+    if artifact is None:
+        return
+    artifact.close()
+    name = getattr(artifact, "name", None)
+    if isinstance(name, str) and os.path.exists(name):
+        os.remove(name)
+
+
+def _rows(df: pd.DataFrame):
+    # Convert a chunk at a time so NaN/NaT become empty cells without copying the frame
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def write_excel(frames: list, sheet_names: list, size_hint: int = None, spool_dir: str = None):
+    """
+    Write the frames to an .xlsx workbook with openpyxl's write-only engine.
+
+    Rows are streamed into the workbook instead of building every cell in memory,
+    and large outputs are written to a temp file.
+
+    Args:
+        frames (list): DataFrames to write, one per sheet.
+        sheet_names (list): Sheet name for each frame.
+        size_hint (int): Estimated output size in bytes (see ``estimate_size``).
+        spool_dir (str): Directory for a spooled output (default: the system temp dir).
+
+    Returns:
+        A readable binary file object holding the workbook.
+    """
+    size_hint = estimate_size(frames) if size_hint is None else size_hint
+    buffer = _open_buffer(size_hint, ".xlsx", spool_dir)
+
+    with span("write_output", format="xlsx", sheets=len(frames)):
+        wb = openpyxl.Workbook(write_only=True)
+        for df, sheet_name in zip(frames, sheet_names):
+            ws = wb.create_sheet(title=str(sheet_name)[:31])
+            ws.append([str(c) for c in df.columns])
+            for row in _rows(df):
+                ws.append(row)
+        wb.save(buffer)
+
+    return _finish_buffer(buffer)
+
+
+def write_csv_zip(frames: list, sheet_names: list = None, size_hint: int = None, spool_dir: str = None):
+    """
+    Write each frame as ``Sheet<n>.csv`` into a ZIP archive, streaming every CSV
+    straight into its archive member.
+
+    Args:
+        frames (list): DataFrames to write.
+        sheet_names (list): Unused; members keep the ``Sheet<n>.csv`` names.
+        size_hint (int): Estimated output size in bytes (see ``estimate_size``).
+        spool_dir (str): Directory for a spooled output (default: the system temp dir).
+
+    Returns:
+        A readable binary file object holding the archive.
+    """
+    size_hint = estimate_size(frames) if size_hint is None else size_hint
+    buffer = _open_buffer(size_hint, ".zip", spool_dir)
+
+    with span("write_output", format="csv", sheets=len(frames)), \
+            zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for idx, df in enumerate(frames):
+            with zipf.open(f"Sheet{idx + 1}.csv", "w", force_zip64=True) as member:
+                text = io.TextIOWrapper(member, encoding="utf-8", newline="")
+                df.to_csv(text, index=False, chunksize=CHUNK_ROWS)
+                text.flush()
+                text.detach()
+
+    return _finish_buffer(buffer)
+
+
+def _arrow_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Arrow needs unique string headers and one type per column. Repetitive text
+    # columns (choice labels) become Categoricals over the whole column, so every
+    # batch is dictionary-encoded with the same dictionary (IPC files allow only one)
+    df = df.copy(deep=False)
+    df.columns = make_unique_columns([str(c) for c in df.columns])
+    for col in df.columns:
+        values = df[col]
+        if not pd.api.types.is_string_dtype(values.dtype) or isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+        if kind.startswith("mixed"):
+            values = values.where(values.isna(), values.astype(str))
+            kind = "string"
+        if kind == "string" and values.nunique(dropna=True) <= max(len(values) // 2, 1):
+            values = values.astype("category")
+        df[col] = values
+    return df
+
+
+def _arrow_schema(df: pd.DataFrame) -> pa.Schema:
+    return pa.Schema.from_pandas(df, preserve_index=False)
+
+
+def _batches(df: pd.DataFrame, schema: pa.Schema):
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield pa.Table.from_pandas(df.iloc[start:start + CHUNK_ROWS], schema=schema, preserve_index=False)
+
+
+def _write_arrow_zip(frames: list, sheet_names: list, size_hint: int, extension: str, write_sheet,
+                     spool_dir: str = None):
+    size_hint = estimate_size(frames) if size_hint is None else size_hint
+    buffer = _open_buffer(size_hint, ".zip", spool_dir)
+
+    # Members are already compressed, so the archive only stores them
+    with span("write_output", format=extension, sheets=len(frames)), \
+            zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zipf:
+        for df, sheet_name in zip(frames, sheet_names):
+            df = _arrow_frame(df)
+            schema = _arrow_schema(df)
+            with zipf.open(f"{sheet_name}.{extension}", "w", force_zip64=True) as member:
+                write_sheet(member, df, schema)
+
+    return _finish_buffer(buffer)
+
+
+def write_parquet_zip(frames: list, sheet_names: list, size_hint: int = None, spool_dir: str = None):
+    """
+    Write each frame as ``<sheet>.parquet`` into a ZIP archive.
+
+    Each sheet is streamed in row groups of ``CHUNK_ROWS``; repetitive text columns
+    are dictionary-encoded and duplicate headers are renamed like the preview.
+
+    Args:
+        frames (list): DataFrames to write, one per sheet.
+        sheet_names (list): Sheet name for each frame.
+        size_hint (int): Estimated output size in bytes (see ``estimate_size``).
+        spool_dir (str): Directory for a spooled output (default: the system temp dir).
+
+    Returns:
+        A readable binary file object holding the archive.
+    """
+    def write_sheet(member, df, schema):
+        with pq.ParquetWriter(member, schema, compression="zstd", use_dictionary=True) as writer:
+            for table in _batches(df, schema):
+                writer.write_table(table)
+
+    return _write_arrow_zip(frames, sheet_names, size_hint, "parquet", write_sheet, spool_dir)
+
+
+def write_feather_zip(frames: list, sheet_names: list, size_hint: int = None, spool_dir: str = None):
+    """
+    Write each frame as ``<sheet>.feather`` (Arrow IPC file) into a ZIP archive.
+
+    Args:
+        frames (list): DataFrames to write, one per sheet.
+        sheet_names (list): Sheet name for each frame.
+        size_hint (int): Estimated output size in bytes (see ``estimate_size``).
+        spool_dir (str): Directory for a spooled output (default: the system temp dir).
+
+    Returns:
+        A readable binary file object holding the archive.
+    """
+    def write_sheet(member, df, schema):
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        with pa.ipc.new_file(member, schema, options=options) as writer:
+            for table in _batches(df, schema):
+                writer.write_table(table)
+
+    return _write_arrow_zip(frames, sheet_names, size_hint, "feather", write_sheet, spool_dir)
+
+
+# ----- Several label languages -----
+def language_name(label: str) -> str:
+    """
+    The language of a label column: ``"label::English (en)"`` -> ``"English (en)"``.
+    """
+    return label.split("::", 1)[1] if "::" in label else label
+
+
+def language_slug(label: str) -> str:
+    """
+    ``language_name`` made safe for a file name: ``"English (en)"`` -> ``"English_en"``.
+    """
+    return re.sub(r"[^\w-]+", "_", language_name(label)).strip("_") or "label"
+
+
+def combine_languages(frames_by_label: dict, sheet_names: list):
+    """
+    Lay out the switched sheets of every language in one workbook: each sheet
+    once per language, named ``<sheet> (<language>)`` within Excel's 31
+    characters and without the characters Excel forbids.
+
+    Args:
+        frames_by_label (dict): ``{label: [DataFrame per sheet]}`` (see ``utils.relabel_languages``).
+        sheet_names (list): Name of each sheet.
+
+    Returns:
+        tuple: ``(frames, sheet_names)`` to pass to any writer.
+    """
+    frames, names, seen = [], [], set()
+    for label, label_frames in frames_by_label.items():
+        suffix = f" ({_SHEET_UNSAFE.sub('_', language_name(label))[:25]})"
+        for df, sheet in zip(label_frames, sheet_names):
+            base = _SHEET_UNSAFE.sub("_", str(sheet))
+            name = base[:31 - len(suffix)] + suffix
+            n = 1
+            while name.lower() in seen:
+                n += 1
+                tail = f"{suffix[:-1]} {n})"
+                name = base[:31 - len(tail)] + tail
+            seen.add(name.lower())
+            frames.append(df)
+            names.append(name)
+    return frames, names
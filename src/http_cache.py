@@ -0,0 +1,252 @@
+"""
+On-disk cache of Kobo API GET responses, shared by every page, session and job.
+
+Every GET asks for compressed bodies. Responses of the endpoints listed in
+``ENDPOINT_TTLS`` (asset lists, asset details, XLSForms and form versions) are
+kept per (URL, token hash) in ``<storage.cache_dir>/http.sqlite``; any other
+endpoint, e.g. submission data, never reaches the disk:
+
+- within the endpoint's TTL (``ENDPOINT_TTLS``, else ``performance.http_cache_ttl``)
+  a response is served from disk without contacting the server;
+- after it, a response carrying an ``ETag`` or ``Last-Modified`` validator is
+  revalidated with ``If-None-Match`` / ``If-Modified-Since`` and a ``304`` is
+  answered from disk;
+- writes (PATCH/POST...) drop the cached responses they can make stale;
+- the least recently used responses are evicted beyond ``performance.http_cache_max_mb``.
+
+    entry = http_cache.lookup(url, params, headers)
+    if entry and entry.fresh: body = entry.body
+    headers = {**headers, **http_cache.request_headers(entry)}
+    ...
+    if status == 304 and entry: body = http_cache.revalidated(entry).body
+    else: http_cache.store(url, params, headers, status, response_headers, body)
+"""
+import contextvars
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, replace
+from urllib.parse import urlencode
+
+from src.config import get_config
+from src.instrumentation import endpoint_of
+
+# Brotli is only offered when a decoder is installed (pip install brotli)
+BROTLI = any(importlib.util.find_spec(name) is not None for name in ("brotli", "brotlicffi"))
+ACCEPT_ENCODING = "br, gzip, deflate" if BROTLI else "gzip, deflate"
+# The only endpoints whose responses are stored, with the seconds they stay fresh
+# (None: performance.http_cache_ttl). Submission data and access logs are left out
+ENDPOINT_TTLS = {
+    "/assets/": None,
+    # Asset detail (.json) and XLSForm download (.xls)
+    "/assets/{id}": None,
+    "/assets/{id}/": None,
+    "/assets/{id}/versions/": None,
+    "/assets/{id}/versions/{id}/": None,
+}
+# Headers describing the transfer rather than the (decoded) body
+_TRANSFER_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT,
+    token TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT,
+    body BLOB,
+    size INTEGER,
+    stored_at REAL,
+    used_at REAL,
+    PRIMARY KEY (url, token)
+);
+CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at);
+"""
+
+# Set inside ``revalidate()``: cached responses are checked with the server even if fresh
+_revalidate = contextvars.ContextVar("kobotool_http_revalidate", default=False)
+_ready = set()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Entry:
+    """
+    A cached 200 response: its validators, headers and decoded body.
+    """
+    url: str
+    token: str
+    etag: str
+    last_modified: str
+    headers: dict
+    body: bytes
+    stored_at: float
+
+    @property
+    def fresh(self) -> bool:
+        ttl = ENDPOINT_TTLS.get(endpoint_of(self.url))
+        if ttl is None:
+            ttl = get_config().performance.http_cache_ttl
+        return not _revalidate.get() and time.time() - self.stored_at < ttl
+
+
+def cacheable(url: str) -> bool:
+    """
+    Whether GET responses of ``url`` may be stored (see ``ENDPOINT_TTLS``).
+    """
+    return endpoint_of(url) in ENDPOINT_TTLS
+
+
+def _path() -> str:
+    return get_config().storage.path("http.sqlite")
+
+
+def _connect() -> sqlite3.Connection:
+    path = _path()
+    with _lock:
+        if path not in _ready:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with closing(sqlite3.connect(path, timeout=30)) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                # Drop responses stored before their endpoint left ENDPOINT_TTLS
+                conn.executemany("DELETE FROM responses WHERE url = ?",
+                                 [row for row in conn.execute("SELECT DISTINCT url FROM responses")
+                                  if not cacheable(row[0])])
+                conn.commit()
+            _ready.add(path)
+    return sqlite3.connect(path, timeout=30)
+
+
+def _key(url: str, params, headers) -> tuple:
+    # The same URL can answer differently per user, so the token is part of the key
+    if params:
+        url += ("&" if "?" in url else "?") + urlencode(params, doseq=True)
+    auth = next((v for k, v in (headers or {}).items() if k.lower() == "authorization"), "")
+    return url, hashlib.sha256(auth.encode("utf-8")).hexdigest()
+
+
+def lookup(url: str, params=None, headers=None):
+    """
+    Return the cached response for this GET, or None.
+    """
+    if not cacheable(url):
+        return None
+    key = _key(url, params, headers)
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT etag, last_modified, headers, body, stored_at FROM responses "
+                           "WHERE url = ? AND token = ?", key).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE responses SET used_at = ? WHERE url = ? AND token = ?", (time.time(), *key))
+    etag, last_modified, headers, body, stored_at = row
+    return Entry(*key, etag, last_modified, json.loads(headers), body, stored_at)
+
+
+def request_headers(entry=None) -> dict:
+    """
+    Headers to add to a GET: compression, plus the validators of ``entry``.
+    """
+    headers = {"Accept-Encoding": ACCEPT_ENCODING}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+def store(url: str, params, headers, status: int, response_headers, body: bytes) -> None:
+    """
+    Cache a GET response if it is a 200 of a cacheable endpoint; drop the URL's
+    entry otherwise.
+    """
+    if not cacheable(url):
+        return
+    key = _key(url, params, headers)
+    with closing(_connect()) as conn, conn:
+        if status != 200:
+            conn.execute("DELETE FROM responses WHERE url = ? AND token = ?", key)
+            return
+        kept = {k: v for k, v in response_headers.items() if k.lower() not in _TRANSFER_HEADERS}
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (*key, response_headers.get("ETag"), response_headers.get("Last-Modified"),
+                      json.dumps(kept), body, len(body), now, now))
+        _evict(conn)
+
+
+def revalidated(entry: Entry) -> Entry:
+    """
+    Record that the server confirmed ``entry`` (304): it is fresh again.
+    """
+    now = time.time()
+    with closing(_connect()) as conn, conn:
+        conn.execute("UPDATE responses SET stored_at = ?, used_at = ? WHERE url = ? AND token = ?",
+                     (now, now, entry.url, entry.token))
+    return replace(entry, stored_at=now)
+
+
+def _evict(conn) -> None:
+    # Drop least recently used responses until the cache fits in http_cache_max_mb
+    budget = get_config().performance.http_cache_max_mb * 1024 * 1024
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= budget:
+        return
+    excess, doomed = total - budget, []
+    for url, token, size in conn.execute("SELECT url, token, size FROM responses ORDER BY used_at"):
+        doomed.append((url, token))
+        excess -= size
+        if excess <= 0:
+            break
+    conn.executemany("DELETE FROM responses WHERE url = ? AND token = ?", doomed)
+
+
+def _stale_prefixes(url: str) -> set:
+    # Cached URLs a write to `url` can change, for every token: the asset
+    # written to and the asset lists, or every asset for other writes (invites...)
+    match = re.match(r"^(.*?/api/v\d+)(/[^?]*)", url)
+    if not match:
+        return set()
+    root, path = match.groups()
+    asset = re.match(r"^/assets/([^/.?]+)", path)
+    if asset:
+        return {f"{root}/assets/{asset.group(1)}", f"{root}/assets/?"}
+    return {f"{root}/assets/"}
+
+
+def invalidate(urls) -> None:
+    """
+    Drop the cached responses made stale by writes to ``urls``.
+    """
+    prefixes = set().union(*map(_stale_prefixes, urls)) if urls else set()
+    if not prefixes:
+        return
+    with closing(_connect()) as conn, conn:
+        # Range scans on the primary key: url >= prefix AND url < prefix + U+FFFF
+        conn.executemany("DELETE FROM responses WHERE url >= ? AND url < ?",
+                         [(prefix, prefix + "\uffff") for prefix in prefixes])
+
+
+@contextmanager
+def revalidate():
+    """
+    Check every cached response used in the block with the server, fresh or not
+    (e.g. when the user asks for a refresh).
+    """
+    token = _revalidate.set(True)
+    try:
+        yield
+    finally:
+        _revalidate.reset(token)
+
+
+def clear() -> None:
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM responses")
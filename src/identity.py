@@ -0,0 +1,76 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from src import kobo_api
+from src.config import get_config
+
+# (root, token hash) -> (username, expiry), least recently used first
+_usernames = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Identity:
+    """
+    A token validated against one Kobo server, and the user it belongs to.
+    """
+    root: str
+    token: str = field(repr=False)
+    username: str
+
+    @property
+    def headers(self) -> dict:
+        return kobo_api.auth_headers(self.token)
+
+
+def token_hash(token: str) -> str:
+    """
+    Stable digest of a token, so the cache never holds the token itself.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def resolve(root: str, token: str):
+    """
+    Validate ``token`` on ``root``, reusing the username resolved for it within
+    the last ``performance.identity_ttl`` seconds.
+
+    The cache is process-wide, so a token checked on one page (or in another
+    session) costs no further ``/access-logs/me/`` round trips until it expires.
+    Invalid tokens are not cached.
+
+    Returns:
+        Identity: The validated identity, or None if the token is invalid.
+    """
+    if not token:
+        return None
+    settings = get_config().performance
+    key = (root, token_hash(token))
+    now = time.monotonic()
+    with _lock:
+        cached = _usernames.get(key)
+        if cached and cached[1] > now:
+            _usernames.move_to_end(key)
+            return Identity(root, token, cached[0])
+
+    username = kobo_api.validate_token(root, token)
+    if not username:
+        forget(root, token)
+        return None
+    with _lock:
+        _usernames[key] = (username, now + settings.identity_ttl)
+        _usernames.move_to_end(key)
+        while len(_usernames) > settings.identity_cache_size:
+            _usernames.popitem(last=False)
+    return Identity(root, token, username)
+
+
+def forget(root: str, token: str) -> None:
+    """
+    Drop the cached username of a token, e.g. after the server rejected it.
+    """
+    with _lock:
+        _usernames.pop((root, token_hash(token)), None)
@@ -0,0 +1,109 @@
+import contextvars
+import json
+import logging
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from src.config import get_config
+
+logger = logging.getLogger("kobotool")
+
+# Spans recorded during the current script run (one list per run)
+_run_spans = contextvars.ContextVar("kobotool_run_spans", default=None)
+_configured = False
+# Latest latencies of successful HTTP calls per (method, endpoint), shared by all runs and jobs
+LATENCY_SAMPLES = 200
+_latencies = {}
+_latencies_lock = threading.Lock()
+
+
+def configure_logging() -> None:
+    """
+    Attach the structured log handler once per process, using the ``logging``
+    section of ``config/config.yaml``.
+    """
+    global _configured
+    if _configured:
+        return
+    settings = get_config().logging
+    logger.setLevel(getattr(logging, settings.level.upper(), logging.INFO))
+    handler = logging.FileHandler(settings.path, encoding="utf-8") if settings.path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(handler)
+    logger.propagate = False
+    _configured = True
+
+
+def start_run() -> list:
+    """
+    Start collecting spans for a new script run and return the (empty) list.
+    """
+    spans = []
+    _run_spans.set(spans)
+    return spans
+
+
+def current_spans() -> list:
+    """
+    Return the spans recorded so far in the current run.
+    """
+    return _run_spans.get() or []
+
+
+def _record_latency(record: dict) -> None:
+    key = (record.get("method"), record.get("endpoint"))
+    with _latencies_lock:
+        _latencies.setdefault(key, deque(maxlen=LATENCY_SAMPLES)).append(record["ms"])
+
+
+def endpoint_latency(method: str, endpoint: str):
+    """
+    Median latency in ms of the recent ``method`` calls to ``endpoint`` in this
+    process, or None if none succeeded yet.
+    """
+    with _latencies_lock:
+        samples = list(_latencies.get((method, endpoint), ()))
+    return statistics.median(samples) if samples else None
+
+
+def endpoint_of(url: str) -> str:
+    """
+    Reduce a Kobo URL to its endpoint template, e.g. ``/assets/{id}/deployment/``.
+    """
+    path = re.sub(r"^https?://[^/]+", "", url).split("?", 1)[0]
+    path = re.sub(r"^/api/v\d+", "", path)
+    return re.sub(r"/(assets|invites|users|versions)/[^/]+", r"/\1/{id}", path)
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """
+    Time a block and emit it as one structured log line.
+
+    The yielded dict can be filled with extra fields (status, bytes, rows...)
+    before the block ends; they are logged along with the latency.
+
+    Example:
+        with span("relabel.headers", columns=len(df.columns)):
+            ...
+    """
+    configure_logging()
+    record = {"stage": stage, **fields}
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        spans = _run_spans.get()
+        if spans is not None:
+            spans.append(record)
+        if stage == "http" and "error" not in record and (record.get("status") or 0) < 400:
+            _record_latency(record)
+        logger.info(json.dumps(record, default=str))
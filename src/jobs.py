@@ -0,0 +1,179 @@
+"""
+In-process scheduler for long-running bulk operations.
+
+Jobs run on a shared thread pool, outside any Streamlit script run, so they
+keep going when the user reruns the page or navigates away. Pages keep only
+the job id and poll the registry for progress and results.
+
+    job = jobs.submit("archive", kobo_api.archive_assets, root, headers, uids, label="Archive 120 assets")
+    ...
+    job = jobs.get(job_id)
+    job.done, job.total, job.status, job.result
+"""
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import get_config
+from src.instrumentation import logger
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+# Finished jobs kept in the registry before the oldest are dropped
+MAX_FINISHED = 200
+
+_jobs = {}
+_lock = threading.Lock()
+_pool = None
+_order = itertools.count()
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job's progress callback once the job has been cancelled.
+    """
+
+
+class Job:
+    """
+    One submitted operation and everything a page needs to follow it.
+
+    Attributes:
+        id (str): Registry key, safe to keep in the session state.
+        kind (str): Operation name, e.g. ``"archive"``.
+        label (str): Human-readable description.
+        status (str): One of queued/running/done/failed/cancelled.
+        done, total (int): Progress reported by the operation.
+        events (list): ``{"time", "done", "total"}`` for every progress report.
+        result: The operation's return value once done.
+        error (str): The exception message if it failed.
+    """
+    def __init__(self, kind: str, label: str, cancellable: bool = True):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.cancellable = cancellable
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.events = []
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._seq = next(_order)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def fraction(self) -> float:
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def progress(self, done: int, total: int) -> None:
+        """
+        Progress callback handed to the operation as ``on_progress``.
+
+        Raises:
+            JobCancelled: If the job was cancelled, to stop the operation at its
+                next progress report.
+        """
+        self.done, self.total = done, total
+        self.events.append({"time": time.time(), "done": done, "total": total})
+        if self._cancel.is_set() and done < total:
+            raise JobCancelled()
+
+    def cancel(self) -> bool:
+        """
+        Ask the job to stop; it ends at its next progress report.
+
+        Returns:
+            bool: False if the job cannot be cancelled or has already finished.
+        """
+        if not self.cancellable or self.finished:
+            return False
+        self._cancel.set()
+        if self.status == QUEUED:
+            self.status = CANCELLED
+            self.finished_at = time.time()
+        return True
+
+    def _run(self, func, args, kwargs):
+        if self._cancel.is_set():
+            return
+        self.status = RUNNING
+        self.started = time.time()
+        try:
+            self.result = func(*args, on_progress=self.progress, **kwargs)
+            self.status = DONE
+        except JobCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.status = FAILED
+            logger.exception("job %s (%s) failed", self.id, self.kind)
+        finally:
+            self.finished_at = time.time()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=get_config().performance.max_concurrency,
+                                       thread_name_prefix="kobotool-job")
+        return _pool
+
+
+def _prune() -> None:
+    # Forget the oldest finished jobs beyond MAX_FINISHED
+    finished = sorted((j for j in _jobs.values() if j.finished), key=lambda j: j._seq)
+    for job in finished[:max(len(finished) - MAX_FINISHED, 0)]:
+        del _jobs[job.id]
+
+
+def submit(kind: str, func, *args, label: str = None, cancellable: bool = True, **kwargs) -> Job:
+    """
+    Run ``func(*args, on_progress=job.progress, **kwargs)`` in the background.
+
+    Args:
+        kind (str): Operation name, used to find a page's jobs again.
+        func: The operation; it must accept an ``on_progress(done, total)`` callback.
+        label (str): Description shown while the job runs.
+        cancellable (bool): False for operations that must not stop halfway.
+
+    Returns:
+        Job: The registered job.
+    """
+    job = Job(kind, label or kind, cancellable=cancellable)
+    with _lock:
+        _prune()
+        _jobs[job.id] = job
+    _executor().submit(job._run, func, args, kwargs)
+    return job
+
+
+def get(job_id: str):
+    """
+    Return the job with this id, or None if it is unknown or was pruned.
+    """
+    return _jobs.get(job_id) if job_id else None
+
+
+def list_jobs(kind: str = None) -> list:
+    """
+    Jobs in submission order, optionally only those of one kind.
+    """
+    with _lock:
+        jobs = sorted(_jobs.values(), key=lambda j: j._seq)
+    return [j for j in jobs if kind is None or j.kind == kind]
+
+
+def cancel(job_id: str) -> bool:
+    job = get(job_id)
+    return job.cancel() if job else False
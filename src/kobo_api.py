@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+from src import engine, http_cache
+from src.config import get_config
+from src.instrumentation import endpoint_of, span
+from src.lazy import lazy_import
+
+pd = lazy_import("pandas")
+requests = lazy_import("requests")
+
+ASSET_COLUMNS = ["uid", "name", "owner_username", "deployment_status"]
+
+
+class KoboAPIError(Exception):
+    """
+    Raised when a Kobo API call fails; carries the HTTP status when there is one.
+    """
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Send one HTTP request to Kobo, timed and logged as an ``http`` span with its
+    endpoint, status, response size and latency.
+
+    Uses the ``performance`` timeouts from ``config/config.yaml`` unless a
+    ``timeout`` is given. GETs go through the response cache (see
+    ``src.http_cache``): a fresh cached response is returned without a request,
+    and a 304 comes back as the cached 200. Other methods drop the cached
+    responses they make stale.
+    """
+    kwargs.setdefault("timeout", get_config().performance.timeout)
+    if method != "GET":
+        try:
+            return _send(method, url, kwargs)
+        finally:
+            http_cache.invalidate([url])
+
+    params, headers = kwargs.get("params"), kwargs.get("headers")
+    entry = http_cache.lookup(url, params, headers)
+    if entry is not None and entry.fresh:
+        with span("http.cache", method=method, endpoint=endpoint_of(url)):
+            return _cached_response(url, entry)
+    kwargs["headers"] = {**(headers or {}), **http_cache.request_headers(entry)}
+    resp = _send(method, url, kwargs)
+    if resp.status_code == 304 and entry is not None:
+        return _cached_response(url, http_cache.revalidated(entry))
+    http_cache.store(url, params, headers, resp.status_code, resp.headers, resp.content)
+    return resp
+
+
+def _send(method: str, url: str, kwargs: dict) -> requests.Response:
+    with span("http", method=method, endpoint=endpoint_of(url)) as record:
+        resp = requests.request(method, url, **kwargs)
+        record["status"] = resp.status_code
+        if kwargs.get("stream"):
+            record["bytes"] = int(resp.headers.get("Content-Length") or 0)
+        else:
+            record["bytes"] = len(resp.content)
+    return resp
+
+
+def _cached_response(url: str, entry) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code, resp.reason, resp.url = 200, "OK", url
+    resp.headers = requests.structures.CaseInsensitiveDict(entry.headers)
+    resp._content, resp._content_consumed = entry.body, True
+    return resp
+
+
+def api_root(kobo_url: str) -> str:
+    return f"{kobo_url.rstrip('/')}/api/{get_config().kobo.api_version}"
+
+
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Token {token}"}
+
+
+def validate_token(root: str, token: str):
+    """
+    Check a token against ``/access-logs/me/``.
+
+    Args:
+        root (str): The API root (see ``api_root``).
+        token (str): The user's API token.
+
+    Returns:
+        str: The username owning the token, or None if the token is invalid.
+    """
+    resp = request("GET", f"{root}/access-logs/me/?format=json&limit=1", headers=auth_headers(token))
+    if resp.status_code != 200:
+        return None
+    return resp.json()['results'][0]['username']
+
+
+def count_assets(root: str, headers: dict, query: str = None) -> int:
+    """
+    Number of assets visible to the token (matching ``query``), fetched with a
+    one-item page.
+
+    Raises:
+        KoboAPIError: If the request fails.
+    """
+    params = {"format": "json", "limit": 1, **({"q": query} if query else {})}
+    count_resp = request("GET", f"{root}/assets/", params=params, headers=headers)
+    if count_resp.status_code != 200:
+        raise KoboAPIError("Failed to fetch assets count.", count_resp.status_code)
+    return count_resp.json().get("count", 0)
+
+
+def fetch_asset_records(root: str, headers: dict, page_size: int = None, on_progress=None,
+                        query: str = None, fields: list = None) -> list:
+    """
+    Fetch every asset visible to the token, requesting the pages concurrently.
+
+    Args:
+        root (str): The API root.
+        headers (dict): Authorization headers.
+        page_size (int): Assets per request (default: ``performance.page_size``).
+        on_progress: Optional callable ``(fetched, total)`` called after each page.
+        query (str): Optional Kobo ``q`` filter, e.g. ``"date_modified__gt:2025-01-01"``.
+        fields (list): Only return these fields of each asset, e.g. ``["uid", "name"]``.
+
+    Returns:
+        list: The raw asset dictionaries, in server order.
+    """
+    page_size = page_size or get_config().performance.page_size
+    # First, get count cheaply (limit=1 keeps payload tiny)
+    assets_count = count_assets(root, headers, query)
+    offsets = range(0, assets_count, page_size)
+    filters = {"q": query} if query else {}
+    if fields:
+        filters["fields"] = ",".join(fields)
+    calls = [("GET", f"{root}/assets/", {"params": {"format": "json", "limit": page_size, "offset": offset, **filters}})
+             for offset in offsets]
+
+    def page_done(done, total):
+        # update progress by items fetched (the last page may be short)
+        if on_progress:
+            on_progress(min(done * page_size, assets_count), assets_count)
+
+    records = []
+    for offset, resp in zip(offsets, engine.gather(calls, headers=headers, on_progress=page_done, delay=0)):
+        if engine.status_of(resp) != 200:
+            raise KoboAPIError(f"Failed at offset {offset}: {engine.status_of(resp)}",
+                               getattr(resp, "status_code", None))
+        records.extend(resp.json().get("results", []))
+    return records
+
+
+def assets_frame(records: list) -> pd.DataFrame:
+    """
+    Flatten raw asset records into the uid/name/owner/status frame the bulk tools use.
+    """
+    if not records:
+        return pd.DataFrame(columns=ASSET_COLUMNS)
+    return pd.DataFrame([
+        {
+            "uid": a.get("uid"),
+            "name": a.get("name"),
+            "owner_username": a.get("owner__username"),
+            "deployment_status": a.get("deployment_status"),
+        }
+        for a in records
+    ])
+
+
+def download_xlsform(root: str, headers: dict, uid: str, output_path: str) -> None:
+    """
+    Download the XLSForm of an asset to ``output_path``.
+
+    Raises:
+        KoboAPIError: If the asset or its XLSForm cannot be fetched.
+    """
+    # Fetch the asset metadata to get the correct XLSForm download URL
+    response = request("GET", f"{root}/assets/{uid}.json", headers=headers)
+    if response.status_code != 200:
+        raise KoboAPIError(f"Failed to fetch asset {uid}: {response.status_code} - {response.reason}",
+                           response.status_code)
+
+    asset = response.json()
+    xlsform_url = next((d.get("url") for d in asset.get("downloads", []) if d.get("format") == "xls"), None)
+    if not xlsform_url:
+        raise KoboAPIError("XLSForm download URL not found in asset metadata.")
+
+    # Download the XLSForm
+    response = request("GET", xlsform_url, headers=headers, stream=True)
+    if response.status_code != 200:
+        raise KoboAPIError(f"Failed to download XLSForm: {response.status_code} - {response.reason}",
+                           response.status_code)
+    with open(output_path, "wb") as excel_file:
+        for chunk in response.iter_content(chunk_size=1024):
+            excel_file.write(chunk)
+
+
+def transfer_assets(root: str, sender_headers: dict, receiver_headers: dict,
+                    receiver_username: str, uids: list, on_progress=None) -> None:
+    """
+    Invite ``receiver_username`` to take ownership of ``uids`` and accept the
+    invite on the receiver's behalf.
+
+    ``on_progress(done, total)`` is called after each of the two steps.
+
+    Raises:
+        KoboAPIError: If the invite or its acceptance fails.
+    """
+    recipient_url = f"{root}/users/{receiver_username}/"
+    payload = {"recipient": recipient_url, "assets": list(uids)}
+    transfer_request = request(
+        "POST",
+        f"{root}/project-ownership/invites/?format=json",
+        headers=sender_headers,
+        json=payload
+    )
+    if transfer_request.status_code != 201:
+        raise KoboAPIError(f"Transfer request failed: {transfer_request.status_code} - {transfer_request.reason}",
+                           transfer_request.status_code)
+
+    if on_progress:
+        on_progress(1, 2)
+
+    invite_url = transfer_request.json().get('url')
+    patch_resp = request("PATCH", invite_url, headers=receiver_headers, json={"status": "accepted"})
+    if patch_resp.status_code != 200:
+        raise KoboAPIError(f"Auto-accept failed: {patch_resp.status_code} - {patch_resp.reason}",
+                           patch_resp.status_code)
+    if on_progress:
+        on_progress(2, 2)
+
+
+def archive_assets(root: str, headers: dict, uids: list, on_progress=None, delay: float = None) -> dict:
+    """
+    Archive each asset by PATCHing its deployment to inactive, several at a time.
+
+    Args:
+        root (str): The API root.
+        headers (dict): Authorization headers of the owner.
+        uids (list): Assets to archive.
+        on_progress: Optional callable ``(done, total)`` called after each asset.
+        delay (float): Minimum pause between request starts, to stay under the
+            server's rate limit (default: derived from ``performance.rate_limit``).
+
+    Returns:
+        dict: ``{uid: status_code}`` for every asset that failed (the error name
+        when no response came back).
+    """
+    calls = [("PATCH", f"{root}/assets/{uid}/deployment/", {"params": {"format": "json"}, "json": {"active": "false"}})
+             for uid in uids]
+    results = engine.gather(calls, headers=headers, on_progress=on_progress, delay=delay)
+    return {uid: engine.status_of(r) for uid, r in zip(uids, results) if engine.status_of(r) != 200}
+
+
+def update_asset_settings(root: str, headers: dict, updates: list, on_progress=None, delay: float = None) -> dict:
+    """
+    PATCH the settings of several assets, several at a time.
+
+    Args:
+        root (str): The API root.
+        headers (dict): Authorization headers of the owner.
+        updates (list): ``(uid, settings)`` pairs, ``settings`` being the
+            dictionary sent under the ``"settings"`` key.
+        on_progress: Optional callable ``(done, total)`` called after each asset.
+        delay (float): Minimum pause between request starts, to stay under the
+            server's rate limit (default: derived from ``performance.rate_limit``).
+
+    Returns:
+        dict: ``{uid: status_code}`` for every asset that failed (the error name
+        when no response came back).
+    """
+    calls = [("PATCH", f"{root}/assets/{uid}/", {"params": {"format": "json"}, "json": {"settings": settings}})
+             for uid, settings in updates]
+    results = engine.gather(calls, headers=headers, on_progress=on_progress, delay=delay)
+    return {uid: engine.status_of(r) for (uid, _), r in zip(updates, results) if engine.status_of(r) != 200}
@@ -0,0 +1,29 @@
+import importlib
+import sys
+import types
+
+
+class _LazyModule(types.ModuleType):
+    # Stand-in that imports the real module on first attribute access, then
+    # copies its namespace so later lookups are plain attribute reads
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Return ``name`` as a module that is only imported when first used.
+
+    Heavy dependencies (pandas, pyarrow, openpyxl, requests) are bound this way
+    so that loading a page, or a module that only needs them in some of its
+    functions, does not pay their import time up front.
+
+    Example:
+        pd = lazy_import("pandas")
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return _LazyModule(name)
@@ -0,0 +1,282 @@
+"""
+Project metadata edited in bulk: the asset settings behind the Metadata Switchers.
+
+    original = metadata_frame(index.records(owner=username))
+    changes = diff(original, edited)
+    kobo_api.update_asset_settings(root, headers, settings_updates(changes))
+"""
+from __future__ import annotations
+
+import os
+
+from src.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Column shown in the switchers -> key of the asset's settings on the server
+SETTINGS = {
+    "PII": "collects_pii",
+    "Function": "sector",
+    "Legal Entity": "operational_purpose",
+}
+
+SECTOR_OPTIONS = [
+    "Programme - Protection",
+    "Programme - CCCM",
+    "Programme - Economic Recovery",
+    "Programme - HDP",
+    "Programme - Shelter & Settlement",
+    "Programme - WASH",
+    "MEAL",
+    "Information Management",
+    "Safety",
+    "Grants Management",
+    "HR",
+    "Supply Chain",
+    "IT",
+    "Finance",
+    "Risk and Compliance",
+    "Advocacy and Communication",
+    "Safeguarding and CoC",
+    "Programme Development and Quality",
+    "Other"
+]
+
+LEGAL_ENTITY_OPTIONS = [
+    "DKHQ - DKHQ",
+    "INET Implementing Network - INET",
+    "Myanmar - MMR",
+    "Serbia - SRB",
+    "Bosnia and Herzegovina - BIH",
+    "Ukraine - UKR",
+    "Poland - POL",
+    "Kosovo - XKX",
+    "Bangladesh - BGD",
+    "Afghanistan - AFG",
+    "Georgia - GEO",
+    "Italy - ITA",
+    "Greece - GRC",
+    "Mali - MLI",
+    "Niger - NER",
+    "Nigeria - NGA",
+    "Venezuela - VEN",
+    "Mexico - MEX",
+    "Cameroon - CMR",
+    "Chad - TCD",
+    "Burkina Faso - BFA",
+    "Central African Republic - CAF",
+    "Colombia - COL",
+    "Syria - SYR",
+    "Tunisia - TUN",
+    "Yemen - YEM",
+    "Algeria - DZA",
+    "Iraq - IRQ",
+    "Jordan - JOR",
+    "Lebanon - LBN",
+    "Libya - LBY",
+    "Somalia - SOM",
+    "South Sudan - SSD",
+    "Sudan - SDN",
+    "Tanzania - TZA",
+    "Uganda - UGA",
+    "Burundi - BDI",
+    "Djibouti - DJI",
+    "Ethiopia - ETH",
+    "Kenya - KEN",
+    "East Africa & Great Lakes - RO01",
+    "Middle East & North Africa - RO02",
+    "West Africa & Americas - RO03",
+    "Asia & Europe - RO05",
+    "Türkiye - TUR",
+    "Occupied Palestine Territory - OPT",
+    "Democratic Republic of the Congo - COD"
+]
+
+# Values each switcher column accepts
+OPTIONS = {
+    "PII": ["Yes", "No"],
+    "Function": SECTOR_OPTIONS,
+    "Legal Entity": LEGAL_ENTITY_OPTIONS,
+}
+# Legal entities are only set on deployed or archived assets
+LEGAL_ENTITY_STATUSES = ["deployed", "archived"]
+
+
+def _value(settings: dict, key: str):
+    # Settings are {"label", "value"} dicts, or plain values on older assets
+    value = settings.get(key)
+    if isinstance(value, dict):
+        value = value.get("value")
+    return value or None
+
+
+def metadata_frame(records: list) -> pd.DataFrame:
+    """
+    One row per asset record with its UID, name, owner, deployment status and
+    one column per entry of ``SETTINGS`` (None when unset).
+    """
+    rows = []
+    for a in records:
+        settings = a.get("settings") or {}
+        row = {
+            "UID": a["uid"],
+            "Name": a["name"],
+            "owner_username": a["owner__username"],
+            "deployment_status": a["deployment_status"],
+        }
+        for column, key in SETTINGS.items():
+            row[column] = _value(settings, key)
+        # Assets created before collects_pii existed keep the old key
+        if row["PII"] is None and settings.get("collects_pii") is None:
+            row["PII"] = _value(settings, "collect_pii")
+        rows.append(row)
+    return pd.DataFrame(rows, columns=["UID", "Name", "owner_username", "deployment_status", *SETTINGS])
+
+
+def diff(original: pd.DataFrame, edited, columns: list = None, key: str = "UID") -> pd.DataFrame:
+    """
+    Changed cells between two versions of a frame, matched on ``key``.
+
+    ``edited`` is a frame or a list of frames each holding ``key`` and some of
+    the columns (e.g. one per switcher tab). Rows are aligned by ``key`` rather
+    than by index, cells missing from ``edited`` count as unchanged, and two
+    nulls compare equal.
+
+    Returns:
+        DataFrame: One row per changed cell with ``key``, ``field``, ``old`` and ``new``.
+    """
+    columns = list(columns or SETTINGS)
+    old = original.set_index(key)[columns]
+    new = old.copy()
+    for frame in edited if isinstance(edited, list) else [edited]:
+        frame = frame.set_index(key)
+        present = [c for c in columns if c in frame.columns]
+        common = old.index.intersection(frame.index)
+        new.loc[common, present] = frame.loc[common, present]
+
+    changed = old.ne(new) & ~(old.isna() & new.isna())
+    rows, cols = np.nonzero(changed.to_numpy())
+
+    def cells(frame):
+        # Cleared cells are reported (and sent) as None, never NaN
+        values = frame.astype(object).where(frame.notna(), None).to_numpy()[rows, cols]
+        return pd.Series(values, dtype=object)
+
+    return pd.DataFrame({
+        key: old.index[rows],
+        "field": np.asarray(columns, dtype=object)[cols],
+        "old": cells(old),
+        "new": cells(new),
+    })
+
+
+def settings_updates(changes: pd.DataFrame, key: str = "UID") -> list:
+    """
+    Merge the changes of ``diff`` into one settings payload per asset, ready
+    for ``kobo_api.update_asset_settings``.
+
+    Returns:
+        list: ``(uid, settings)`` pairs, in the order the assets first appear.
+    """
+    updates = {}
+    for uid, field, value in zip(changes[key], changes["field"], changes["new"]):
+        updates.setdefault(uid, {})[SETTINGS[field]] = {"label": value, "value": value}
+    return list(updates.items())
+
+
+def _column_aliases() -> dict:
+    # Accepted spellings of the import columns: display name, settings key or CLI field
+    aliases = {"uid": "UID"}
+    for column, key in SETTINGS.items():
+        for alias in (column, key, column.replace(" ", "-"), column.replace(" ", "_")):
+            aliases[alias.lower()] = column
+    return aliases
+
+
+def settings_column(name: str):
+    """
+    The ``SETTINGS`` column a display name, settings key or CLI field
+    (``"legal-entity"``) refers to, or None.
+    """
+    return _column_aliases().get(str(name).strip().lower())
+
+
+def read_import(file, filename: str) -> pd.DataFrame:
+    """
+    Read an uploaded CSV or Excel file of ``UID`` plus any of the ``SETTINGS``
+    columns, as strings with their headers normalized; other columns are dropped.
+
+    Raises:
+        ValueError: If the file is not CSV/XLSX or has no UID column.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".csv":
+        df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    elif ext in (".xlsx", ".xls"):
+        df = pd.read_excel(file, dtype=str, keep_default_na=False)
+    else:
+        raise ValueError(f"Unsupported file type '{ext}', upload a .csv or .xlsx file.")
+
+    aliases = _column_aliases()
+    df = df.rename(columns=lambda c: aliases.get(str(c).strip().lower(), c))
+    if "UID" not in df.columns:
+        raise ValueError("The file has no UID column.")
+    columns = ["UID"] + [c for c in SETTINGS if c in df.columns]
+    # Blank cells leave the current value untouched
+    return df.loc[:, ~df.columns.duplicated()][columns].apply(lambda s: s.str.strip()).replace("", None)
+
+
+def validate_import(imported: pd.DataFrame, current: pd.DataFrame) -> tuple:
+    """
+    Check an imported frame against the account's assets and the allowed values,
+    in one vectorized pass per column.
+
+    Rows with an unknown or repeated UID are dropped; invalid cells are reported
+    and left out, and blank cells keep the asset's current value. Assets with
+    an empty Name count as unknown: like the switcher grids (``AssetIndex``
+    lists named assets only), an import never touches them.
+
+    Args:
+        imported (DataFrame): Output of ``read_import``.
+        current (DataFrame): ``metadata_frame`` of the account's assets.
+
+    Returns:
+        tuple: ``(valid, problems)``; ``valid`` has one row per accepted UID,
+        ready for ``diff``, and ``problems`` has ``row``, ``UID``, ``field``,
+        ``value`` and ``problem`` for everything rejected.
+    """
+    problems = []
+    # Row numbers as seen in a spreadsheet: header on line 1
+    rows = pd.Series(imported.index + 2, index=imported.index)
+
+    def report(mask, field, values, problem):
+        if mask.any():
+            problems.append(pd.DataFrame({"row": rows[mask], "UID": imported.loc[mask, "UID"],
+                                          "field": field, "value": values[mask], "problem": problem}))
+
+    uids = imported["UID"]
+    named = current.loc[current["Name"].fillna("") != "", "UID"]
+    unknown = ~uids.isin(named)
+    duplicated = uids.duplicated(keep=False) & ~unknown
+    report(unknown, "UID", uids, "not a named asset of this account")
+    report(duplicated, "UID", uids, "listed more than once")
+    keep = ~(unknown | duplicated)
+
+    now = current.set_index("UID")
+    valid = imported[keep].copy()
+    for column in imported.columns.drop("UID"):
+        values = imported[column]
+        given = values.notna() & keep
+        invalid = given & ~values.isin(OPTIONS[column])
+        report(invalid, column, values, "not an allowed value")
+        if column == "Legal Entity":
+            wrong_status = given & ~invalid & ~uids.map(now["deployment_status"]).isin(LEGAL_ENTITY_STATUSES)
+            report(wrong_status, column, values, "only deployed or archived assets have a legal entity")
+            invalid |= wrong_status
+        ok = given & ~invalid
+        valid[column] = values[keep].where(ok[keep], uids[keep].map(now[column]))
+
+    problems = pd.concat(problems).sort_values("row", kind="stable").reset_index(drop=True) if problems else \
+        pd.DataFrame(columns=["row", "UID", "field", "value", "problem"])
+    return valid, problems
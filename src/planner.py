@@ -0,0 +1,145 @@
+"""
+Dry runs of the bulk operations: the exact requests they would send and how
+long they should take, without sending any.
+
+    plan = planner.plan_archive(uids)
+    plan.total_requests, plan.seconds
+    plan.frame()
+
+Durations come from the latencies measured on this server in the current
+process (see ``instrumentation.endpoint_latency``), falling back to
+``DEFAULT_LATENCY_MS`` for endpoints not called yet, and from the configured
+``max_concurrency`` and ``rate_limit``.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+
+from src.config import get_config
+from src.instrumentation import endpoint_latency
+from src.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Assumed latency of an endpoint never measured in this process
+DEFAULT_LATENCY_MS = 500.0
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    Requests of one kind within a plan.
+
+    Attributes:
+        method, endpoint (str): As reported by ``instrumentation.endpoint_of``.
+        count (int): Requests sent.
+        concurrent (bool): Sent through ``engine.gather`` rather than one after the other.
+    """
+    method: str
+    endpoint: str
+    count: int
+    concurrent: bool = True
+
+    @property
+    def latency_ms(self) -> float:
+        measured = endpoint_latency(self.method, self.endpoint)
+        return DEFAULT_LATENCY_MS if measured is None else measured
+
+    @property
+    def measured(self) -> bool:
+        return endpoint_latency(self.method, self.endpoint) is not None
+
+    @property
+    def waves(self) -> int:
+        # Rounds of requests in flight at once
+        if not self.concurrent:
+            return self.count
+        return math.ceil(self.count / get_config().performance.max_concurrency)
+
+    @property
+    def seconds(self) -> float:
+        if not self.count:
+            return 0.0
+        settings = get_config().performance
+        latency = self.latency_ms / 1000
+        if not self.concurrent:
+            return self.count * latency
+        # Bounded by whichever is slower: the requests in flight or the rate limit
+        return max(self.waves * latency, (self.count - 1) * settings.request_delay + latency)
+
+
+@dataclass(frozen=True)
+class Plan:
+    """
+    The requests a bulk operation would send, in order.
+    """
+    operation: str
+    assets: int
+    steps: list = field(default_factory=list)
+
+    @property
+    def total_requests(self) -> int:
+        return sum(step.count for step in self.steps)
+
+    @property
+    def seconds(self) -> float:
+        return sum(step.seconds for step in self.steps)
+
+    def frame(self) -> pd.DataFrame:
+        """
+        One row per step: method, endpoint, requests, waves, latency (ms),
+        whether that latency was measured, and estimated seconds.
+        """
+        return pd.DataFrame([{
+            "method": step.method,
+            "endpoint": step.endpoint,
+            "requests": step.count,
+            "waves": step.waves,
+            "latency_ms": round(step.latency_ms, 1),
+            "measured": step.measured,
+            "seconds": round(step.seconds, 1),
+        } for step in self.steps])
+
+    def summary(self) -> str:
+        return (f"{self.operation}: {self.assets} assets, {self.total_requests} requests, "
+                f"about {format_duration(self.seconds)}")
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    minutes, seconds = divmod(round(seconds), 60)
+    if minutes < 60:
+        return f"{minutes} min {seconds:02d} s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} h {minutes:02d} min"
+
+
+def plan_transfer(uids: list) -> Plan:
+    """
+    One ownership invite for all assets, then its acceptance by the receiver
+    (see ``kobo_api.transfer_assets``).
+    """
+    steps = [Step("POST", "/project-ownership/invites/", 1, concurrent=False),
+             Step("PATCH", "/project-ownership/invites/{id}/", 1, concurrent=False)] if uids else []
+    return Plan("Transfer", len(uids), steps)
+
+
+def plan_archive(uids: list) -> Plan:
+    """
+    One deployment PATCH per asset (see ``kobo_api.archive_assets``).
+    """
+    return Plan("Archive", len(uids), [Step("PATCH", "/assets/{id}/deployment/", len(uids))] if uids else [])
+
+
+def plan_metadata(updates: list) -> Plan:
+    """
+    One settings PATCH per asset, whatever the number of fields changed
+    (see ``kobo_api.update_asset_settings``).
+
+    Args:
+        updates (list): ``(uid, settings)`` pairs, e.g. from ``metadata.settings_updates``.
+    """
+    return Plan("Metadata update", len(updates),
+                [Step("PATCH", "/assets/{id}/", len(updates))] if updates else [])
@@ -0,0 +1,93 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import uuid
+
+from src.config import get_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Set to 1/true to profile every page run regardless of config/config.yaml
+PROFILE_ENV = "KOBOTOOL_PROFILE"
+
+
+def enabled() -> bool:
+    """
+    Profiling is on when ``KOBOTOOL_PROFILE`` is truthy or ``profiling.enabled``
+    is set in ``config/config.yaml``.
+    """
+    env = os.environ.get(PROFILE_ENV)
+    if env is not None:
+        return env.strip().lower() in ("1", "true", "yes", "on")
+    return get_config().profiling.enabled
+
+
+def _run_dir(page: str) -> str:
+    base = get_config().profiling.dir
+    run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{page}-{uuid.uuid4().hex[:6]}"
+    path = os.path.join(base if os.path.isabs(base) else os.path.join(ROOT, base), run_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def start(page: str):
+    """
+    Start profiling the current script run.
+
+    pyinstrument is used when installed, cProfile otherwise. Pass the returned
+    run to ``stop`` on the same thread: Streamlit runs a session's reruns on new
+    threads, so a run must not outlive its script run.
+
+    Returns:
+        tuple: The ``(page, profiler)`` run to pass to ``stop``.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = Profiler(interval=0.001)
+        profiler.start()
+    return page, profiler
+
+
+def stop(run):
+    """
+    Stop the profiler of a run started by ``start`` and write its report.
+
+    Returns:
+        str: Path of the saved report (``profile.html`` for pyinstrument,
+        ``profile.prof`` for cProfile), or None if ``run`` is None or was
+        started on another thread.
+    """
+    if run is None:
+        return None
+    page, profiler = run
+
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        out_dir = _run_dir(page)
+        path = os.path.join(out_dir, "profile.prof")
+        profiler.dump_stats(path)
+        # Readable summary next to the binary stats (open the .prof with snakeviz)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(50)
+        with open(os.path.join(out_dir, "profile.txt"), "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        return path
+
+    try:
+        profiler.stop()
+    except RuntimeError:
+        # pyinstrument refuses to stop on another thread than the one it
+        # started on; that thread's samples are lost
+        return None
+    out_dir = _run_dir(page)
+    path = os.path.join(out_dir, "profile.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(profiler.output_html())
+    with open(os.path.join(out_dir, "profile.txt"), "w", encoding="utf-8") as f:
+        f.write(profiler.output_text(unicode=True))
+    return path
@@ -0,0 +1,342 @@
+import contextlib
+import math
+import os
+import sys
+
+import streamlit as st
+
+from src import export, http_cache, instrumentation, jobs, kobo_api, planner, profiling
+from src.asset_index import AssetIndex
+from src.config import get_config
+from src.identity import Identity
+from src.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+
+def page_run():
+    """
+    Context manager around the body of every page: resets the per-run timing
+    spans and, when profiling is enabled, profiles the body.
+
+    The profiler is stopped and its report saved on the way out, also when the
+    run ends with ``st.rerun()``, ``st.stop()`` or an exception: pyinstrument
+    can only be stopped on the thread that started it, and Streamlit runs each
+    rerun on a new thread.
+    """
+    page = os.path.splitext(os.path.basename(sys._getframe(1).f_code.co_filename))[0]
+    return _page_run(page)
+
+
+@contextlib.contextmanager
+def _page_run(page: str):
+    instrumentation.start_run()
+    # The session state can't be written once st.stop() was called: keep the
+    # report's path in a dict fetched beforehand
+    last = st.session_state.setdefault("profile_last", {})
+    run = profiling.start(page) if profiling.enabled() else None
+    try:
+        yield
+    finally:
+        path = profiling.stop(run)
+        if path:
+            last["path"] = path
+
+
+def _sync_identity(role: str, ident) -> None:
+    # The pages read the identity through these per-role keys
+    st.session_state[f"{role}_token"] = ident.token if ident else None
+    st.session_state[f"{role}_username"] = ident.username if ident else None
+    st.session_state[f"header_{role}"] = ident.headers if ident else None
+
+
+def remember_identity(role: str, ident: Identity) -> None:
+    """
+    Keep ``ident`` as the session's ``role`` user (``"owner"``, ``"sender"``...),
+    shared by every page.
+    """
+    st.session_state[f"{role}_identity"] = ident
+    _sync_identity(role, ident)
+
+
+def use_identity(role: str, root: str):
+    """
+    Restore the session's ``role`` user on this page, so a token validated on
+    one tool is reused by the others without a new request.
+
+    Sets ``<role>_token``, ``<role>_username`` and ``header_<role>`` in the
+    session state; they are cleared when the user switched to another server.
+
+    Returns:
+        Identity: The user, or None if nobody is signed in as ``role`` on ``root``.
+    """
+    ident = st.session_state.get(f"{role}_identity")
+    if ident is not None and ident.root != root:
+        ident = None
+    _sync_identity(role, ident)
+    return ident
+
+
+def spool_dir() -> str:
+    """
+    The session's directory for downloads too large to keep in memory
+    (``spool_dir`` of the ``export`` writers); deleted when the session ends.
+    """
+    spool = st.session_state.get("spool_dir")
+    if spool is None or not os.path.isdir(spool.path):
+        spool = st.session_state["spool_dir"] = export.SpoolDir()
+    return spool.path
+
+
+def asset_index(ident: Identity, refresh: bool = False) -> AssetIndex:
+    """
+    Open the local asset index of a signed-in user, syncing it with the server
+    the first time in a session, when it was marked stale, or on ``refresh``.
+
+    Syncs are incremental (see ``AssetIndex.sync``); a progress bar is shown
+    while one runs, and the page stops with an error if it fails. A refresh
+    also refreshes the submission counts and revalidates cached responses with
+    the server (see ``src.http_cache``).
+    """
+    index = AssetIndex.open(ident.root, ident.username)
+    synced_key = f"asset_index_synced:{index.path}"
+    if refresh or index.stale or not st.session_state.get(synced_key):
+        prog = st.progress(0, text="Syncing assets…")
+
+        def show_progress(fetched, total):
+            prog.progress(min(fetched / max(total, 1), 1.0), text=f"Syncing assets {fetched}/{total}…")
+
+        try:
+            if refresh:
+                with http_cache.revalidate():
+                    index.sync(ident.root, ident.headers, counts=True, on_progress=show_progress)
+            else:
+                index.sync(ident.root, ident.headers, on_progress=show_progress)
+        except kobo_api.KoboAPIError as e:
+            prog.empty()
+            st.error(f"❌ {e}")
+            st.stop()
+        prog.empty()
+        st.session_state[synced_key] = True
+    return index
+
+
+def _pager(key: str, total: int, page_size: int) -> int:
+    # Page selector of a grid; returns the offset of the first row to show
+    pages = max(math.ceil(total / page_size), 1)
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    col1, col2 = st.columns([1, 3])
+    page = col1.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    start = (page - 1) * page_size
+    col2.caption(f"Showing {min(start + 1, total)}–{min(start + page_size, total)} of {total}")
+    return start
+
+
+def _grid_key(key: str, *window) -> str:
+    # A grid's editor is recreated (and its cell edits dropped) whenever the generation changes
+    return "_".join(map(str, (key, st.session_state.get(f"{key}_gen", 0), *window)))
+
+
+def _refresh_grid(key: str) -> None:
+    # Edits were folded into the session state: redraw the grid from it
+    st.session_state[f"{key}_gen"] = st.session_state.get(f"{key}_gen", 0) + 1
+    st.rerun()
+
+
+def asset_picker(index: AssetIndex, key: str, owner: str = None, status: str = None) -> list:
+    """
+    Paged, searchable asset grid with a checkbox per row.
+
+    Only one page of ``performance.grid_page_size`` rows is sent to the browser.
+    The selection is kept in the session state as a set of UIDs, so selecting
+    every asset matching the search costs nothing on later reruns.
+
+    Returns:
+        list: The selected UIDs among the assets of ``owner`` with ``status``.
+    """
+    page_size = get_config().performance.grid_page_size
+    selected = st.session_state.setdefault(f"{key}_selected", set())
+
+    search = st.text_input("🔎 Search by name", key=f"{key}_search")
+    total = index.count(owner, status, name=search)
+    start = _pager(key, total, page_size)
+    window = index.frame(owner, status, name=search, limit=page_size, offset=start)
+    window = window[["uid", "name", "deployment_status", "date_modified"]]
+    window.insert(0, "selected", window["uid"].isin(selected))
+
+    edited = st.data_editor(
+        window,
+        key=_grid_key(key, start, search),
+        column_config={"selected": st.column_config.CheckboxColumn("✔")},
+        disabled=list(window.columns[1:]),
+        use_container_width=True,
+        num_rows="fixed",
+        hide_index=True
+    )
+    toggled = edited["selected"] != window["selected"]
+    if toggled.any():
+        selected.update(edited.loc[toggled & edited["selected"], "uid"])
+        selected.difference_update(edited.loc[toggled & ~edited["selected"], "uid"])
+        _refresh_grid(key)
+
+    col1, col2 = st.columns(2)
+    if col1.button(f"☑️ Select all {total} matching", key=f"{key}_all"):
+        selected.update(index.uids(owner, status, name=search))
+        _refresh_grid(key)
+    if col2.button("✖️ Clear selection", key=f"{key}_clear"):
+        selected.clear()
+        _refresh_grid(key)
+
+    chosen = [uid for uid in index.uids(owner, status) if uid in selected]
+    st.caption(f"{len(chosen)} selected")
+    return chosen
+
+
+def _apply_edits(df, edits: dict, uid_column: str):
+    # edits: {column: {uid: value}}
+    df = df.copy()
+    for column, values in edits.items():
+        edited = df[uid_column].isin(list(values))
+        df[column] = df[column].where(~edited, df[uid_column].map(values))
+    return df
+
+
+def paged_editor(df, key: str, column_config: dict, disabled: list,
+                 uid_column: str = "UID", name_column: str = "Name"):
+    """
+    ``st.data_editor`` over one page of ``df`` at a time, searchable by name.
+
+    Cell edits are kept in the session state by UID, so they survive paging
+    and searching while only ``performance.grid_page_size`` rows reach the browser.
+
+    Returns:
+        DataFrame: ``df`` with every edit made so far applied.
+    """
+    page_size = get_config().performance.grid_page_size
+    edits = st.session_state.setdefault(f"{key}_edits", {})
+
+    search = st.text_input("🔎 Search by name", key=f"{key}_search")
+    view = df[df[name_column].str.contains(search, case=False, regex=False)] if search else df
+    start = _pager(key, len(view), page_size)
+    window = _apply_edits(view.iloc[start:start + page_size], edits, uid_column)
+
+    edited = st.data_editor(
+        window,
+        key=_grid_key(key, start, search),
+        column_config=column_config,
+        disabled=disabled,
+        use_container_width=True,
+        num_rows="fixed",
+        hide_index=True
+    )
+    changed = False
+    for column in edited.columns.difference(disabled):
+        same = edited[column].eq(window[column]) | (edited[column].isna() & window[column].isna())
+        if not same.all():
+            edits.setdefault(column, {}).update(zip(edited.loc[~same, uid_column], edited.loc[~same, column]))
+            changed = True
+    if changed:
+        _refresh_grid(key)
+    return _apply_edits(df, edits, uid_column)
+
+
+def discard_edits(key: str) -> None:
+    """
+    Forget the pending edits of a ``paged_editor``, e.g. once they were applied.
+    """
+    st.session_state.pop(f"{key}_edits", None)
+    st.session_state[f"{key}_gen"] = st.session_state.get(f"{key}_gen", 0) + 1
+
+
+def dry_run(plan: planner.Plan) -> None:
+    """
+    Show what a bulk operation would send, and for how long, before it is submitted.
+    """
+    if not plan.steps:
+        return
+    with st.expander(f"🧮 Dry run: {plan.total_requests} requests, about {planner.format_duration(plan.seconds)}"):
+        settings = get_config().performance
+        st.caption(f"{plan.assets} assets, up to {settings.max_concurrency} requests in flight, "
+                   f"{settings.rate_limit:g} requests/s at most. Latencies not yet measured on this "
+                   f"server are assumed to be {planner.DEFAULT_LATENCY_MS:.0f} ms.")
+        st.dataframe(plan.frame(), hide_index=True, use_container_width=True)
+
+
+def _job_status(job, render_result) -> None:
+    if not job.finished:
+        text = f"{job.label}: {job.done}/{job.total or '?'} processed..."
+        st.progress(job.fraction, text=text)
+        if job.cancellable and st.button("⏹️ Cancel", key=f"cancel_{job.id}"):
+            job.cancel()
+    elif job.status == jobs.DONE:
+        render_result(job)
+    elif job.status == jobs.CANCELLED:
+        st.warning(f"⏹️ {job.label} cancelled after {job.done} of {job.total or '?'}.")
+    else:
+        st.error(f"❌ {job.label} failed: {job.error}")
+
+
+def job_panel(job_id: str, render_result, poll_every: float = 1.0) -> None:
+    """
+    Follow a background job (see ``src.jobs``) in place: a progress bar with a
+    cancel button while it runs, then ``render_result(job)`` once done.
+
+    Only this panel reruns while polling; the whole page reruns once when the
+    job finishes, so the page sees its final state.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return
+    if job.finished:
+        _job_status(job, render_result)
+        return
+
+    @st.fragment(run_every=poll_every)
+    def poll():
+        current = jobs.get(job_id)
+        if current is None or current.finished:
+            st.rerun()
+        _job_status(current, render_result)
+
+    poll()
+
+
+def timings_panel() -> None:
+    """
+    Show the spans of the current run in the sidebar when ``logging.timings_panel``
+    is enabled in ``config/config.yaml``.
+    """
+    if not get_config().logging.timings_panel:
+        return
+    spans = instrumentation.current_spans()
+    with st.sidebar.expander("⏱️ Timings (this run)"):
+        if not spans:
+            st.caption("Nothing was timed in this run.")
+            return
+        df = pd.DataFrame(spans)
+        summary = df.groupby("stage", sort=False)["ms"].agg(["count", "sum", "max"]).round(1)
+        st.dataframe(summary, use_container_width=True)
+        st.dataframe(df, hide_index=True, use_container_width=True)
+
+
+def profile_panel() -> None:
+    """
+    Offer the report of the last profiled run for download in the sidebar;
+    call once at the end of every page, after its ``page_run`` block.
+    """
+    if not profiling.enabled():
+        return
+    path = st.session_state.get("profile_last", {}).get("path")
+    if not path or not os.path.exists(path):
+        return
+    with st.sidebar.expander("🔬 Profile (last run)"):
+        st.caption(os.path.relpath(path, profiling.ROOT))
+        with open(path, "rb") as f:
+            st.download_button(
+                "⬇️ Download profile",
+                data=f.read(),
+                file_name=f"{os.path.basename(os.path.dirname(path))}{os.path.splitext(path)[1]}",
+                mime="text/html" if path.endswith(".html") else "application/octet-stream",
+            )
@@ -1,8 +1,33 @@
-import pandas as pd
+from __future__ import annotations
 
-def name2label_questions(survey: pd.DataFrame, 
-                         choices: pd.DataFrame, 
-                         col: str, 
+import re
+
+from src.instrumentation import span
+from src.lazy import lazy_import
+from src.xlsform import XLSForm, choice_key
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Question types whose label is never shown in place of the XML name
+NAME_ONLY_TYPES = {"note",
+                   "start",
+                   "end",
+                   "deviceid",
+                   "today",
+                   "audit",
+                   "audit_url",
+                   "calculate"}
+
+# Cell values Kobo uses to mark a ticked select_multiple option
+SELECTED_VALUES = {"1", "1.0", "True", "true"}
+
+# Column of a Kobo export holding the form version uid of each submission
+VERSION_COLUMN = "__version__"
+
+
+def name2label_questions(form: XLSForm,
+                         col: str,
                          label: str,
                          sep: str) -> str:
     # For each column check if it is a select_multiple
@@ -14,108 +39,646 @@ def name2label_questions(survey: pd.DataFrame,
         q_name = col
         c_name = None
 
-    # Find question in survey sheet
-    if q_name in survey["name"].values:
-        q_row = survey[survey["name"] == q_name].iloc[0]
-        q_label = q_row.get(label, q_name)
-
-        if q_label is None or q_row.get('type') in ["note",
-                                                    "start",
-                                                    "end",
-                                                    "deviceid",
-                                                    "today",
-                                                    "audit",
-                                                    "audit_url",
-                                                    "calculate"]:
-            q_label = q_name
-        
-        if c_name:
-            list_name = q_row.get("list_name")
-            if list_name is None or str(list_name).lower() == 'na':
-                list_name = None
-
-            if list_name:
-                matches = choices[
-                    (choices['list_name'] == list_name) & 
-                    (choices['name'] == c_name)
-                ]
-
-                if not matches.empty:
-                    c_label = matches.iloc[0].get(label)
-                else:
-                    c_label = None
-            else:
-                c_label = None
-        else:
-            c_label = None
+    # Find question in the form
+    question = form.question(q_name)
+    if question is None:
+        # Kobo metadata such as _index / _parent_index / _submission__uuid joins the
+        # repeat sheets together, so it must survive the switch untouched
+        return col if col.startswith("_") else q_name
 
-        final_label = f"{q_label}{sep}{c_label}" if c_label else q_label
+    q_label = question.label(label)
+    if q_label is None or question.type in NAME_ONLY_TYPES:
+        q_label = q_name
 
-    else:
-        final_label = q_name
+    c_label = None
+    if c_name:
+        list_name = question.list_name
+        if list_name is not None and list_name.lower() != 'na':
+            c_label = form.choice_label(list_name, c_name, label)
+
+    return f"{q_label}{sep}{c_label}" if c_label else q_label
+
+
+def _map_categorical(values: pd.Series, mapping: dict, categories: tuple) -> pd.Categorical:
+    # Look up each distinct value once, then broadcast the category codes back
+    codes, uniques = pd.factorize(values)
+    return _categorical_from_codes(codes, [choice_key(v) for v in uniques], mapping, categories)
+
+
+def _categorical_from_codes(codes: np.ndarray, keys: list, mapping: dict, categories: tuple) -> pd.Categorical:
+    # `codes` index into `keys`, the choice keys of the distinct values (-1 for blanks)
+    position = {text: i for i, text in enumerate(categories)}
+    lookup = np.array([position.get(mapping.get(key), -1) for key in keys] + [-1], dtype=np.int32)
+    return pd.Categorical.from_codes(lookup[codes], categories=list(categories), ordered=True)
+
+
+def _selected_mask(values: pd.Series) -> np.ndarray:
+    codes, uniques = pd.factorize(values)
+    hits = np.array([str(v).strip() in SELECTED_VALUES for v in uniques] + [False], dtype=bool)
+    return hits[codes]
+
+
+def _ticked_patterns(masks: list, n_rows: int):
+    """
+    Return (codes, patterns): a per-row code into ``patterns``, the distinct
+    sets of ticked options (tuples of positions in ``masks``).
+    """
+    if len(masks) <= 63:
+        # Pack the ticked options of each row into one integer, so options are
+        # only looked at once per distinct combination
+        bits = np.zeros(n_rows, dtype=np.uint64)
+        for i, mask in enumerate(masks):
+            bits |= mask.astype(np.uint64) << np.uint64(i)
+        codes, uniques = pd.factorize(bits)
+        patterns = [tuple(i for i in range(len(masks)) if int(u) >> i & 1) for u in uniques]
+        return codes, patterns
+
+    # Too many options for one integer: compare the packed rows as raw bytes
+    packed = np.ascontiguousarray(np.packbits(np.column_stack(masks), axis=1))
+    rows = packed.view(np.dtype((np.void, packed.shape[1]))).ravel()
+    uniques, codes = np.unique(rows, return_inverse=True)
+    patterns = [tuple(np.flatnonzero(np.unpackbits(np.frombuffer(u.tobytes(), dtype=np.uint8))[:len(masks)]))
+                for u in uniques]
+    return codes.ravel(), patterns
+
+
+def _ticked_options(data: pd.DataFrame, col: str, sep: str):
+    """
+    Return (answers, codes, patterns) for a select_multiple group: the XML
+    choice of each ``col{sep}choice`` column and the rows' ticked patterns
+    (see ``_ticked_patterns``), or None if the group has no columns.
+
+    Nothing here depends on the label language.
+    """
+    # get all the columns that belong to this select_multiple group
+    prefix = f"{col}{sep}"
+    col_internal = [c for c in data.columns if isinstance(c, str) and c.startswith(prefix)]
+    if not col_internal:
+        return None
+
+    # extract the xml value from the column (e.g., 'water_source/piped' -> 'piped')
+    answers = [col_name[len(prefix):] for col_name in col_internal]
+    codes, patterns = _ticked_patterns([_selected_mask(data[col_name]) for col_name in col_internal], len(data))
+    return answers, codes, patterns
+
+
+def _joined_labels(form: XLSForm, col: str, label: str, answers: list, codes: np.ndarray,
+                   patterns: list) -> pd.Categorical:
+    # get the list_name from this group
+    question = form.question(col)
+    mapping = form.choice_labels(question.list_name, label) if question is not None else None
+    order = {}
+    if question is not None:
+        order = {text: i for i, text in enumerate(form.choice_categories(question.list_name, label))}
+
+    texts = [mapping.get(answer) if mapping is not None else answer for answer in answers]
+    combos = [";".join(texts[i] for i in pattern if texts[i]) for pattern in patterns]
+
+    # categories are the observed combinations, sorted by the declared choice order
+    def rank(combo):
+        return tuple(order.get(text, len(order)) for text in combo.split(";")) if combo else ()
 
-    return final_label
+    categories = sorted(set(combos), key=rank)
+    position = {combo: i for i, combo in enumerate(categories)}
+    lookup = np.array([position[combo] for combo in combos] + [-1], dtype=np.int32)
+    return pd.Categorical.from_codes(lookup[codes], categories=categories, ordered=True)
 
 
-def name2label_choices_one(survey: pd.DataFrame,
-                           choices: pd.DataFrame,
+def name2label_choices_one(form: XLSForm,
                            label: str,
                            data: pd.DataFrame,
                            col: str) -> pd.Series:
     # get the list_name of the specific question
-    q_list_name_series  = survey.loc[survey['name'] == col,'list_name']
-    if q_list_name_series.empty:
-        return pd.Series([None] * len(data), name = col)
-    
-    q_list_name = q_list_name_series.iloc[0] 
-
-    # get the relevant choices 
-    relevant_choices = choices.loc[choices['list_name'] == q_list_name,["name", label]]
-    data_col = data[[col]].copy()
-    data_col = data_col.rename(columns={col: 'col'})
-    merged = data_col.merge(relevant_choices, how='left', left_on='col', right_on='name')
-
-    return merged[label]
-
-def name2label_choices_multiple(survey: pd.DataFrame,
-                                choices: pd.DataFrame,
+    question = form.question(col)
+    if question is None:
+        return pd.Series([None] * len(data), index=data.index, name=col)
+
+    # get the relevant choices, as categories in the order they are declared
+    mapping = form.choice_labels(question.list_name, label)
+    categories = form.choice_categories(question.list_name, label)
+
+    return pd.Series(_map_categorical(data[col], mapping, categories), index=data.index, name=col)
+
+
+def name2label_choices_multiple(form: XLSForm,
                                 data: pd.DataFrame,
                                 col: str,
-                                label:str,
+                                label: str,
                                 sep: str) -> pd.Series:
-    # get all the columns that belong to this select_multiple group
-    col_internal = [c for c in data.columns if f"{col}{sep}" in c]
+    ticked = _ticked_options(data, col, sep)
+    if ticked is None:
+        return pd.Series([None] * len(data), index=data.index, name=col)
+    return pd.Series(_joined_labels(form, col, label, *ticked), index=data.index, name=col)
 
-    if not col_internal:
-        return pd.Series([None] * len(data), name = col)
-    
-    # copy a subset of the relevant columns 
-    d_join = data[col_internal].copy()
-
-    for col_name in col_internal:
-        # extract the xml value from the column (e.g., 'water_source/piped' -> 'piped')
-        xml_answer = col_name.split(sep, 1)[1]
-
-        # replace "1" with xml_answer, else NaN
-        d_join[col_name] = d_join[col_name].apply(lambda x: xml_answer if str(x).strip() in ["1", "1.0", "True", "true"] else None)
-        # get the list_name from this group
-        base_question = col_name.split(sep, 1)[0]
-        match = survey.loc[survey['name'] == base_question, 'list_name']
-        if match.empty:
+
+def sheet_scopes(form: XLSForm,
+                 sheet_names: list,
+                 data_list: list) -> list:
+    """
+    Map every sheet of a Kobo export to the part of the form it was written from.
+
+    Sheets named after a repeat group get that repeat's questions only; the main
+    sheet (no ``_parent_index`` column) gets the questions outside every repeat.
+    Anything we cannot place falls back to the whole form.
+    """
+    scopes = []
+    for sheet_name, data in zip(sheet_names, data_list):
+        repeat = form.repeat_for_sheet(sheet_name)
+        if repeat is not None:
+            scopes.append(form.scoped(repeat))
+        elif "_parent_index" not in data.columns:
+            scopes.append(form.scoped(None))
+        else:
+            scopes.append(form)
+    return scopes
+
+
+def relabel_values(form: XLSForm,
+                   data: pd.DataFrame,
+                   label: str,
+                   sep: str,
+                   on_stage=None) -> pd.DataFrame:
+    """
+    Switch the select_one values and select_multiple groups of one sheet to
+    labels, leaving the column headers as XML names.
+    """
+    data = data.copy()
+
+    # Select One
+    with span("relabel.select_one", rows=len(data)):
+        for question in form.questions_of_type("select_one"):
+            if question.name in data.columns:
+                data[question.name] = name2label_choices_one(form, label, data, question.name)
+    if on_stage:
+        on_stage("select_one")
+
+    # Select Multiple
+    with span("relabel.select_multiple", rows=len(data)):
+        for question in form.questions_of_type("select_multiple"):
+            if question.name in data.columns:
+                data[question.name] = name2label_choices_multiple(form, data, question.name, label, sep)
+    if on_stage:
+        on_stage("select_multiple")
+
+    return data
+
+
+def relabel_headers(form: XLSForm,
+                    data: pd.DataFrame,
+                    label: str,
+                    sep: str,
+                    on_stage=None) -> pd.DataFrame:
+    with span("relabel.headers", columns=len(data.columns)):
+        data.columns = [name2label_questions(form, col, label, sep) for col in data.columns]
+    if on_stage:
+        on_stage("headers")
+    return data
+
+
+def relabel_sheet(form: XLSForm,
+                  data: pd.DataFrame,
+                  label: str,
+                  sep: str,
+                  on_stage=None) -> pd.DataFrame:
+    """
+    Switch one sheet from XML names to labels: select_one values, select_multiple
+    groups, then the column headers.
+
+    ``on_stage`` is called with the stage name after each stage, for progress bars.
+    """
+    # Remove NA columns first
+    data = data.loc[:, ~data.columns.isna()]
+    data = relabel_values(form, data, label, sep, on_stage)
+    return relabel_headers(form, data, label, sep, on_stage)
+
+
+SELECT_TYPES = ("select_one", "select_multiple")
+
+
+def _select_question(form: XLSForm, name: str):
+    question = form.question(name)
+    return question if question is not None and question.q_type in SELECT_TYPES else None
+
+
+def _lookup(form: XLSForm, name: str, label: str):
+    # What relabeling `name` with `form` depends on; equal lookups give equal columns
+    question = _select_question(form, name) if form is not None else None
+    if question is None:
+        return None
+    return (question.q_type, form.choice_labels(question.list_name, label),
+            form.choice_categories(question.list_name, label))
+
+
+def _relabel_column(form: XLSForm, data: pd.DataFrame, name: str, label: str, sep: str) -> pd.Series:
+    if form.question(name).q_type == "select_one":
+        return name2label_choices_one(form, label, data, name)
+    return name2label_choices_multiple(form, data, name, label, sep)
+
+
+def _stitch(pieces: list, order: np.ndarray, index) -> pd.Series:
+    """
+    Put the row groups of one column back in their original order. A column
+    categorical in every group stays categorical, with the categories of the
+    first group first.
+    """
+    if all(isinstance(p.dtype, pd.CategoricalDtype) for p in pieces):
+        merged = pd.api.types.union_categoricals(pieces, ignore_order=True)
+        return pd.Series(pd.Categorical.from_codes(merged.codes[order], categories=merged.categories,
+                                                   ordered=pieces[0].dtype.ordered),
+                         index=index, name=pieces[0].name)
+    return pd.concat(pieces, ignore_index=True).iloc[order].set_axis(index)
+
+
+def relabel_sheet_by_version(form: XLSForm,
+                             version_forms: dict,
+                             data: pd.DataFrame,
+                             versions: pd.Series,
+                             label: str,
+                             sep: str,
+                             on_stage=None) -> pd.DataFrame:
+    """
+    Switch one sheet whose rows come from several form versions.
+
+    Rows are grouped by ``versions`` and relabeled with their own version's
+    form, so choices renamed or dropped since keep their label. Columns whose
+    choices are the same in every version present are relabeled in one pass
+    over all rows; only the others are split by group. Rows of unknown
+    versions, and questions a version lacks, fall back to ``form``, which also
+    labels the headers.
+
+    Args:
+        form (XLSForm): The current form (scoped to the sheet).
+        version_forms (dict): ``{version uid: XLSForm}``, scoped like ``form``.
+        versions (Series): Version uid of each row, aligned with ``data``.
+    """
+    data = data.loc[:, ~data.columns.isna()].copy()
+    codes, uniques = pd.factorize(versions)
+    # One group of rows per distinct form; `form` first, for the unknown versions too
+    groups = {id(form): (form, [-1])}
+    for code, version in enumerate(uniques):
+        version_form = version_forms.get(str(version), form)
+        groups.setdefault(id(version_form), (version_form, []))[1].append(code)
+    groups = [(f, np.flatnonzero(np.isin(codes, c))) for f, c in groups.values()]
+    groups = [(f, rows) for f, rows in groups if len(rows)]
+
+    names = {q.name for f, _ in groups for t in SELECT_TYPES for q in f.questions_of_type(t)}
+    varying = {}  # column -> the form relabeling it in each group (None: left as is)
+    with span("relabel.versions", rows=len(data), versions=len(groups)) as record:
+        for name in [c for c in data.columns if c in names]:
+            forms = [f if f.question(name) is not None else form for f, _ in groups]
+            forms = [f if _select_question(f, name) is not None else None for f in forms]
+            lookups = [_lookup(f, name, label) for f in forms]
+            if any(lookup != lookups[0] for lookup in lookups[1:]):
+                varying[name] = forms
+            elif forms[0] is not None:
+                data[name] = _relabel_column(forms[0], data, name, label, sep)
+
+        if varying:
+            prefixes = tuple(f"{name}{sep}" for name in varying)
+            inputs = [c for c in data.columns if c in varying or (isinstance(c, str) and c.startswith(prefixes))]
+            order = np.argsort(np.concatenate([rows for _, rows in groups]), kind="stable")
+            pieces = {name: [] for name in varying}
+            for i, (_, rows) in enumerate(groups):
+                subset = data[inputs].iloc[rows]
+                for name, forms in varying.items():
+                    f = forms[i]
+                    pieces[name].append(_relabel_column(f, subset, name, label, sep) if f is not None
+                                        else subset[name])
+            for name, parts in pieces.items():
+                data[name] = _stitch(parts, order, data.index)
+        record["varying"] = len(varying)
+    if on_stage:
+        on_stage("select_one")
+        on_stage("select_multiple")
+    return relabel_headers(form, data, label, sep, on_stage)
+
+
+def sheet_versions(sheet_names: list, data_list: list) -> list:
+    """
+    The form version of every row of every sheet of a Kobo export.
+
+    The main sheet has a ``__version__`` column; repeat sheets inherit the
+    version of their parent row through ``_parent_index`` (and
+    ``_parent_table_name`` for nested repeats).
+
+    Returns:
+        list: One Series per sheet aligned with its rows, or None where the
+        version cannot be told.
+    """
+    by_index = {}  # sheet name -> version keyed by _index
+    main = None
+    result = []
+    for sheet_name, data in zip(sheet_names, data_list):
+        versions = None
+        if VERSION_COLUMN in data.columns:
+            versions = data[VERSION_COLUMN]
+            main = main or sheet_name
+        elif "_parent_index" in data.columns:
+            parents = data["_parent_table_name"] if "_parent_table_name" in data.columns else \
+                pd.Series(main, index=data.index)
+            versions = pd.Series(None, index=data.index, dtype=object)
+            for parent in parents.dropna().unique():
+                lookup = by_index.get(parent)
+                if lookup is not None:
+                    rows = parents == parent
+                    versions[rows] = data.loc[rows, "_parent_index"].map(lookup)
+        if versions is not None and "_index" in data.columns:
+            lookup = pd.Series(versions.to_numpy(), index=data["_index"].to_numpy())
+            by_index[sheet_name] = lookup[~lookup.index.duplicated()]
+        result.append(versions)
+    return result
+
+
+def relabel_sheets(form: XLSForm,
+                   sheet_names: list,
+                   data_list: list,
+                   label: str,
+                   sep: str,
+                   version_forms: dict = None,
+                   on_stage=None) -> list:
+    """
+    Switch every sheet of a Kobo export, each against the part of the form it
+    was written from (see ``sheet_scopes``).
+
+    With ``version_forms`` (``{version uid: XLSForm}``, e.g. from
+    ``versions.fetch_forms``), sheets mixing several versions are relabeled
+    group by group with each row's own version; each version is scoped once.
+    Versions without a ``label`` column (e.g. a translation renamed since) are
+    switched with ``form`` instead (see ``versions.missing_label``).
+    """
+    scopes = sheet_scopes(form, sheet_names, data_list)
+    version_forms = {v: f for v, f in (version_forms or {}).items() if label in f.label_columns}
+    if not version_forms:
+        return [relabel_sheet(scope, data, label, sep, on_stage) for scope, data in zip(scopes, data_list)]
+
+    version_scopes = {v: sheet_scopes(f, sheet_names, data_list) for v, f in version_forms.items()}
+    switched = []
+    for i, versions in enumerate(sheet_versions(sheet_names, data_list)):
+        if versions is None:
+            switched.append(relabel_sheet(scopes[i], data_list[i], label, sep, on_stage))
             continue
-        list_name = match.iloc[0]
+        forms = {v: s[i] for v, s in version_scopes.items()}
+        switched.append(relabel_sheet_by_version(scopes[i], forms, data_list[i], versions, label, sep, on_stage))
+    return switched
 
-        # get the relevant choices
-        t_choices = choices[choices['list_name'] == list_name][['name', label]]
 
-        # merge to replace xml_answers with labels
-        d_col = pd.DataFrame({'col': d_join[col_name]})
-        d_merged = d_col.merge(t_choices, how = 'left', left_on='col', right_on='name')[[label]]
-        d_join[col_name] = d_merged[label]
+def relabel_sheet_languages(form: XLSForm,
+                            data: pd.DataFrame,
+                            labels: list,
+                            sep: str,
+                            on_stage=None) -> dict:
+    """
+    Switch one sheet to several label languages in one pass over the data.
 
-    merged = d_join.apply(lambda row: ';'.join(filter(None, row.dropna().astype(str))), axis=1)
+    The work that does not depend on the language is done once per column:
+    factorizing select_one values and finding the ticked patterns of each
+    select_multiple group. Each language then only maps the distinct values.
+    Columns that are not relabeled are shared between the outputs, not copied.
+
+    Returns:
+        dict: ``{label: DataFrame}``, each as ``relabel_sheet`` would return it.
+    """
+    data = data.loc[:, ~data.columns.isna()]
+    positions = {}
+    for i, col in enumerate(data.columns):
+        positions.setdefault(col, i)
+    switched = {label: {} for label in labels}
+
+    # Select One
+    with span("relabel.select_one", rows=len(data), languages=len(labels)):
+        for question in form.questions_of_type("select_one"):
+            if question.name in positions:
+                codes, uniques = pd.factorize(data.iloc[:, positions[question.name]])
+                keys = [choice_key(v) for v in uniques]
+                for label in labels:
+                    switched[label][question.name] = _categorical_from_codes(
+                        codes, keys, form.choice_labels(question.list_name, label),
+                        form.choice_categories(question.list_name, label))
+    if on_stage:
+        on_stage("select_one")
+
+    # Select Multiple
+    with span("relabel.select_multiple", rows=len(data), languages=len(labels)):
+        for question in form.questions_of_type("select_multiple"):
+            if question.name in positions:
+                ticked = _ticked_options(data, question.name, sep)
+                for label in labels:
+                    switched[label][question.name] = [None] * len(data) if ticked is None else \
+                        _joined_labels(form, question.name, label, *ticked)
+    if on_stage:
+        on_stage("select_multiple")
+
+    # Rename Headers
+    frames = {}
+    with span("relabel.headers", columns=len(data.columns), languages=len(labels)):
+        for label in labels:
+            frame = data.copy(deep=False)
+            for col, values in switched[label].items():
+                frame.isetitem(positions[col], values)
+            frame.columns = [name2label_questions(form, col, label, sep) for col in data.columns]
+            frames[label] = frame
+    if on_stage:
+        on_stage("headers")
+    return frames
+
+
+def relabel_languages(form: XLSForm,
+                      sheet_names: list,
+                      data_list: list,
+                      labels: list,
+                      sep: str,
+                      version_forms: dict = None,
+                      on_stage=None) -> dict:
+    """
+    Switch every sheet of a Kobo export to each of ``labels`` (e.g. every
+    ``form.label_columns``), sharing the per-column work between languages
+    (see ``relabel_sheet_languages``).
+
+    With ``version_forms`` each language is switched on its own by
+    ``relabel_sheets``, so ``on_stage`` is then called once per language.
+
+    Returns:
+        dict: ``{label: [DataFrame per sheet]}``.
+    """
+    if version_forms:
+        return {label: relabel_sheets(form, sheet_names, data_list, label, sep, version_forms, on_stage)
+                for label in labels}
+    scopes = sheet_scopes(form, sheet_names, data_list)
+    switched = [relabel_sheet_languages(scope, data, labels, sep, on_stage) for scope, data in zip(scopes, data_list)]
+    return {label: [frames[label] for frames in switched] for label in labels}
+
+
+# ----- Label -> XML name -----
+def label2name_headers(form: XLSForm, label: str, sep: str) -> dict:
+    """
+    Map every header ``name2label_questions`` can produce from ``form`` back to
+    the XML names it comes from, in form order: questions, and the
+    ``question{sep}choice`` dummies of each select_multiple.
+
+    Returns:
+        dict: ``{header: [XML names]}``; a header shared by several questions
+        lists them all (see ``label2name_columns``).
+    """
+    names = {}
+    for question in form.questions:
+        names.setdefault(name2label_questions(form, question.name, label, sep), []).append(question.name)
+        if question.q_type == "select_multiple" and question.list_name:
+            for choice in form.choices(question.list_name):
+                col = f"{question.name}{sep}{choice.name}"
+                names.setdefault(name2label_questions(form, col, label, sep), []).append(col)
+    return names
+
+
+def label2name_columns(columns, headers: dict) -> list:
+    """
+    XML name of each labeled column, given ``label2name_headers``.
+
+    Repeated headers (two questions with the same label, or their
+    ``header.1`` spelling once pandas reads them back) take the names sharing
+    that header in form order. Unknown headers are kept.
+    """
+    seen = {}
+    names = []
+    for col in columns:
+        key = col
+        if col not in headers and isinstance(col, str):
+            mangled = re.fullmatch(r"(.*)\.\d+", col, flags=re.S)
+            if mangled and mangled.group(1) in headers:
+                key = mangled.group(1)
+        candidates = headers.get(key)
+        if candidates is None:
+            names.append(col)
+            continue
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        names.append(candidates[min(occurrence, len(candidates) - 1)])
+    return names
+
+
+def _choice_name(names: dict, value):
+    # Cells that are not a known label (free text, already a name) are kept as they are
+    return names.get(choice_key(value), value)
+
+
+def label2name_choices_one(form: XLSForm,
+                           label: str,
+                           data: pd.DataFrame,
+                           col: str) -> pd.Series:
+    question = form.question(col)
+    if question is None:
+        return data[col]
+
+    # Look up each distinct label once, then broadcast the codes back
+    names = form.choice_names(question.list_name, label)
+    codes, uniques = pd.factorize(data[col])
+    mapped = [_choice_name(names, v) for v in uniques]
+    categories = list(dict.fromkeys(mapped))
+    position = {name: i for i, name in enumerate(categories)}
+    lookup = np.array([position[name] for name in mapped] + [-1], dtype=np.int32)
+    return pd.Series(pd.Categorical.from_codes(lookup[codes], categories=categories), index=data.index, name=col)
+
+
+def label2name_choices_multiple(form: XLSForm,
+                                data: pd.DataFrame,
+                                col: str,
+                                label: str,
+                                sep: str) -> pd.DataFrame:
+    """
+    Explode a ";"-joined select_multiple label column into Kobo's layout: the
+    question column with space-separated choice names, followed by one
+    ``question{sep}choice`` dummy per declared choice (1 ticked, 0 not, blank
+    when the question is blank). Labels not in the list keep a dummy of their own.
+
+    Each distinct combination is split once; rows only index into the result.
+    """
+    question = form.question(col)
+    names = form.choice_names(question.list_name, label) if question is not None else {}
+    declared = [c.name for c in form.choices(question.list_name)] if question is not None else []
+
+    codes, uniques = pd.factorize(data[col])
+    tokens = pd.Series(uniques, dtype=object).astype(str).str.split(";")
+    combos = [[_choice_name(names, t.strip()) for t in parts if t.strip()] for parts in tokens]
+
+    columns = list(dict.fromkeys(declared + [name for combo in combos for name in combo]))
+    position = {name: i for i, name in enumerate(columns)}
+    ticked = np.zeros((len(uniques) + 1, len(columns)), dtype=np.uint8)
+    for i, combo in enumerate(combos):
+        ticked[i, [position[name] for name in combo]] = 1
+
+    joined = [" ".join(combo) for combo in combos]
+    categories = list(dict.fromkeys(joined))
+    order = {text: i for i, text in enumerate(categories)}
+    lookup = np.array([order[text] for text in joined] + [-1], dtype=np.int32)
+    blank = codes == -1
+    dummies = ticked[codes]
+    out = {col: pd.Categorical.from_codes(lookup[codes], categories=categories)}
+    for j, name in enumerate(columns):
+        out[f"{col}{sep}{name}"] = pd.arrays.IntegerArray(dummies[:, j], blank)
+    return pd.DataFrame(out, index=data.index)
+
+
+def label2name_sheet(form: XLSForm,
+                     data: pd.DataFrame,
+                     label: str,
+                     sep: str,
+                     on_stage=None) -> pd.DataFrame:
+    """
+    Switch one sheet back from labels to XML names, the reverse of
+    ``relabel_sheet``: headers, select_one values, then select_multiple
+    columns, which are exploded back into their dummies (replacing any the
+    sheet still has).
+
+    ``on_stage`` is called with the stage name after each stage, for progress bars.
+    """
+    data = data.loc[:, ~data.columns.isna()]
+
+    # Rename Headers
+    with span("label2name.headers", columns=len(data.columns)):
+        data = data.set_axis(label2name_columns(data.columns, label2name_headers(form, label, sep)), axis=1)
+    if on_stage:
+        on_stage("headers")
+
+    # Select One
+    data = data.copy()
+    with span("label2name.select_one", rows=len(data)):
+        for question in form.questions_of_type("select_one"):
+            if question.name in data.columns:
+                data[question.name] = label2name_choices_one(form, label, data, question.name)
+    if on_stage:
+        on_stage("select_one")
+
+    # Select Multiple
+    with span("label2name.select_multiple", rows=len(data)):
+        exploded = {question.name: label2name_choices_multiple(form, data, question.name, label, sep)
+                    for question in form.questions_of_type("select_multiple") if question.name in data.columns}
+        if exploded:
+            prefixes = tuple(f"{name}{sep}" for name in exploded)
+            pieces = []
+            for col in data.columns:
+                if col in exploded:
+                    pieces.append(exploded[col])
+                elif not (isinstance(col, str) and col.startswith(prefixes)):
+                    pieces.append(data[col])
+            data = pd.concat(pieces, axis=1)
+    if on_stage:
+        on_stage("select_multiple")
+
+    return data
+
+
+def label2name_sheets(form: XLSForm,
+                      sheet_names: list,
+                      data_list: list,
+                      label: str,
+                      sep: str,
+                      on_stage=None) -> list:
+    """
+    Switch every sheet of a labeled export back to XML names, each against the
+    part of the form it was written from (see ``sheet_scopes``).
+    """
+    scopes = sheet_scopes(form, sheet_names, data_list)
+    return [label2name_sheet(scope, data, label, sep, on_stage) for scope, data in zip(scopes, data_list)]
 
-    return merged
 
 def make_unique_columns(columns):
     counts = {}
@@ -140,4 +703,4 @@ def list_name(val):
         parts = val.split()
         if len(parts) > 1:
             return parts[1]
-    return None
\ No newline at end of file
+    return None
@@ -0,0 +1,121 @@
+"""
+The deployed versions of a Kobo form, each parsed once per process.
+
+Every submission records the form version it was filled with in
+``__version__``; relabeling a dataset that mixes versions needs each
+version's own choices (see ``utils.relabel_sheets``).
+
+    forms = versions.fetch_forms(root, headers, asset_uid)
+    relabel_sheets(form, sheet_names, data_list, label, sep, version_forms=forms)
+
+Version content never changes once deployed, so parsed forms are kept by
+(server, asset, version) and shared between sessions; only the asset's list of
+deployed versions is asked again (through ``src.http_cache``), which also
+checks that the token can still see the asset.
+"""
+import threading
+from collections import OrderedDict
+
+from src import engine, kobo_api
+from src.utils import VERSION_COLUMN
+from src.xlsform import XLSForm
+
+# Parsed versions kept in memory, least recently used first
+CACHE_SIZE = 64
+
+# (root, asset uid, version uid) -> XLSForm
+_forms = OrderedDict()
+_lock = threading.Lock()
+
+
+def deployed_versions(root: str, headers: dict, uid: str) -> list:
+    """
+    UIDs of every deployed version of an asset, newest first.
+
+    Raises:
+        KoboAPIError: If the asset cannot be fetched.
+    """
+    response = kobo_api.request("GET", f"{root}/assets/{uid}.json", headers=headers)
+    if response.status_code != 200:
+        raise kobo_api.KoboAPIError(f"Failed to fetch asset {uid}: {response.status_code} - {response.reason}",
+                                    response.status_code)
+    page = response.json().get("deployed_versions") or {}
+    uids = [v["uid"] for v in page.get("results", [])]
+    while page.get("next"):
+        response = kobo_api.request("GET", page["next"], headers=headers)
+        if response.status_code != 200:
+            raise kobo_api.KoboAPIError(f"Failed to list the versions of {uid}: {response.status_code}",
+                                        response.status_code)
+        page = response.json()
+        uids.extend(v["uid"] for v in page.get("results", []))
+    return uids
+
+
+def fetch_forms(root: str, headers: dict, uid: str, version_uids: list = None, on_progress=None) -> dict:
+    """
+    The parsed form of each deployed version of an asset.
+
+    Versions parsed earlier in the process are reused; the others are fetched
+    concurrently from ``/assets/{uid}/versions/{version}/`` and parsed once.
+
+    Args:
+        version_uids (list): Only these versions (e.g. those found in the data);
+            uids that are not deployed versions of the asset are ignored.
+        on_progress: Optional callable ``(done, total)`` over the versions fetched.
+
+    Returns:
+        dict: ``{version uid: XLSForm}``, newest version first.
+
+    Raises:
+        KoboAPIError: If the asset or one of its versions cannot be fetched.
+    """
+    wanted = deployed_versions(root, headers, uid)
+    if version_uids is not None:
+        requested = set(version_uids)
+        wanted = [v for v in wanted if v in requested]
+
+    forms = {}
+    with _lock:
+        for version in wanted:
+            form = _forms.get((root, uid, version))
+            if form is not None:
+                _forms.move_to_end((root, uid, version))
+                forms[version] = form
+
+    missing = [v for v in wanted if v not in forms]
+    calls = [("GET", f"{root}/assets/{uid}/versions/{v}/", {"params": {"format": "json"}}) for v in missing]
+    for version, response in zip(missing, engine.gather(calls, headers=headers, on_progress=on_progress, delay=0)):
+        if engine.status_of(response) != 200:
+            raise kobo_api.KoboAPIError(f"Failed to fetch version {version} of {uid}: {engine.status_of(response)}",
+                                        getattr(response, "status_code", None))
+        form = XLSForm.from_content(response.json().get("content") or {})
+        with _lock:
+            _forms[(root, uid, version)] = form
+            while len(_forms) > CACHE_SIZE:
+                _forms.popitem(last=False)
+        forms[version] = form
+    return {v: forms[v] for v in wanted}
+
+
+def missing_label(forms: dict, label: str) -> list:
+    """
+    Versions among ``forms`` that have no ``label`` column, e.g. because the
+    translation was renamed since; their rows are labeled with the uploaded form.
+    """
+    return [v for v, form in forms.items() if label not in form.label_columns]
+
+
+def versions_in(data_list: list) -> list:
+    """
+    Distinct version uids found in the ``__version__`` column of any sheet.
+    """
+    found = {}
+    for data in data_list:
+        if VERSION_COLUMN in data.columns:
+            found.update(dict.fromkeys(data[VERSION_COLUMN].dropna().astype(str).unique()))
+    return list(found)
+
+
+def clear() -> None:
+    with _lock:
+        _forms.clear()
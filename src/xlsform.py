@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import sys
+
+from src.instrumentation import span
+from src.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+
+GROUP_BEGIN = {"begin_group", "begin group"}
+GROUP_END = {"end_group", "end group"}
+REPEAT_BEGIN = {"begin_repeat", "begin repeat"}
+REPEAT_END = {"end_repeat", "end repeat"}
+
+
+def _text(val, strip: bool = True):
+    """
+    Normalize a single XLSForm cell to an interned string (or None for blanks).
+
+    Numeric cells read by Excel as floats (e.g. choice name ``1`` -> ``1.0``)
+    are turned back into their integer spelling so they match the data export.
+    """
+    if val is None:
+        return None
+    if isinstance(val, float):
+        if val != val:  # NaN
+            return None
+        if val.is_integer():
+            val = int(val)
+    text = str(val)
+    if strip:
+        text = text.strip()
+    if not text:
+        return None
+    return sys.intern(text)
+
+
+def _labels(columns, values) -> dict:
+    labels = {}
+    for col, val in zip(columns, values):
+        text = _text(val, strip=False)
+        if text is not None:
+            labels[col] = text
+    return labels
+
+
+def choice_key(val):
+    """
+    Normalize a data value so it can be looked up against choice names.
+    """
+    return _text(val)
+
+
+class Question:
+    """
+    One row of the survey sheet.
+
+    Attributes:
+        name (str): The XML name of the question.
+        type (str): The raw type cell (e.g. 'select_one yes_no').
+        q_type (str): The first token of the type (e.g. 'select_one').
+        list_name (str): The choice list for select questions, else None.
+        labels (dict): Label text keyed by label column (e.g. 'label::English').
+        constraint (str): The raw constraint expression, if any.
+        path (tuple): Names of the enclosing groups and repeats, outermost first.
+        repeat (str): Name of the innermost enclosing repeat, or None.
+    """
+    __slots__ = ("name", "type", "q_type", "list_name", "labels", "constraint", "path", "repeat")
+
+    def __init__(self, name, type, q_type, list_name, labels, constraint, path, repeat):
+        for attr, value in zip(self.__slots__, (name, type, q_type, list_name, labels, constraint, path, repeat)):
+            object.__setattr__(self, attr, value)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def label(self, column: str, default=None):
+        return self.labels.get(column, default)
+
+    def __repr__(self):
+        return f"Question(name={self.name!r}, type={self.type!r})"
+
+
+class Choice:
+    """
+    One row of the choices sheet.
+
+    Attributes:
+        list_name (str): The list this choice belongs to.
+        name (str): The XML name of the choice.
+        labels (dict): Label text keyed by label column.
+    """
+    __slots__ = ("list_name", "name", "labels")
+
+    def __init__(self, list_name, name, labels):
+        object.__setattr__(self, "list_name", list_name)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "labels", labels)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def label(self, column: str, default=None):
+        return self.labels.get(column, default)
+
+    def __repr__(self):
+        return f"Choice(list_name={self.list_name!r}, name={self.name!r})"
+
+
+class XLSForm:
+    """
+    Immutable, parsed view of an XLSForm shared by the Switcher, the CodeBook and
+    the variable extractor.
+
+    The survey and choices sheets are read once into compact records; lookups by
+    question name and by list name are dictionary hits instead of DataFrame scans.
+    """
+    __slots__ = ("questions", "label_columns", "choice_label_columns", "unnamed_rows",
+                 "_by_name", "_choices", "_label_maps", "_scopes")
+
+    def __init__(self, questions, choices, label_columns, choice_label_columns, _label_maps=None,
+                 unnamed_rows=()):
+        object.__setattr__(self, "questions", tuple(questions))
+        # (position in questions, type) of typed survey rows without a name, e.g. end_group
+        object.__setattr__(self, "unnamed_rows", tuple(unnamed_rows))
+        object.__setattr__(self, "label_columns", tuple(label_columns))
+        object.__setattr__(self, "choice_label_columns", tuple(choice_label_columns))
+        by_name = {}
+        for q in self.questions:
+            by_name.setdefault(q.name, q)
+        object.__setattr__(self, "_by_name", by_name)
+        object.__setattr__(self, "_choices", choices)
+        # choice label maps are shared with scoped views of the same form
+        object.__setattr__(self, "_label_maps", {} if _label_maps is None else _label_maps)
+        object.__setattr__(self, "_scopes", {})
+
+    def __setattr__(self, attr, value):
+        raise AttributeError("XLSForm is immutable")
+
+    # ----- Construction -----
+    @classmethod
+    def from_excel(cls, source) -> "XLSForm":
+        """
+        Parse an XLSForm workbook.
+
+        Args:
+            source: A path, an uploaded file or an already opened ``pd.ExcelFile``.
+
+        Returns:
+            XLSForm: The parsed form.
+        """
+        with span("parse_form") as record:
+            xls = source if isinstance(source, pd.ExcelFile) else pd.ExcelFile(source)
+            if "survey" not in xls.sheet_names:
+                raise ValueError("Kobo form must include a 'survey' sheet.")
+            survey = xls.parse("survey")
+            choices = xls.parse("choices") if "choices" in xls.sheet_names else None
+            form = cls.from_frames(survey, choices)
+            record["questions"] = len(form.questions)
+        return form
+
+    @classmethod
+    def from_frames(cls, survey: pd.DataFrame, choices: pd.DataFrame = None) -> "XLSForm":
+        """
+        Build the form from already loaded survey and choices sheets.
+
+        Args:
+            survey (pd.DataFrame): The survey sheet.
+            choices (pd.DataFrame): The choices sheet, or None if the form has none.
+
+        Returns:
+            XLSForm: The parsed form.
+        """
+        label_columns = [c for c in survey.columns if isinstance(c, str) and c.startswith("label")]
+        questions = []
+        unnamed_rows = []
+        stack = []  # (name, is_repeat)
+
+        columns = ["type", "name", "constraint", *label_columns]
+        rows = survey.reindex(columns=columns).itertuples(index=False, name=None)
+        for q_type_raw, name_raw, constraint_raw, *label_values in rows:
+            type_text = _text(q_type_raw)
+            name = _text(name_raw)
+            kind = type_text.lower() if type_text else None
+            if name is None and type_text is not None:
+                unnamed_rows.append((len(questions), type_text))
+
+            if kind in GROUP_END or kind in REPEAT_END:
+                if stack:
+                    stack.pop()
+                continue
+            if name is None:
+                if kind in GROUP_BEGIN or kind in REPEAT_BEGIN:
+                    stack.append((None, kind in REPEAT_BEGIN))
+                continue
+
+            parts = type_text.split() if type_text else []
+            path = tuple(n for n, _ in stack if n)
+            repeat = next((n for n, is_repeat in reversed(stack) if is_repeat and n), None)
+            labels = _labels(label_columns, label_values)
+            questions.append(Question(
+                name=name,
+                type=type_text,
+                q_type=sys.intern(parts[0]) if parts else None,
+                list_name=sys.intern(parts[1]) if len(parts) > 1 else None,
+                labels=labels,
+                constraint=_text(constraint_raw),
+                path=path,
+                repeat=repeat,
+            ))
+
+            if kind in GROUP_BEGIN or kind in REPEAT_BEGIN:
+                stack.append((name, kind in REPEAT_BEGIN))
+
+        grouped = {}
+        choice_label_columns = []
+        if choices is not None and "list_name" in choices.columns:
+            choice_label_columns = [c for c in choices.columns if isinstance(c, str) and c.startswith("label")]
+            rows = choices.reindex(columns=["list_name", "name", *choice_label_columns]).itertuples(index=False, name=None)
+            for list_name_raw, name_raw, *label_values in rows:
+                list_name = _text(list_name_raw)
+                name = _text(name_raw)
+                if list_name is None or name is None:
+                    continue
+                labels = _labels(choice_label_columns, label_values)
+                grouped.setdefault(list_name, []).append(Choice(list_name, name, labels))
+        grouped = {k: tuple(v) for k, v in grouped.items()}
+
+        return cls(questions, grouped, label_columns, choice_label_columns, unnamed_rows=unnamed_rows)
+
+    @classmethod
+    def from_content(cls, content: dict) -> "XLSForm":
+        """
+        Parse the JSON ``content`` of a Kobo asset or asset version.
+
+        Kobo keeps translated cells as lists aligned with ``content["translations"]``;
+        they become ``label`` / ``label::<translation>`` columns as in the XLSForm
+        download, and ``select_from_list_name`` is folded back into the type.
+
+        Returns:
+            XLSForm: The parsed form.
+        """
+        with span("parse_form", source="content") as record:
+            translations = content.get("translations") or [None]
+            label_columns = ["label" if t is None else f"label::{t}" for t in translations]
+
+            def row(item, name_key):
+                labels = item.get("label")
+                if not isinstance(labels, list):
+                    labels = [labels]
+                return {"name": item.get("name") or item.get(name_key),
+                        **dict(zip(label_columns, labels))}
+
+            survey = []
+            for item in content.get("survey", []):
+                q_type = item.get("type")
+                if item.get("select_from_list_name"):
+                    q_type = f"{q_type} {item['select_from_list_name']}"
+                survey.append({"type": q_type, "constraint": item.get("constraint"), **row(item, "$autoname")})
+            choices = [{"list_name": item.get("list_name"), **row(item, "$autovalue")}
+                       for item in content.get("choices", [])]
+
+            form = cls.from_frames(pd.DataFrame(survey, columns=["type", "name", "constraint", *label_columns]),
+                                   pd.DataFrame(choices, columns=["list_name", "name", *label_columns]))
+            record["questions"] = len(form.questions)
+        return form
+
+    # ----- Accessors -----
+    def __contains__(self, name) -> bool:
+        return name in self._by_name
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def question(self, name: str):
+        """Return the question called ``name``, or None."""
+        return self._by_name.get(name)
+
+    def questions_of_type(self, q_type: str) -> list:
+        """Return all questions whose first type token is ``q_type``."""
+        return [q for q in self.questions if q.q_type == q_type]
+
+    @property
+    def list_names(self) -> tuple:
+        return tuple(self._choices)
+
+    def choices(self, list_name: str) -> tuple:
+        """Return the choices of ``list_name`` in declaration order."""
+        return self._choices.get(list_name, ())
+
+    def choice_labels(self, list_name: str, label: str) -> dict:
+        """
+        Return a ``{choice name: label}`` mapping for one list and label column.
+
+        The mapping is built once per (list, label) pair and reused afterwards.
+        """
+        key = (list_name, label)
+        mapping = self._label_maps.get(key)
+        if mapping is None:
+            mapping = {}
+            for c in self.choices(list_name):
+                mapping.setdefault(c.name, c.labels.get(label))
+            self._label_maps[key] = mapping
+        return mapping
+
+    def choice_names(self, list_name: str, label: str) -> dict:
+        """
+        Return the reverse of ``choice_labels``: ``{label: choice name}`` for one list,
+        keyed like ``choice_key`` so stripped or numeric cells match too.
+
+        When two choices share a label, the first declared wins.
+        """
+        key = (list_name, label, "names")
+        mapping = self._label_maps.get(key)
+        if mapping is None:
+            mapping = {}
+            for c in self.choices(list_name):
+                text = _text(c.labels.get(label))
+                if text is not None:
+                    mapping.setdefault(text, c.name)
+            self._label_maps[key] = mapping
+        return mapping
+
+    def choice_categories(self, list_name: str, label: str) -> tuple:
+        """
+        Return the distinct labels of one list in the order the choices are declared.
+        """
+        key = (list_name, label, "categories")
+        categories = self._label_maps.get(key)
+        if categories is None:
+            labels = (c.labels.get(label) for c in self.choices(list_name))
+            categories = tuple(dict.fromkeys(text for text in labels if text is not None))
+            self._label_maps[key] = categories
+        return categories
+
+    def choice_label(self, list_name: str, name: str, label: str):
+        """Return the label of one choice, or None if the choice is unknown."""
+        return self.choice_labels(list_name, label).get(name)
+
+    @property
+    def repeats(self) -> tuple:
+        """Names of all repeat groups, in form order."""
+        return tuple(q.name for q in self.questions if q.type and q.type.lower() in REPEAT_BEGIN)
+
+    def scoped(self, repeat: str = None) -> "XLSForm":
+        """
+        Return a view of the form holding only the questions that live directly in
+        ``repeat`` (or outside every repeat when ``repeat`` is None).
+
+        Choices are shared with the full form, so the view costs one name index.
+        """
+        view = self._scopes.get(repeat)
+        if view is None:
+            questions = [q for q in self.questions if q.repeat == repeat]
+            view = XLSForm(questions, self._choices, self.label_columns,
+                           self.choice_label_columns, _label_maps=self._label_maps)
+            self._scopes[repeat] = view
+        return view
+
+    def repeat_for_sheet(self, sheet_name: str):
+        """
+        Return the repeat group a Kobo export sheet was written for, or None.
+
+        Kobo names each repeat sheet after its group, cut to Excel's 31 characters.
+        """
+        for repeat in self.repeats:
+            if sheet_name == repeat or sheet_name == repeat[:31]:
+                return repeat
+        return None
+
+    def __repr__(self):
+        return f"XLSForm(questions={len(self.questions)}, lists={len(self._choices)})"